@@ -0,0 +1,8 @@
+// Copyright (c) 2026, Printechs and contributors
+// For license information, please see license.txt
+
+// frappe.ui.form.on("Item Current Metrics", {
+// 	refresh(frm) {
+
+// 	},
+// });
@@ -0,0 +1,14 @@
+# Copyright (c) 2026, Printechs and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+
+class ItemStockDelta(Document):
+	pass
+
+
+def on_doctype_update():
+	frappe.db.add_index("Item Stock Delta", ["item_code", "posting_date"])
+	frappe.db.add_index("Item Stock Delta", ["warehouse", "posting_date"])
@@ -0,0 +1,97 @@
+# Copyright (c) 2026, Printechs and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from erpnext.stock.doctype.item.test_item import make_item
+from erpnext.stock.doctype.material_request.test_material_request import make_material_request
+from erpnext.stock.doctype.stock_entry.stock_entry_utils import make_stock_entry
+
+SOURCE_WAREHOUSE = "_Test Warehouse - _TC"
+TARGET_WAREHOUSE = "_Test Warehouse 1 - _TC"
+
+
+class TestMaterialRequestItemConsumption(FrappeTestCase):
+	def setUp(self):
+		self.item = make_item(properties={"is_stock_item": 1}).name
+		make_stock_entry(item_code=self.item, target=SOURCE_WAREHOUSE, qty=50, basic_rate=10)
+
+		self.mr = make_material_request(
+			item_code=self.item,
+			qty=10,
+			warehouse=TARGET_WAREHOUSE,
+			material_request_type="Material Transfer",
+		)
+
+	def tearDown(self):
+		frappe.db.rollback()
+
+	def make_entry(self, qty, link_request=True):
+		entry = make_stock_entry(
+			item_code=self.item,
+			source=SOURCE_WAREHOUSE,
+			target=TARGET_WAREHOUSE,
+			qty=qty,
+			do_not_save=True,
+		)
+		entry.items[0].material_request = self.mr.name
+		entry.items[0].material_request_item = self.mr.items[0].name
+		if link_request:
+			entry.custom_material_request = self.mr.name
+		entry.insert()
+		return entry
+
+	def get_counter(self):
+		return frappe.db.get_value(
+			"Material Request Item Consumption",
+			self.mr.items[0].name,
+			["draft_qty", "submitted_qty"],
+			as_dict=True,
+		)
+
+	def test_over_consumption_rejected(self):
+		self.make_entry(6)
+		self.assertRaises(frappe.ValidationError, self.make_entry, 5)
+
+		self.make_entry(4)
+		self.assertEqual(self.get_counter().draft_qty, 10)
+
+	def test_drafts_and_submitted_share_the_limit(self):
+		self.make_entry(7).submit()
+		self.assertEqual(self.get_counter().submitted_qty, 7)
+		self.assertRaises(frappe.ValidationError, self.make_entry, 4)
+
+	def test_deleted_draft_releases_qty(self):
+		entry = self.make_entry(8)
+		entry.delete()
+
+		self.assertEqual(self.get_counter().draft_qty, 0)
+		self.make_entry(10)
+
+	def test_entry_without_material_request_skipped(self):
+		self.make_entry(8)
+		self.make_entry(8, link_request=False)
+
+	def test_unsaved_rows_checked_on_submit(self):
+		entry = make_stock_entry(
+			item_code=self.item,
+			source=SOURCE_WAREHOUSE,
+			target=TARGET_WAREHOUSE,
+			qty=2,
+			do_not_save=True,
+		)
+		entry.custom_material_request = self.mr.name
+		entry.docstatus = 1
+
+		# Inserted straight as submitted: no saved rows to read on before_submit
+		self.assertRaises(frappe.ValidationError, entry.insert)
+
+	def test_cancelled_request_can_be_deleted(self):
+		self.make_entry(3).delete()
+		self.assertTrue(self.get_counter())
+
+		self.mr.reload()
+		self.mr.cancel()
+		frappe.delete_doc("Material Request", self.mr.name)
+		self.assertFalse(frappe.db.exists("Material Request", self.mr.name))
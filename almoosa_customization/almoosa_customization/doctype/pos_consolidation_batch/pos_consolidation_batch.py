@@ -0,0 +1,13 @@
+# Copyright (c) 2026, Printechs and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+
+class POSConsolidationBatch(Document):
+	pass
+
+
+def on_doctype_update():
+	frappe.db.add_index("POS Consolidation Batch", ["status", "posting_date"])
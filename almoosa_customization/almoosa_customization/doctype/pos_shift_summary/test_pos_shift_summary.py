@@ -0,0 +1,102 @@
+# Copyright (c) 2026, Printechs and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import flt
+
+from erpnext.accounts.doctype.pos_closing_entry.test_pos_closing_entry import init_user_and_profile
+from erpnext.accounts.doctype.pos_invoice.test_pos_invoice import create_pos_invoice
+from erpnext.accounts.doctype.pos_opening_entry.test_pos_opening_entry import create_opening_entry
+
+from almoosa_customization.pos_closing import (
+	get_closing_payments,
+	get_closing_taxes,
+	get_invoice_values,
+	make_pos_closing_entry,
+)
+from almoosa_customization.shift_summary import get_shift_summary_data, rebuild_shift_summary
+
+
+def make_pos_sale(rate, qty=1):
+	pos_inv = create_pos_invoice(rate=rate, qty=qty, do_not_save=1)
+	pos_inv.append("payments", {"mode_of_payment": "Cash", "account": "Cash - _TC", "amount": rate * qty})
+	pos_inv.insert()
+	pos_inv.submit()
+	return pos_inv
+
+
+def payment_amounts(rows, field):
+	return {row.mode_of_payment: flt(row.get(field), 2) for row in rows}
+
+
+class TestPOSShiftSummary(FrappeTestCase):
+	def setUp(self):
+		test_user, pos_profile = init_user_and_profile()
+		self.opening = frappe.get_doc("POS Opening Entry", create_opening_entry(pos_profile, test_user.name).name)
+		self.invoices = [make_pos_sale(3500), make_pos_sale(1200, qty=2)]
+
+	def tearDown(self):
+		frappe.set_user("Administrator")
+		frappe.db.rollback()
+
+	def assertClosingMatchesInvoices(self, closing):
+		invoices = [frappe.get_doc("POS Invoice", row.pos_invoice) for row in closing.pos_transactions]
+		self.assertEqual(flt(closing.grand_total, 2), flt(sum(inv.grand_total for inv in invoices), 2))
+		self.assertEqual(flt(closing.net_total, 2), flt(sum(inv.net_total for inv in invoices), 2))
+		self.assertEqual(flt(closing.total_quantity, 2), flt(sum(inv.total_qty for inv in invoices), 2))
+
+		values = get_invoice_values(self.opening)
+		self.assertEqual(
+			payment_amounts(closing.payment_reconciliation, "expected_amount"),
+			payment_amounts(get_closing_payments(values), "expected_amount"),
+		)
+		self.assertEqual(
+			{(tax.account_head, flt(tax.rate)): flt(tax.amount, 2) for tax in closing.taxes},
+			{(tax.account_head, flt(tax.rate)): flt(tax.amount, 2) for tax in get_closing_taxes(values)},
+		)
+
+	def test_summary_tracks_submitted_invoices(self):
+		summary = get_shift_summary_data(self.opening.name)
+		self.assertEqual(summary.invoice_count, 2)
+		self.assertEqual(flt(summary.grand_total, 2), flt(sum(inv.grand_total for inv in self.invoices), 2))
+		self.assertEqual(payment_amounts(summary.payments, "amount"), {"Cash": 5900})
+
+		closing = make_pos_closing_entry(self.opening)
+		self.assertEqual(len(closing.pos_transactions), 2)
+		self.assertClosingMatchesInvoices(closing)
+
+	def test_cancelled_invoice_leaves_summary(self):
+		self.invoices[0].cancel()
+
+		summary = get_shift_summary_data(self.opening.name)
+		self.assertEqual(summary.invoice_count, 1)
+		self.assertEqual(flt(summary.grand_total, 2), flt(self.invoices[1].grand_total, 2))
+
+		closing = make_pos_closing_entry(self.opening)
+		self.assertEqual([row.pos_invoice for row in closing.pos_transactions], [self.invoices[1].name])
+		self.assertClosingMatchesInvoices(closing)
+
+	def test_drifted_summary_not_used(self):
+		# Same invoice count, different totals: the summary counts other invoices
+		frappe.db.set_value("POS Shift Summary", self.opening.name, "grand_total", 1, update_modified=False)
+		frappe.db.set_value(
+			"POS Shift Summary Payment",
+			{"parent": self.opening.name, "mode_of_payment": "Cash"},
+			"amount",
+			1,
+			update_modified=False,
+		)
+
+		closing = make_pos_closing_entry(self.opening)
+		self.assertClosingMatchesInvoices(closing)
+
+	def test_rebuild_restores_drifted_summary(self):
+		frappe.db.set_value("POS Shift Summary", self.opening.name, "invoice_count", 7, update_modified=False)
+		frappe.db.delete("POS Shift Summary Payment", {"parent": self.opening.name})
+
+		rebuild_shift_summary(self.opening.name)
+
+		summary = get_shift_summary_data(self.opening.name)
+		self.assertEqual(summary.invoice_count, 2)
+		self.assertEqual(payment_amounts(summary.payments, "amount"), {"Cash": 5900})
@@ -0,0 +1,15 @@
+# Copyright (c) 2026, Printechs and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+
+class SyncOutbox(Document):
+	pass
+
+
+def on_doctype_update():
+	frappe.db.add_index("Sync Outbox", ["seq"])
+	frappe.db.add_index("Sync Outbox", ["reference_doctype", "reference_name"])
+	frappe.db.add_index("Sync Outbox", ["creation"])
@@ -0,0 +1,87 @@
+# Copyright (c) 2026, Printechs and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe import _dict
+from frappe.tests.utils import FrappeTestCase
+
+from almoosa_customization.sync_outbox import (
+	ack_outbox,
+	add_to_outbox,
+	get_seq_counter,
+	pull_outbox,
+	sequence_outbox_entries,
+)
+
+CONSUMER = "_test_sync_outbox_consumer"
+
+
+def add_entry(name, method="on_update"):
+	add_to_outbox(_dict({"doctype": "Item", "name": name}), method)
+
+
+class TestSyncOutbox(FrappeTestCase):
+	def setUp(self):
+		frappe.flags.sync_outbox_pending = None
+		# Start the consumer after whatever the site already holds
+		ack_outbox(CONSUMER, get_seq_counter() or 0)
+
+	def tearDown(self):
+		frappe.db.rollback()
+		frappe.flags.sync_outbox_pending = None
+
+	def pull_names(self):
+		result = pull_outbox(CONSUMER)
+		ack_outbox(CONSUMER, result["last_seq"])
+		return [entry.reference_name for entry in result["entries"]]
+
+	def test_entries_numbered_in_order(self):
+		add_entry("_Test Outbox A")
+		add_entry("_Test Outbox B")
+		sequence_outbox_entries()
+
+		result = pull_outbox(CONSUMER)
+		seqs = [entry.seq for entry in result["entries"]]
+		self.assertEqual([entry.reference_name for entry in result["entries"]], ["_Test Outbox A", "_Test Outbox B"])
+		self.assertEqual(seqs, list(range(seqs[0], seqs[0] + 2)))
+		self.assertEqual(result["last_seq"], seqs[-1])
+
+		# Unacknowledged entries come back, acknowledged ones do not
+		self.assertEqual(pull_outbox(CONSUMER)["entries"], result["entries"])
+		ack_outbox(CONSUMER, result["last_seq"])
+		self.assertEqual(pull_outbox(CONSUMER)["entries"], [])
+
+	def test_long_transaction_not_skipped(self):
+		# The long transaction inserts first, so its row id is the lower one
+		add_entry("_Test Outbox Long")
+		long_transaction = frappe.flags.sync_outbox_pending
+		frappe.flags.sync_outbox_pending = None
+
+		# A short transaction commits in between and is consumed
+		add_entry("_Test Outbox Short")
+		sequence_outbox_entries()
+		self.assertEqual(self.pull_names(), ["_Test Outbox Short"])
+
+		# The long one commits later and is numbered after what was consumed
+		frappe.flags.sync_outbox_pending = long_transaction
+		sequence_outbox_entries()
+		self.assertEqual(self.pull_names(), ["_Test Outbox Long"])
+
+	def test_rolled_back_entry_not_numbered(self):
+		add_entry("_Test Outbox Kept")
+		frappe.db.savepoint("outbox")
+		add_entry("_Test Outbox Dropped")
+		frappe.db.rollback(save_point="outbox")
+
+		sequence_outbox_entries()
+		self.assertEqual(self.pull_names(), ["_Test Outbox Kept"])
+		self.assertFalse(frappe.db.exists("Sync Outbox", {"reference_name": "_Test Outbox Dropped"}))
+
+	def test_doctypes_filter_still_advances(self):
+		add_entry("_Test Outbox Item")
+		add_to_outbox(_dict({"doctype": "Stock Entry", "name": "_Test Outbox Entry"}), "on_submit")
+		sequence_outbox_entries()
+
+		result = pull_outbox(CONSUMER, doctypes=["Stock Entry"])
+		self.assertEqual([entry.reference_name for entry in result["entries"]], ["_Test Outbox Entry"])
+		self.assertEqual(result["last_seq"], get_seq_counter())
@@ -0,0 +1,131 @@
+# Copyright (c) 2026, Printechs and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from erpnext.stock.doctype.item.test_item import make_item
+from erpnext.stock.doctype.stock_entry.stock_entry import make_stock_in_entry
+from erpnext.stock.doctype.stock_entry.stock_entry_utils import make_stock_entry
+from erpnext.stock.doctype.warehouse.test_warehouse import create_warehouse
+
+from almoosa_customization.transit import rebuild_transit_ledger
+
+SOURCE_WAREHOUSE = "_Test Warehouse - _TC"
+RECEIVING_WAREHOUSE = "_Test Warehouse 1 - _TC"
+
+
+def get_ledger(outgoing_entry):
+	return {
+		row.outgoing_detail: row
+		for row in frappe.get_all(
+			"Transit Ledger Entry",
+			filters={"outgoing_entry": outgoing_entry},
+			fields=["outgoing_detail", "qty", "received_qty", "remaining_qty", "receipt_count", "is_open"],
+		)
+	}
+
+
+class TestTransitLedgerEntry(FrappeTestCase):
+	def setUp(self):
+		self.item = make_item(properties={"is_stock_item": 1}).name
+		self.transit_warehouse = create_warehouse(
+			"_Test Transit Ledger", properties={"warehouse_type": "Transit"}, company="_Test Company"
+		)
+		make_stock_entry(item_code=self.item, target=SOURCE_WAREHOUSE, qty=20, basic_rate=10)
+
+		# Two lines of the same item, so item-level matching cannot tell them apart
+		outgoing = make_stock_entry(
+			item_code=self.item,
+			source=SOURCE_WAREHOUSE,
+			target=self.transit_warehouse,
+			qty=5,
+			do_not_save=True,
+		)
+		outgoing.append(
+			"items",
+			{
+				"item_code": self.item,
+				"s_warehouse": SOURCE_WAREHOUSE,
+				"t_warehouse": self.transit_warehouse,
+				"qty": 3,
+				"conversion_factor": 1,
+			},
+		)
+		outgoing.stock_entry_type = "Material Transfer"
+		outgoing.add_to_transit = 1
+		outgoing.custom_receiving_warehouse = RECEIVING_WAREHOUSE
+		outgoing.insert()
+		outgoing.submit()
+		self.outgoing = outgoing
+
+	def tearDown(self):
+		frappe.db.rollback()
+
+	def receive(self, line, qty, keep_reference=True):
+		receipt = make_stock_in_entry(self.outgoing.name)
+		receipt.items = [row for row in receipt.items if row.ste_detail == line.name]
+		receipt.items[0].qty = qty
+		receipt.items[0].t_warehouse = RECEIVING_WAREHOUSE
+		if not keep_reference:
+			receipt.items[0].ste_detail = None
+		receipt.insert()
+		receipt.submit()
+		return receipt
+
+	def test_receipt_allocated_to_referenced_line(self):
+		first, second = self.outgoing.items
+		self.receive(second, 3)
+
+		ledger = get_ledger(self.outgoing.name)
+		self.assertEqual(ledger[first.name].received_qty, 0)
+		self.assertEqual(ledger[first.name].remaining_qty, 5)
+		self.assertEqual(ledger[first.name].is_open, 1)
+
+		self.assertEqual(ledger[second.name].received_qty, 3)
+		self.assertEqual(ledger[second.name].remaining_qty, 0)
+		self.assertEqual(ledger[second.name].receipt_count, 1)
+		self.assertEqual(ledger[second.name].is_open, 0)
+
+	def test_partial_receipts_add_up_per_line(self):
+		first, second = self.outgoing.items
+		self.receive(first, 2)
+		self.receive(first, 1)
+
+		ledger = get_ledger(self.outgoing.name)
+		self.assertEqual(ledger[first.name].received_qty, 3)
+		self.assertEqual(ledger[first.name].remaining_qty, 2)
+		self.assertEqual(ledger[first.name].receipt_count, 2)
+		self.assertEqual(ledger[second.name].received_qty, 0)
+
+	def test_rebuild_drops_cancelled_receipt(self):
+		first, _second = self.outgoing.items
+		receipt = self.receive(first, 5)
+		receipt.cancel()
+
+		rebuild_transit_ledger([self.outgoing.name])
+		ledger = get_ledger(self.outgoing.name)
+		self.assertEqual(ledger[first.name].received_qty, 0)
+		self.assertEqual(ledger[first.name].is_open, 1)
+
+	def test_receipt_without_reference_allocated_by_item(self):
+		first, second = self.outgoing.items
+		self.receive(second, 2)
+		# Without ste_detail the receipt goes to the first line of the item
+		self.receive(first, 4, keep_reference=False)
+
+		ledger = get_ledger(self.outgoing.name)
+		self.assertEqual(ledger[first.name].received_qty, 4)
+		self.assertEqual(ledger[first.name].remaining_qty, 1)
+		self.assertEqual(ledger[first.name].receipt_count, 1)
+		self.assertEqual(ledger[second.name].received_qty, 2)
+		self.assertEqual(ledger[second.name].receipt_count, 1)
+
+		# Once the first line is full the rest tops up the next one
+		self.receive(first, 2, keep_reference=False)
+
+		ledger = get_ledger(self.outgoing.name)
+		self.assertEqual(ledger[first.name].received_qty, 5)
+		self.assertEqual(ledger[first.name].is_open, 0)
+		self.assertEqual(ledger[second.name].received_qty, 3)
+		self.assertEqual(ledger[second.name].is_open, 0)
@@ -0,0 +1,15 @@
+# Copyright (c) 2026, Printechs and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+
+class TransitLedgerEntry(Document):
+	pass
+
+
+def on_doctype_update():
+	frappe.db.add_index("Transit Ledger Entry", ["is_open", "posting_datetime"])
+	frappe.db.add_index("Transit Ledger Entry", ["source_warehouse", "receiving_warehouse"])
+	frappe.db.add_index("Transit Ledger Entry", ["posting_datetime"])
@@ -3,6 +3,8 @@
 
 import frappe
 
+from almoosa_customization.utils import get_vat_rate
+
 # ---------------------------------------------------------
 #  PERMISSION CONFIGURATION
 # ---------------------------------------------------------
@@ -93,7 +95,8 @@ def mask_cost_fields(data):
 # ---------------------------------------------------------
 def get_data(filters):
     conditions = []
-    values = {}
+    # VAT rate is read once per run from the default sales tax template
+    values = {"vat_factor": 1 + get_vat_rate() / 100}
 
     # Handle datetime filtering with optional from/to dates
     from_datetime = filters.get("from_datetime")
@@ -106,18 +109,18 @@ def get_data(filters):
     # Build the datetime condition based on what we have
     if from_datetime and to_datetime:
         conditions.append(
-            "CONCAT(se.posting_date,' ',se.posting_time) BETWEEN %(from)s AND %(to)s"
+            "tle.posting_datetime BETWEEN %(from)s AND %(to)s"
         )
         values["from"] = from_datetime
         values["to"] = to_datetime
     elif to_datetime:
         conditions.append(
-            "CONCAT(se.posting_date,' ',se.posting_time) <= %(to)s"
+            "tle.posting_datetime <= %(to)s"
         )
         values["to"] = to_datetime
     elif from_datetime:
         conditions.append(
-            "CONCAT(se.posting_date,' ',se.posting_time) >= %(from)s"
+            "tle.posting_datetime >= %(from)s"
         )
         values["from"] = from_datetime
 
@@ -131,8 +134,8 @@ def get_data(filters):
 
     multi_filter("vendor_code", "b.custom_brand_code")
     multi_filter("supplier", "si.supplier")
-    multi_filter("item_code", "sed.item_code")
-    multi_filter("source_warehouse", "se.from_warehouse")
+    multi_filter("item_code", "tle.item_code")
+    multi_filter("source_warehouse", "tle.source_warehouse")
 
     # Item Group filter
     if filters.get("item_group_filter"):
@@ -149,20 +152,20 @@ def get_data(filters):
             values["item_group_filter"] = ig_val + "%"
 
     if filters.get("receiving_warehouse"):
-        conditions.append("se.custom_receiving_warehouse = %(rw)s")
+        conditions.append("tle.receiving_warehouse = %(rw)s")
         values["rw"] = filters.get("receiving_warehouse")
 
     where_clause = " AND ".join(conditions) if conditions else "1=1"
 
-    # Main query - NO HAVING clause, filter in Python instead
+    # Main query - driven by the open lines of the transit ledger
     query = f"""
         SELECT
-            se.posting_date,
-            se.posting_time,
-            se.name AS doc_no,
+            tle.posting_date,
+            tle.posting_time,
+            tle.outgoing_entry AS doc_no,
             se.owner,
-            se.from_warehouse AS from_warehouse,
-            se.custom_receiving_warehouse AS to_warehouse,
+            tle.source_warehouse AS from_warehouse,
+            tle.receiving_warehouse AS to_warehouse,
             b.custom_brand_code AS vendor_code,
             sup.supplier_name AS vendor_name,
             si.supplier AS vendor,
@@ -171,7 +174,7 @@ def get_data(filters):
             SUBSTRING_INDEX(SUBSTRING_INDEX(ig.name,'.',3),'.',-1) AS group_level_3,
             SUBSTRING_INDEX(SUBSTRING_INDEX(ig.name,'.',4),'.',-1) AS group_level_4,
             SUBSTRING_INDEX(ig.name,'.',-1) AS group_level_5,
-            sed.item_code,
+            tle.item_code,
             it.item_name,
             it.custom_model_no AS model_no,
             it.custom_product_type AS product_type,
@@ -182,45 +185,27 @@ def get_data(filters):
             ia_size.attribute_value AS size,
             ib.barcode,
             
-            /* Calculate remaining qty by subtracting received qty from end transit entries */
-            (sed.qty - COALESCE(received_qty.total_received, 0)) AS qty,
+            /* Remaining qty after receipts allocated by the transit ledger */
+            tle.remaining_qty AS qty,
             
             bin_src.valuation_rate AS unit_cost,
-            ((sed.qty - COALESCE(received_qty.total_received, 0)) * bin_src.valuation_rate) AS total_cost,
+            (tle.remaining_qty * bin_src.valuation_rate) AS total_cost,
             ip.price_list_rate AS unit_price_with_tax,
-            (ip.price_list_rate / 1.15) AS unit_price_wo_tax,
-            (ip.price_list_rate - (ip.price_list_rate / 1.15)) AS unit_tax,
-            (ip.price_list_rate * (sed.qty - COALESCE(received_qty.total_received, 0))) AS total_price,
+            (ip.price_list_rate / %(vat_factor)s) AS unit_price_wo_tax,
+            (ip.price_list_rate - (ip.price_list_rate / %(vat_factor)s)) AS unit_tax,
+            (ip.price_list_rate * tle.remaining_qty) AS total_price,
             bin_src.actual_qty AS oh_source,
             bin_tgt.actual_qty AS oh_target,
             
             /* Show original qty for reference */
-            sed.qty AS original_transit_qty,
-            COALESCE(received_qty.total_received, 0) AS received_qty,
-            COALESCE(received_qty.end_transit_count, 0) AS end_transit_entries
+            tle.qty AS original_transit_qty,
+            tle.received_qty,
+            tle.receipt_count AS end_transit_entries
 
-        FROM `tabStock Entry` se
-        JOIN `tabStock Entry Detail` sed ON sed.parent = se.name
-        
-        /* Subquery to calculate total received qty from end transit entries */
-        /* End Transit entries: outgoing_stock_entry IS NOT NULL (references original entry) */
-        LEFT JOIN (
-            SELECT 
-                se2.outgoing_stock_entry AS original_entry,
-                sed2.item_code,
-                SUM(sed2.qty) AS total_received,
-                COUNT(DISTINCT se2.name) AS end_transit_count
-            FROM `tabStock Entry Detail` sed2
-            JOIN `tabStock Entry` se2 ON se2.name = sed2.parent
-            WHERE se2.docstatus = 1
-              AND se2.stock_entry_type = 'Material Transfer'
-              AND se2.outgoing_stock_entry IS NOT NULL
-            GROUP BY se2.outgoing_stock_entry, sed2.item_code
-        ) received_qty 
-            ON received_qty.original_entry = se.name 
-            AND received_qty.item_code = sed.item_code
+        FROM `tabTransit Ledger Entry` tle
+        JOIN `tabStock Entry` se ON se.name = tle.outgoing_entry
 
-        LEFT JOIN `tabItem` it ON it.name = sed.item_code
+        LEFT JOIN `tabItem` it ON it.name = tle.item_code
         LEFT JOIN `tabItem Group` ig ON ig.name = it.item_group
         LEFT JOIN `tabBrand` b ON b.name = it.brand
         LEFT JOIN `tabItem Supplier` si ON si.parent = it.name
@@ -228,11 +213,11 @@ def get_data(filters):
         LEFT JOIN `tabItem Barcode` ib ON ib.parent = it.name
 
         LEFT JOIN `tabItem Price` ip
-            ON ip.item_code = sed.item_code
+            ON ip.item_code = tle.item_code
            AND ip.selling = 1
            AND ip.price_list = 'RSP'
-           AND ip.valid_from <= se.posting_date
-           AND (ip.valid_upto IS NULL OR ip.valid_upto >= se.posting_date)
+           AND ip.valid_from <= tle.posting_date
+           AND (ip.valid_upto IS NULL OR ip.valid_upto >= tle.posting_date)
 
         LEFT JOIN `tabItem Variant Attribute` ia_color
             ON ia_color.parent = it.name AND ia_color.attribute='Color Name'
@@ -244,24 +229,12 @@ def get_data(filters):
             ON ia_size.parent = it.name AND ia_size.attribute='Size'
 
         LEFT JOIN `tabBin` bin_src
-            ON bin_src.item_code = sed.item_code AND bin_src.warehouse = se.from_warehouse
+            ON bin_src.item_code = tle.item_code AND bin_src.warehouse = tle.source_warehouse
         LEFT JOIN `tabBin` bin_tgt
-            ON bin_tgt.item_code = sed.item_code AND bin_tgt.warehouse = se.custom_receiving_warehouse
+            ON bin_tgt.item_code = tle.item_code AND bin_tgt.warehouse = tle.receiving_warehouse
 
-        WHERE se.docstatus = 1
-          AND se.stock_entry_type = 'Material Transfer'
-          AND se.add_to_transit = 1
+        WHERE tle.is_open = 1
           AND {where_clause}
     """
 
-    result = frappe.db.sql(query, values, as_dict=True)
-    
-    # Filter in Python: only keep rows with remaining qty > 0
-    # This avoids the SQL HAVING clause issue with subquery columns
-    filtered_result = []
-    for row in result:
-        remaining_qty = row.get('qty') or 0
-        if remaining_qty > 0:
-            filtered_result.append(row)
-    
-    return filtered_result
\ No newline at end of file
+    return frappe.db.sql(query, values, as_dict=True)
\ No newline at end of file
@@ -38,54 +38,16 @@ frappe.query_reports["Item Sales Details"] = {
             }
         },
         {
-    fieldname: "item_group_filter",
-    label: "Item Group",
-    fieldtype: "MultiSelectList",
-    get_data: function (txt) {
-        return new Promise(resolve => {
-            frappe.call({
-                method: "frappe.client.get_list",
-                args: {
-                    doctype: "Item Group",
-                    fields: ["name"],
-                    limit_page_length: 5000
-                },
-                callback: function(r) {
-                    let rows = r.message || [];
-                    let search = txt.toLowerCase();
-
-                    // Filter + sort logic
-                    let filtered = rows
-                        .filter(d => d.name.toLowerCase().includes(search))
-                        .map(d => ({
-                            value: d.name,
-                            label: d.name,
-                            description: d.name
-                        }))
-                        .sort((a, b) => {
-                            const aName = a.value.toLowerCase();
-                            const bName = b.value.toLowerCase();
-
-                            // 1. Exact match first
-                            if (aName === search) return -1;
-                            if (bName === search) return 1;
-
-                            // 2. Starts-with matches next
-                            const aStarts = aName.startsWith(search);
-                            const bStarts = bName.startsWith(search);
-                            if (aStarts && !bStarts) return -1;
-                            if (!aStarts && bStarts) return 1;
-
-                            // 3. Alphabetical fallback
-                            return aName.localeCompare(bName);
-                        });
-
-                    resolve(filtered);
-                }
-            });
-        });
-    }
-},
+            fieldname: "item_group_filter",
+            label: "Item Group",
+            fieldtype: "MultiSelectList",
+            get_data: function(txt) {
+                return frappe.call({
+                    method: "almoosa_customization.item_group_tree.search_item_groups",
+                    args: { txt: txt }
+                }).then(r => r.message || []);
+            }
+        },
 
         {
             fieldname: "item_code",
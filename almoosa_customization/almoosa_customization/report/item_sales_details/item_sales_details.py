@@ -2,6 +2,8 @@ import frappe
 from frappe.utils import get_datetime
 from decimal import Decimal, ROUND_HALF_UP
 
+from almoosa_customization.utils import get_vat_rate
+
 
 def execute(filters=None):
     columns = get_columns()
@@ -110,6 +112,15 @@ def get_data(filters):
             conditions.append("ig.name LIKE %(item_group_filter)s")
             values["item_group_filter"] = ig_val + "%"
 
+    # VAT rate is read once per run from the default sales tax template
+    vat_rate = get_vat_rate() / 100
+    values["vat_rate"] = vat_rate
+    values["vat_factor"] = 1 + vat_rate
+
+    # Discount per unit incl. VAT, shared by the derived columns below
+    unit_discount = "(pii.discount_amount + (pii.distributed_discount_amount * %(vat_factor)s)/pii.qty)"
+    unit_rate_w_vat = f"(COALESCE(pii.price_list_rate, 0) - ABS(COALESCE({unit_discount}, 0)))"
+
     where_clause = "  AND ".join(conditions) if conditions else "1=1"
 
     query = f"""
@@ -143,9 +154,9 @@ def get_data(filters):
             --si.supplier AS vendor,
             b.custom_brand_code as vendor, 
             sup.supplier_name AS vendor_name,
-            (pii.discount_amount + (pii.distributed_discount_amount * 1.15)/pii.qty) AS discount_amount,
-            (ABS((pii.discount_amount * pii.qty) + (pii.distributed_discount_amount * 1.15))) AS total_discount,
-            (pii.distributed_discount_amount * 1.15) as distributed_discount_amount,
+            {unit_discount} AS discount_amount,
+            (ABS((pii.discount_amount * pii.qty) + (pii.distributed_discount_amount * %(vat_factor)s))) AS total_discount,
+            (pii.distributed_discount_amount * %(vat_factor)s) as distributed_discount_amount,
             pii.custom_discount_reason AS discount_reason,
             pii.item_code,
             pii.item_name,
@@ -155,7 +166,12 @@ def get_data(filters):
             it.custom_model_no AS model_no,
             pii.net_rate AS net_rate,
 			pii.net_amount AS net_amount,
-			pii.amount AS gross_amount,            
+			pii.amount AS gross_amount,
+            {unit_rate_w_vat} AS unit_rate_w_vat,
+            (pii.qty * {unit_rate_w_vat}) AS total,
+            COALESCE(pii.net_amount, 0) AS net_total,
+            COALESCE(pii.net_rate * %(vat_rate)s, 0) AS vat_amount,
+            COALESCE(pii.net_rate * %(vat_rate)s * pii.qty, 0) AS vat_total,
             COALESCE((bin.valuation_rate * pii.qty),0) AS total_cost
         FROM `tabPOS Invoice` pi
         JOIN `tabPOS Invoice Item` pii ON pii.parent = pi.name
@@ -178,26 +194,4 @@ def get_data(filters):
         WHERE pi.custom_exclude=0 AND pi.docstatus=1 {where_clause}
     """
 
-    rows = frappe.db.sql(query, values, as_dict=True)
-
-    for row in rows:
-        
-        unit_rate_w_vat = row["original_price"] - abs(row["discount_amount"]) or 0
-        gross = row.get("qty") * unit_rate_w_vat or 0  # with VAT
-                
-        net = row.get("net_amount") or 0      # without VAT
-        
-        vat_amount= (row["net_rate"] * 0.15) or 0
-        vat_total = vat_amount * row.get("qty") or 0          # VAT per line
-        
-        row["unit_rate_w_vat"] = unit_rate_w_vat
-        row["total"] = gross                  # Total (with VAT)
-        
-        row["net_total"] = net         #  Net Total W/O Vat
-        
-        row["vat_amount"] = vat_amount 
-        row["vat_total"] = vat_total               # Vat Total
-        
-        
-
-    return rows
\ No newline at end of file
+    return frappe.db.sql(query, values, as_dict=True)
\ No newline at end of file
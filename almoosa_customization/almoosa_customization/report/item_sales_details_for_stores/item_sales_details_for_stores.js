@@ -41,54 +41,16 @@ frappe.query_reports["Item Sales Details for Stores"] = {
             }
         },
         {
-    fieldname: "item_group_filter",
-    label: "Item Group",
-    fieldtype: "MultiSelectList",
-    get_data: function (txt) {
-        return new Promise(resolve => {
-            frappe.call({
-                method: "frappe.client.get_list",
-                args: {
-                    doctype: "Item Group",
-                    fields: ["name"],
-                    limit_page_length: 5000
-                },
-                callback: function(r) {
-                    let rows = r.message || [];
-                    let search = txt.toLowerCase();
-
-                    // Filter + sort logic
-                    let filtered = rows
-                        .filter(d => d.name.toLowerCase().includes(search))
-                        .map(d => ({
-                            value: d.name,
-                            label: d.name,
-                            description: d.name
-                        }))
-                        .sort((a, b) => {
-                            const aName = a.value.toLowerCase();
-                            const bName = b.value.toLowerCase();
-
-                            // 1. Exact match first
-                            if (aName === search) return -1;
-                            if (bName === search) return 1;
-
-                            // 2. Starts-with matches next
-                            const aStarts = aName.startsWith(search);
-                            const bStarts = bName.startsWith(search);
-                            if (aStarts && !bStarts) return -1;
-                            if (!aStarts && bStarts) return 1;
-
-                            // 3. Alphabetical fallback
-                            return aName.localeCompare(bName);
-                        });
-
-                    resolve(filtered);
-                }
-            });
-        });
-    }
-},
+            fieldname: "item_group_filter",
+            label: "Item Group",
+            fieldtype: "MultiSelectList",
+            get_data: function(txt) {
+                return frappe.call({
+                    method: "almoosa_customization.item_group_tree.search_item_groups",
+                    args: { txt: txt }
+                }).then(r => r.message || []);
+            }
+        },
 
         {
             fieldname: "item_code",
@@ -109,6 +71,50 @@ frappe.query_reports["Item Sales Details for Stores"] = {
             args: { txt: txt }
         }).then(r => r.message || []);
     }
-} 
-    ]
+},
+        {
+            fieldname: "load_on_scroll",
+            label: "Load Rows On Scroll",
+            fieldtype: "Check",
+            default: 1
+        }
+    ],
+
+    after_datatable_render: function(datatable) {
+        setup_load_on_scroll(datatable);
+    }
 };
+
+// Fetch the next keyset page when the user scrolls near the end of the table
+function setup_load_on_scroll(datatable) {
+    const report = frappe.query_report;
+    const state = { loading: false, done: !report.get_filter_value("load_on_scroll") };
+
+    $(datatable.bodyScrollable).off("scroll.load_more").on("scroll.load_more", function() {
+        if (state.loading || state.done) return;
+        if (this.scrollTop + this.clientHeight < this.scrollHeight - 200) return;
+
+        const last = report.data[report.data.length - 1];
+        if (!last) return;
+
+        state.loading = true;
+        frappe.call({
+            method: "almoosa_customization.almoosa_customization.report.item_sales_details_for_stores.item_sales_details_for_stores.get_next_page",
+            args: {
+                filters: report.get_filter_values(),
+                cursor: [last.posting_date, last.posting_time, last.pos_invoice, last.item_idx]
+            }
+        }).then(r => {
+            const page = r.message || {};
+            const rows = page.rows || [];
+            state.done = !page.has_more;
+
+            if (rows.length) {
+                report.data.push(...rows);
+                datatable.appendRows(rows);
+            }
+        }).always(() => {
+            state.loading = false;
+        });
+    });
+}
@@ -2,87 +2,39 @@ import frappe
 from frappe.utils import get_datetime
 from decimal import Decimal, ROUND_HALF_UP
 
+from almoosa_customization.utils import get_keyset_condition, get_vat_rate
+from almoosa_customization.warehouse_permissions import (
+    filter_permitted_warehouses,
+    get_user_allowed_warehouses,
+    search_warehouses,
+)
+
+
+# Rows per page when the report loads rows on scroll
+PAGE_LENGTH = 500
+MAX_PAGE_LENGTH = 5000
+
 
 def execute(filters=None):
     columns = get_columns()
+
+    # Paginated mode: first page only, totals come from a separate aggregate.
+    # The total row would only add up the rows loaded so far, so it is skipped.
+    if filters.get("load_on_scroll"):
+        data = get_data(filters, page_length=PAGE_LENGTH)
+        return columns, data, None, None, get_report_summary(filters), True
+
     data = get_data(filters)
     return columns, data
 
 
 @frappe.whitelist()
-def get_allowed_warehouses(txt=""):
+def get_allowed_warehouses(txt="", company=None):
     """
     Returns warehouses based on User Permissions.
     Checks User Permission for 'Warehouse' doctype where Applicable For is POS Invoice.
     """
-    user = frappe.session.user
-    
-    # If Administrator, return all warehouses
-    if user == "Administrator":
-        warehouses = frappe.get_all(
-            "Warehouse",
-            filters={
-                "is_group": 0,
-                "disabled": 0,
-                "name": ["like", f"%{txt}%"]
-            },
-            fields=["name as value", "name as description"],
-            limit=50
-        )
-        return warehouses
-    
-    # Get warehouses where user has permission with Applicable For = POS Invoice
-    # or where Applicable For is not set (applies to all)
-    user_perms = frappe.get_all(
-        "User Permission",
-        filters={
-            "user": user,
-            "allow": "Warehouse"
-        },
-        fields=["for_value", "applicable_for"]
-    )
-    
-    allowed_warehouses = []
-    for perm in user_perms:
-        # Check if this permission is for POS Invoice specifically or all doctypes
-        if not perm.applicable_for or perm.applicable_for == "POS Invoice":
-            allowed_warehouses.append(perm.for_value)
-    
-    # If no specific warehouse permissions found, check if user has general POS Invoice access
-    if not allowed_warehouses:
-        has_pos_access = frappe.has_permission("POS Invoice", "read", user=user)
-        if has_pos_access:
-            # Return all warehouses if user has general POS Invoice access
-            warehouses = frappe.get_all(
-                "Warehouse",
-                filters={
-                    "is_group": 0,
-                    "disabled": 0,
-                    "name": ["like", f"%{txt}%"]
-                },
-                fields=["name as value", "name as description"],
-                limit=50
-            )
-            return warehouses
-        else:
-            return []
-    
-    # Filter by search text and return allowed warehouses only
-    if allowed_warehouses:
-        warehouses = frappe.get_all(
-            "Warehouse",
-            filters={
-                "name": ["in", allowed_warehouses],
-                "is_group": 0,
-                "disabled": 0,
-                "name": ["like", f"%{txt}%"]
-            },
-            fields=["name as value", "name as description"],
-            limit=50
-        )
-        return warehouses
-    
-    return []
+    return search_warehouses(txt, company=company)
 
 
 # ---------------------------------------------------------
@@ -143,13 +95,26 @@ def get_columns():
 # ---------------------------------------------------------
 #  DATA QUERY
 # ---------------------------------------------------------
-def get_data(filters=None):
+# Joins needed by the item level filters (vendor, supplier, item group)
+FILTER_JOINS = """
+        LEFT JOIN `tabItem` it ON it.name = pii.item_code
+        LEFT JOIN `tabBrand` b ON b.name = it.brand
+        LEFT JOIN `tabItem Supplier` si ON si.parent = it.name
+        LEFT JOIN `tabItem Group` ig ON ig.name = it.item_group
+"""
+
+# Keyset order: posting date/time, invoice, item row
+KEYSET_ORDER = "pi.posting_date, pi.posting_time, pi.name, pii.idx"
+
+
+def get_conditions(filters):
+    """Return (where_clause, values) or (None, None) if no warehouse is permitted"""
     conditions = []
     values = {}
 
     # Date filter
     if filters.get("from_datetime") and filters.get("to_datetime"):
-        conditions.append(" AND CONCAT(pi.posting_date, ' ', pi.posting_time) BETWEEN %(from)s AND %(to)s")
+        conditions.append("CONCAT(pi.posting_date, ' ', pi.posting_time) BETWEEN %(from)s AND %(to)s")
         values["from"] = filters.get("from_datetime")
         values["to"] = filters.get("to_datetime")
 
@@ -169,7 +134,7 @@ def get_data(filters=None):
                 if f == "warehouse":
                     val = validate_warehouse_permissions(val)
                     if not val:
-                        return []  # No valid warehouses, return empty
+                        return None, None  # No valid warehouses, return empty
                 conditions.append(f"{sql_field} IN %(f_{f})s")
                 values[f"f_{f}"] = val
             elif isinstance(val, str):
@@ -177,7 +142,7 @@ def get_data(filters=None):
                 if f == "warehouse":
                     items = validate_warehouse_permissions(items)
                     if not items:
-                        return []
+                        return None, None
                 conditions.append(f"{sql_field} IN %(f_{f})s")
                 values[f"f_{f}"] = items
 
@@ -204,7 +169,52 @@ def get_data(filters=None):
             conditions.append("pi.set_warehouse IN %(auto_warehouses)s")
             values["auto_warehouses"] = allowed_warehouses
 
-    where_clause = "  AND ".join(conditions) if conditions else "1=1"
+    # VAT rate is read once per run from the default sales tax template
+    vat_rate = get_vat_rate() / 100
+    values["vat_rate"] = vat_rate
+    values["vat_factor"] = 1 + vat_rate
+
+    where_clause = "".join(f" AND {c}" for c in conditions)
+    return where_clause, values
+
+
+def get_data(filters=None, cursor=None, page_length=None):
+    """Return report rows, or one keyset page of them when page_length is set.
+
+    cursor is the (posting_date, posting_time, invoice, item idx) of the last
+    row already shown; a page always holds whole invoice item rows.
+    """
+    where_clause, values = get_conditions(filters)
+    if where_clause is None:
+        return []
+
+    # Discount per unit incl. VAT, shared by the derived columns below
+    unit_discount = "(pii.discount_amount + (pii.distributed_discount_amount * %(vat_factor)s)/pii.qty)"
+    unit_rate_w_vat = f"(COALESCE(pii.price_list_rate, 0) - ABS(COALESCE({unit_discount}, 0)))"
+
+    page_join = ""
+    order_by = ""
+    if page_length:
+        keyset = ""
+        if cursor:
+            keyset = "AND " + get_keyset_condition(
+                ["pi.posting_date", "pi.posting_time", "pi.name", "pii.idx"],
+                ["c_date", "c_time", "c_invoice", "c_idx"],
+            )
+            values.update(zip(("c_date", "c_time", "c_invoice", "c_idx"), cursor))
+
+        values["page_length"] = int(page_length)
+        page_join = f"""
+        JOIN (
+            SELECT DISTINCT pii.name, {KEYSET_ORDER}
+            FROM `tabPOS Invoice` pi
+            JOIN `tabPOS Invoice Item` pii ON pii.parent = pi.name
+            {FILTER_JOINS}
+            WHERE pi.custom_exclude=0 AND pi.docstatus=1 {where_clause} {keyset}
+            ORDER BY {KEYSET_ORDER}
+            LIMIT %(page_length)s
+        ) page ON page.name = pii.name"""
+        order_by = f"ORDER BY {KEYSET_ORDER}"
 
     query = f"""
         SELECT
@@ -236,9 +246,9 @@ def get_data(filters=None):
             
             b.custom_brand_code as vendor, 
             sup.supplier_name AS vendor_name,
-            (pii.discount_amount + (pii.distributed_discount_amount * 1.15)/pii.qty) AS discount_amount,
-            (ABS((pii.discount_amount * pii.qty) + (pii.distributed_discount_amount * 1.15))) AS total_discount,
-            (pii.distributed_discount_amount * 1.15) as distributed_discount_amount,
+            {unit_discount} AS discount_amount,
+            (ABS((pii.discount_amount * pii.qty) + (pii.distributed_discount_amount * %(vat_factor)s))) AS total_discount,
+            (pii.distributed_discount_amount * %(vat_factor)s) as distributed_discount_amount,
             pii.custom_discount_reason AS discount_reason,
             pii.item_code,
             pii.item_name,
@@ -248,16 +258,22 @@ def get_data(filters=None):
             it.custom_model_no AS model_no,
             pii.net_rate AS net_rate,
             pii.net_amount AS net_amount,
-            pii.amount AS gross_amount,            
-            COALESCE((bin.valuation_rate * pii.qty),0) AS total_cost
+            pii.amount AS gross_amount,
+            {unit_rate_w_vat} AS unit_rate_w_vat,
+            (pii.qty * {unit_rate_w_vat}) AS total,
+            COALESCE(pii.net_amount, 0) AS net_total,
+            COALESCE(pii.net_rate * %(vat_rate)s, 0) AS vat_amount,
+            COALESCE(pii.net_rate * %(vat_rate)s * pii.qty, 0) AS vat_total,
+            COALESCE((bin.valuation_rate * pii.qty),0) AS total_cost,
+            pi.name AS pos_invoice,
+            pii.idx AS item_idx
         FROM `tabPOS Invoice` pi
         JOIN `tabPOS Invoice Item` pii ON pii.parent = pi.name
-        LEFT JOIN `tabItem` it ON it.name = pii.item_code
+        {page_join}
+        {FILTER_JOINS}
         LEFT JOIN `tabBin` bin ON bin.item_code = pii.item_code AND bin.warehouse = pi.set_warehouse
         LEFT JOIN `tabCustomer` c ON c.name = pi.customer
         LEFT JOIN `tabItem Barcode` ib ON ib.parent = it.name
-        LEFT JOIN `tabBrand` b ON b.name = it.brand
-        LEFT JOIN `tabItem Supplier` si ON si.parent = it.name
         LEFT JOIN `tabSupplier` sup ON sup.name = si.supplier
         LEFT JOIN `tabSales Team` st ON st.parent = pi.name
         LEFT JOIN `tabSales Person` sp ON sp.name = st.sales_person
@@ -267,72 +283,82 @@ def get_data(filters=None):
         LEFT JOIN `tabItem Variant Attribute` ia_colorname ON ia_colorname.parent = it.name AND ia_colorname.attribute = 'Color Name'
         LEFT JOIN `tabItem Variant Attribute` ia_size ON ia_size.parent = it.name AND ia_size.attribute = 'Size'
         LEFT JOIN `tabItem Variant Attribute` ia_year ON ia_year.parent = it.name AND ia_year.attribute = 'Year'
-        LEFT JOIN `tabItem Group` ig ON ig.name = it.item_group
         WHERE pi.custom_exclude=0 AND pi.docstatus=1 {where_clause}
+        {order_by}
     """
 
-    rows = frappe.db.sql(query, values, as_dict=True)
+    return frappe.db.sql(query, values, as_dict=True)
+
+
+def get_totals(filters):
+    """Aggregate totals over every matching invoice item row, independent of paging"""
+    where_clause, values = get_conditions(filters)
+    if where_clause is None:
+        return frappe._dict()
+
+    unit_discount = "(pii.discount_amount + (pii.distributed_discount_amount * %(vat_factor)s)/pii.qty)"
+    unit_rate_w_vat = f"(COALESCE(pii.price_list_rate, 0) - ABS(COALESCE({unit_discount}, 0)))"
+
+    totals = frappe.db.sql(f"""
+        SELECT
+            COUNT(*) AS lines,
+            COALESCE(SUM(t.qty), 0) AS qty,
+            COALESCE(SUM(t.total), 0) AS total,
+            COALESCE(SUM(t.net_total), 0) AS net_total,
+            COALESCE(SUM(t.vat_total), 0) AS vat_total
+        FROM (
+            SELECT DISTINCT
+                pii.name,
+                pii.qty,
+                (pii.qty * {unit_rate_w_vat}) AS total,
+                COALESCE(pii.net_amount, 0) AS net_total,
+                COALESCE(pii.net_rate * %(vat_rate)s * pii.qty, 0) AS vat_total
+            FROM `tabPOS Invoice` pi
+            JOIN `tabPOS Invoice Item` pii ON pii.parent = pi.name
+            {FILTER_JOINS}
+            WHERE pi.custom_exclude=0 AND pi.docstatus=1 {where_clause}
+        ) t
+    """, values, as_dict=True)
+
+    return totals[0]
 
-    for row in rows:
-        unit_rate_w_vat = row["original_price"] - abs(row["discount_amount"]) or 0
-        gross = row.get("qty") * unit_rate_w_vat or 0
-        net = row.get("net_amount") or 0
-        vat_amount = (row["net_rate"] * 0.15) or 0
-        vat_total = vat_amount * row.get("qty") or 0
-        
-        row["unit_rate_w_vat"] = unit_rate_w_vat
-        row["total"] = gross
-        row["net_total"] = net
-        row["vat_amount"] = vat_amount 
-        row["vat_total"] = vat_total
 
-    return rows
+def get_report_summary(filters):
+    totals = get_totals(filters)
+    if not totals:
+        return []
+
+    return [
+        {"value": totals.lines, "label": "Lines", "datatype": "Int", "indicator": "Blue"},
+        {"value": totals.qty, "label": "Quantity", "datatype": "Float", "indicator": "Blue"},
+        {"value": totals.total, "label": "Grand Total (Incl. VAT)", "datatype": "Currency", "indicator": "Green"},
+        {"value": totals.net_total, "label": "Net Total (Excl. VAT)", "datatype": "Currency", "indicator": "Green"},
+        {"value": totals.vat_total, "label": "Vat Total", "datatype": "Currency", "indicator": "Green"},
+    ]
+
+
+@frappe.whitelist()
+def get_next_page(filters, cursor, page_length=PAGE_LENGTH):
+    """Return the page of rows following cursor for on-scroll loading"""
+    if not frappe.get_doc("Report", "Item Sales Details for Stores").is_permitted():
+        frappe.throw("Not permitted", frappe.PermissionError)
+
+    filters = frappe._dict(frappe.parse_json(filters))
+    cursor = frappe.parse_json(cursor)
+    page_length = min(int(page_length), MAX_PAGE_LENGTH)
+
+    rows = get_data(filters, cursor=cursor, page_length=page_length)
+    lines = {(row.pos_invoice, row.item_idx) for row in rows}
+
+    return {"rows": rows, "has_more": len(lines) >= page_length}
 
 
 def get_user_allowed_warehouses_list():
     """Get list of warehouse names current user is permitted to access."""
-    user = frappe.session.user
-    
-    if user == "Administrator":
-        return None  # Admin sees all, no restriction needed
-    
-    # Check User Permission records for Warehouse doctype
-    # where Applicable For is POS Invoice or empty
-    perms = frappe.get_all(
-        "User Permission",
-        filters={
-            "user": user,
-            "allow": "Warehouse"
-        },
-        fields=["for_value", "applicable_for"]
-    )
-    
-    warehouse_list = []
-    for perm in perms:
-        # Include if applicable_for is POS Invoice or not set (applies to all)
-        if not perm.applicable_for or perm.applicable_for == "POS Invoice":
-            warehouse_list.append(perm.for_value)
-    
-    # If no warehouse-specific permissions, check general POS Invoice access
-    if not warehouse_list:
-        if frappe.has_permission("POS Invoice", "read", user=user):
-            return None  # Has general access, no specific warehouse restrictions
-    
-    return warehouse_list if warehouse_list else []
+    # None: no restriction needed, []: no access
+    return get_user_allowed_warehouses()
 
 
 def validate_warehouse_permissions(warehouse_list):
     """Filter warehouse list to only include permitted warehouses."""
-    if not warehouse_list:
-        return []
-    
-    user = frappe.session.user
-    if user == "Administrator":
-        return warehouse_list
-    
-    allowed = get_user_allowed_warehouses_list()
-    if allowed is None:
-        return warehouse_list  # No restrictions
-    
-    # Return only intersection of requested and allowed
-    return [w for w in warehouse_list if w in allowed]
\ No newline at end of file
+    return filter_permitted_warehouses(warehouse_list)
@@ -0,0 +1,78 @@
+import frappe
+from frappe import _dict
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import add_to_date, get_datetime_str, now_datetime
+
+from erpnext.accounts.doctype.pos_invoice.test_pos_invoice import create_pos_invoice
+from erpnext.stock.doctype.item.test_item import make_item
+from erpnext.stock.doctype.stock_entry.stock_entry_utils import make_stock_entry
+
+from almoosa_customization.almoosa_customization.report.item_sales_details_for_stores.item_sales_details_for_stores import (
+	get_data,
+	get_totals,
+)
+
+WAREHOUSE = "_Test Warehouse - _TC"
+
+
+def make_pos_sale(item_code, qty, rate=100):
+	pos_inv = create_pos_invoice(item=item_code, qty=qty, rate=rate, warehouse=WAREHOUSE, do_not_save=1)
+	pos_inv.append("payments", {"mode_of_payment": "Cash", "account": "Cash - _TC", "amount": qty * rate})
+	pos_inv.insert()
+	pos_inv.submit()
+	return pos_inv
+
+
+def line_keys(rows):
+	"""(invoice, item row) of each line, in order; joins may repeat a line"""
+	return list(dict.fromkeys((row.pos_invoice, row.item_idx) for row in rows))
+
+
+class TestItemSalesDetailsForStores(FrappeTestCase):
+	def setUp(self):
+		self.item = make_item(properties={"is_stock_item": 1}).name
+		make_stock_entry(item_code=self.item, target=WAREHOUSE, qty=100, basic_rate=10)
+
+		for qty in (1, 2, 3, 4, 5):
+			make_pos_sale(self.item, qty)
+
+		self.filters = _dict(
+			{
+				"from_datetime": get_datetime_str(add_to_date(now_datetime(), days=-1)),
+				"to_datetime": get_datetime_str(add_to_date(now_datetime(), days=1)),
+				"item_code": [self.item],
+			}
+		)
+
+	def tearDown(self):
+		frappe.db.rollback()
+
+	def get_all_pages(self, page_length):
+		keys = []
+		cursor = None
+
+		while True:
+			rows = get_data(self.filters, cursor=cursor, page_length=page_length)
+			if not rows:
+				return keys
+
+			page = line_keys(rows)
+			self.assertLessEqual(len(page), page_length)
+			keys.extend(page)
+
+			last = rows[-1]
+			cursor = (last.posting_date, last.posting_time, last.pos_invoice, last.item_idx)
+
+	def test_pages_cover_every_line_once(self):
+		expected = line_keys(get_data(self.filters))
+		self.assertEqual(len(expected), 5)
+
+		for page_length in (1, 2, 5, 10):
+			keys = self.get_all_pages(page_length)
+			self.assertEqual(len(keys), len(set(keys)), msg=f"{page_length=}")
+			self.assertEqual(set(keys), set(expected), msg=f"{page_length=}")
+
+	def test_totals_independent_of_paging(self):
+		totals = get_totals(self.filters)
+		self.assertEqual(totals.lines, 5)
+		self.assertEqual(totals.qty, 15)
@@ -316,13 +316,7 @@ def get_data(filters):
                 ELSE 0 
             END AS per_percentage,
             
-            COALESCE(
-				(SELECT AVG(valuation_rate) 
-				FROM `tabBin` 
-				WHERE item_code = mr_item.item_code 
-				-- AND warehouse IN (mr.set_from_warehouse, mr.set_warehouse)
-				), 0
-			) AS unit_cost,
+            COALESCE(icm.avg_valuation_rate, 0) AS unit_cost,
             (mr_item.qty * COALESCE(ip.price_list_rate, 0)) AS total_order_price,
             (mr_item.ordered_qty * COALESCE(ip.price_list_rate, 0)) AS total_transferred_price,
             
@@ -331,6 +325,7 @@ def get_data(filters):
         FROM `tabMaterial Request` mr
         INNER JOIN `tabMaterial Request Item` mr_item ON mr_item.parent = mr.name
         LEFT JOIN `tabItem` item ON item.name = mr_item.item_code
+        LEFT JOIN `tabItem Current Metrics` icm ON icm.name = mr_item.item_code
         -- LEFT JOIN `tabBin` bin ON bin.item_code = mr_item.item_code 
             -- AND bin.warehouse = mr.set_from_warehouse
         LEFT JOIN `tabItem Price` ip ON ip.item_code = mr_item.item_code
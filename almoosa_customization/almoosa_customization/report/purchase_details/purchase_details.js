@@ -39,45 +39,11 @@ frappe.query_reports["Purchase Details"] = {
             fieldname: "item_group_filter",
             label: "Item Group",
             fieldtype: "MultiSelectList",
-            get_data: function (txt) {
-                return new Promise(resolve => {
-                    frappe.call({
-                        method: "frappe.client.get_list",
-                        args: {
-                            doctype: "Item Group",
-                            fields: ["name"],
-                            limit_page_length: 5000
-                        },
-                        callback: function (r) {
-                            let rows = r.message || [];
-                            let search = txt.toLowerCase();
-
-                            let filtered = rows
-                                .filter(d => d.name.toLowerCase().includes(search))
-                                .map(d => ({
-                                    value: d.name,
-                                    label: d.name,
-                                    description: d.name
-                                }))
-                                .sort((a, b) => {
-                                    const aName = a.value.toLowerCase();
-                                    const bName = b.value.toLowerCase();
-
-                                    if (aName === search) return -1;
-                                    if (bName === search) return 1;
-
-                                    const aStarts = aName.startsWith(search);
-                                    const bStarts = bName.startsWith(search);
-                                    if (aStarts && !bStarts) return -1;
-                                    if (!aStarts && bStarts) return 1;
-
-                                    return aName.localeCompare(bName);
-                                });
-
-                            resolve(filtered);
-                        }
-                    });
-                });
+            get_data: function(txt) {
+                return frappe.call({
+                    method: "almoosa_customization.item_group_tree.search_item_groups",
+                    args: { txt: txt }
+                }).then(r => r.message || []);
             }
         },
         {
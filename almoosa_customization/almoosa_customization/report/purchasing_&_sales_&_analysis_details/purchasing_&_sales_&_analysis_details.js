@@ -31,7 +31,10 @@ frappe.query_reports["Purchasing & Sales & Analysis Details"] = {
             fieldname: "item_group",
             label: "Item Group",
             fieldtype: "MultiSelectList",
-            get_data: txt => frappe.db.get_link_options("Item Group", txt)
+            get_data: txt => frappe.call({
+                method: "almoosa_customization.item_group_tree.search_item_groups",
+                args: { txt: txt }
+            }).then(r => r.message || [])
         },        
         {
     fieldname: "year",
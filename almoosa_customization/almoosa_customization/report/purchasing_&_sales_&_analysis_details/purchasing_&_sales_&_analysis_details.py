@@ -3,6 +3,8 @@
 
 import frappe
 
+from almoosa_customization.utils import get_vat_rate
+
 
 def execute(filters=None):
     filters = filters or {}
@@ -67,6 +69,8 @@ def get_data(filters):
     values = {
         "from": filters["from_datetime"],
         "to": filters["to_datetime"],
+        # VAT rate is read once per run from the default sales tax template
+        "vat_factor": 1 + get_vat_rate() / 100,
     }
 
     def multi(field, sql_field):
@@ -89,29 +93,56 @@ def get_data(filters):
     
     query = f"""
         WITH 
-        -- Pre-calculate opening recon qty per item
-        opening_recon AS (
-            SELECT sle.item_code, COALESCE(SUM(sle.qty_after_transaction), 0) as qty
+        -- Items matching the vendor / supplier / group / year filters;
+        -- every aggregate below is restricted to this set
+        filtered_items AS (
+            SELECT DISTINCT it.name AS item_code
+            FROM `tabItem` it
+            LEFT JOIN `tabItem Group` ig ON ig.name = it.item_group
+            LEFT JOIN `tabBrand` b ON b.name = it.brand
+            LEFT JOIN `tabItem Supplier` si ON si.parent = it.name
+            LEFT JOIN `tabSupplier` sup ON sup.name = si.supplier
+            WHERE {where_clause}
+        ),
+        -- Whole days before the from / to dates, summed from the daily
+        -- Item Stock Delta rows (item level via GROUP BY over warehouses)
+        delta_data AS (
+            SELECT d.item_code,
+                   COALESCE(SUM(CASE WHEN d.posting_date < DATE(%(from)s) THEN d.qty_change ELSE 0 END), 0) as before_from_qty,
+                   COALESCE(SUM(d.qty_change), 0) as before_to_qty
+            FROM `tabItem Stock Delta` d
+            JOIN filtered_items fi ON fi.item_code = d.item_code
+            WHERE d.posting_date < DATE(%(to)s)
+            GROUP BY d.item_code
+        ),
+        -- Intra-day remainder on the from / to dates, read from SLE
+        sle_intraday AS (
+            SELECT sle.item_code,
+                   COALESCE(SUM(CASE
+                       WHEN sle.posting_date = DATE(%(from)s) AND sle.posting_datetime < %(from)s
+                       THEN sle.actual_qty ELSE 0
+                   END), 0) as before_from_qty,
+                   COALESCE(SUM(CASE
+                       WHEN sle.posting_date = DATE(%(to)s) AND sle.posting_datetime <= %(to)s
+                       THEN sle.actual_qty ELSE 0
+                   END), 0) as up_to_to_qty
             FROM `tabStock Ledger Entry` sle
-            JOIN `tabStock Reconciliation` sr ON sr.name = sle.voucher_no
-            WHERE sle.posting_datetime < %(to)s
-            AND sle.voucher_type = 'Stock Reconciliation'
-            AND sr.purpose IN ('Opening Stock', 'Opening')
+            JOIN filtered_items fi ON fi.item_code = sle.item_code
+            WHERE sle.posting_date IN (DATE(%(from)s), DATE(%(to)s))
             GROUP BY sle.item_code
         ),
-        -- Pre-calculate SLE before from date
-        sle_before_from AS (
-            SELECT item_code, COALESCE(SUM(actual_qty), 0) as qty
-            FROM `tabStock Ledger Entry`
-            WHERE posting_datetime < %(from)s
-            GROUP BY item_code
-        ),
-        -- Pre-calculate SLE up to to date
-        sle_up_to_to AS (
-            SELECT item_code, COALESCE(SUM(actual_qty), 0) as qty
-            FROM `tabStock Ledger Entry`
-            WHERE posting_datetime <= %(to)s
-            GROUP BY item_code
+        -- Opening recon qty, read from the opening reconciliation items: the
+        -- qty set there is the SLE qty_after_transaction, without a second
+        -- ledger scan
+        opening_recon AS (
+            SELECT sri.item_code, COALESCE(SUM(sri.qty), 0) as qty
+            FROM `tabStock Reconciliation` sr
+            JOIN `tabStock Reconciliation Item` sri ON sri.parent = sr.name
+            JOIN filtered_items fi ON fi.item_code = sri.item_code
+            WHERE sr.docstatus = 1
+            AND sr.purpose IN ('Opening Stock', 'Opening')
+            AND TIMESTAMP(sr.posting_date, sr.posting_time) < %(to)s
+            GROUP BY sri.item_code
         ),
         -- Pre-calculate purchase qty and cost
         purchase_data AS (
@@ -119,6 +150,7 @@ def get_data(filters):
                    COALESCE(SUM(pri.qty), 0) as qty,
                    COALESCE(SUM(pri.qty * pri.rate), 0) as cost
             FROM `tabPurchase Receipt Item` pri
+            JOIN filtered_items fi ON fi.item_code = pri.item_code
             JOIN `tabPurchase Receipt` pr ON pr.name = pri.parent
             WHERE pr.docstatus = 1
             AND pr.posting_date BETWEEN DATE(%(from)s) AND DATE(%(to)s)
@@ -129,8 +161,9 @@ def get_data(filters):
             SELECT posi.item_code,
                    COALESCE(SUM(posi.qty), 0) as qty,
                    COALESCE(SUM(posi.net_amount), 0) as net_amount,
-                   COALESCE(SUM(posi.net_amount * 1.15), 0) as net_amount_with_tax
+                   COALESCE(SUM(posi.net_amount * %(vat_factor)s), 0) as net_amount_with_tax
             FROM `tabPOS Invoice Item` posi
+            JOIN filtered_items fi ON fi.item_code = posi.item_code
             JOIN `tabPOS Invoice` pos ON pos.name = posi.parent
             WHERE pos.docstatus = 1 
             AND pos.custom_exclude = 0
@@ -143,6 +176,7 @@ def get_data(filters):
                    COALESCE(SUM(sri.quantity_difference), 0) as qty_diff,
                    COALESCE(SUM(sri.amount_difference), 0) as amount_diff
             FROM `tabStock Reconciliation Item` sri
+            JOIN filtered_items fi ON fi.item_code = sri.item_code
             JOIN `tabStock Reconciliation` sr ON sr.name = sri.parent
             WHERE sr.docstatus = 1
             AND sr.purpose = 'Stock Reconciliation'
@@ -154,6 +188,7 @@ def get_data(filters):
             SELECT sed.item_code,
                    COALESCE(SUM(sed.qty - sed.transferred_qty), 0) as qty
             FROM `tabStock Entry Detail` sed
+            JOIN filtered_items fi ON fi.item_code = sed.item_code
             JOIN `tabStock Entry` se ON se.name = sed.parent
             WHERE se.docstatus = 1
             AND se.stock_entry_type = 'Material Transfer'
@@ -162,26 +197,13 @@ def get_data(filters):
             AND se.posting_date BETWEEN DATE(%(from)s) AND DATE(%(to)s)
             GROUP BY sed.item_code
         ),
-        -- Pre-calculate average valuation rate per item
-        item_valuation AS (
-            SELECT item_code, COALESCE(AVG(valuation_rate), 0) as avg_rate
-            FROM `tabBin`
-            GROUP BY item_code
-        ),
-        -- Pre-calculate RSP price
-        item_price_rsp AS (
-            SELECT item_code, price_list_rate
-            FROM `tabItem Price`
-            WHERE price_list = 'RSP'
-            GROUP BY item_code
-        ),
         -- Main calculations
         calculated_data AS (
             SELECT 
-                it.name as item_code,
+                fi.item_code,
                 COALESCE(orcon.qty, 0) as opening_recon_qty,
-                COALESCE(sbf.qty, 0) as sle_before_from_qty,
-                COALESCE(sto.qty, 0) as sle_up_to_to_qty,
+                COALESCE(dd.before_from_qty, 0) + COALESCE(sid.before_from_qty, 0) as sle_before_from_qty,
+                COALESCE(dd.before_to_qty, 0) + COALESCE(sid.up_to_to_qty, 0) as sle_up_to_to_qty,
                 COALESCE(pd.qty, 0) as purchase_qty,
                 COALESCE(pd.cost, 0) as purchase_cost,
                 COALESCE(sd.qty, 0) as sold_qty,
@@ -190,18 +212,18 @@ def get_data(filters):
                 COALESCE(ad.qty_diff, 0) as adjustment_qty,
                 COALESCE(ad.amount_diff, 0) as adjustment_cost,
                 COALESCE(itd.qty, 0) as in_transit_qty,
-                COALESCE(iv.avg_rate, 0) as avg_valuation_rate,
-                COALESCE(ipr.price_list_rate, 0) as rsp_price
-            FROM `tabItem` it
-            LEFT JOIN opening_recon orcon ON orcon.item_code = it.name
-            LEFT JOIN sle_before_from sbf ON sbf.item_code = it.name
-            LEFT JOIN sle_up_to_to sto ON sto.item_code = it.name
-            LEFT JOIN purchase_data pd ON pd.item_code = it.name
-            LEFT JOIN sold_data sd ON sd.item_code = it.name
-            LEFT JOIN adjustment_data ad ON ad.item_code = it.name
-            LEFT JOIN in_transit_data itd ON itd.item_code = it.name
-            LEFT JOIN item_valuation iv ON iv.item_code = it.name
-            LEFT JOIN item_price_rsp ipr ON ipr.item_code = it.name
+                COALESCE(icm.avg_valuation_rate, 0) as avg_valuation_rate,
+                COALESCE(icm.rsp_price, 0) as rsp_price
+            FROM filtered_items fi
+            LEFT JOIN delta_data dd ON dd.item_code = fi.item_code
+            LEFT JOIN sle_intraday sid ON sid.item_code = fi.item_code
+            LEFT JOIN opening_recon orcon ON orcon.item_code = fi.item_code
+            LEFT JOIN purchase_data pd ON pd.item_code = fi.item_code
+            LEFT JOIN sold_data sd ON sd.item_code = fi.item_code
+            LEFT JOIN adjustment_data ad ON ad.item_code = fi.item_code
+            LEFT JOIN in_transit_data itd ON itd.item_code = fi.item_code
+            -- Maintained average valuation rate and current RSP price
+            LEFT JOIN `tabItem Current Metrics` icm ON icm.name = fi.item_code
         )
         SELECT
             b.custom_brand_code AS vendor_code,
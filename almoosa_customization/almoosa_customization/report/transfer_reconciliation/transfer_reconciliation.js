@@ -0,0 +1,69 @@
+// Copyright (c) 2026, Printechs and contributors
+// For license information, please see license.txt
+
+frappe.query_reports["Transfer Reconciliation"] = {
+    filters: [
+        {
+            fieldname: "from_date",
+            label: "From Date",
+            fieldtype: "Date",
+            reqd: 1,
+            default: frappe.datetime.add_months(frappe.datetime.get_today(), -3)
+        },
+        {
+            fieldname: "to_date",
+            label: "To Date",
+            fieldtype: "Date",
+            reqd: 1,
+            default: frappe.datetime.get_today()
+        },
+        {
+            fieldname: "group_by",
+            label: "Group By",
+            fieldtype: "Select",
+            options: "Route\nDocument\nItem",
+            default: "Route"
+        },
+        {
+            fieldname: "status",
+            label: "Status",
+            fieldtype: "Select",
+            options: "\nMatched\nShort\nOver\nIn Transit"
+        },
+        {
+            fieldname: "source_warehouse",
+            label: "Source Warehouse",
+            fieldtype: "Link",
+            options: "Warehouse"
+        },
+        {
+            fieldname: "receiving_warehouse",
+            label: "Target Warehouse",
+            fieldtype: "Link",
+            options: "Warehouse"
+        },
+        {
+            fieldname: "item_code",
+            label: "Items",
+            fieldtype: "MultiSelectList",
+            get_data: txt => frappe.db.get_link_options("Item", txt)
+        }
+    ],
+
+    formatter: function(value, row, column, data, default_formatter) {
+        value = default_formatter(value, row, column, data);
+
+        if (data && column.fieldname === "status") {
+            const colors = {
+                "Short": "var(--red-600)",
+                "Over": "var(--orange-600)",
+                "In Transit": "var(--blue-600)"
+            };
+            if (colors[data.status]) {
+                value = `<span style="color: ${colors[data.status]}; font-weight: bold;">${value}</span>`;
+            }
+        }
+
+        return value;
+    }
+};
@@ -0,0 +1,153 @@
+# Copyright (c) 2026, Printechs and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.utils import add_days, getdate
+
+# group_by filter -> (select dimensions, group by columns)
+GROUPINGS = {
+    "Route": (
+        ["tle.source_warehouse", "tle.receiving_warehouse"],
+        "tle.source_warehouse, tle.receiving_warehouse",
+    ),
+    "Document": (
+        ["tle.outgoing_entry", "MIN(tle.posting_date) AS posting_date",
+         "tle.source_warehouse", "tle.receiving_warehouse"],
+        "tle.outgoing_entry, tle.source_warehouse, tle.receiving_warehouse",
+    ),
+    "Item": (
+        ["tle.item_code", "it.item_name"],
+        "tle.item_code, it.item_name",
+    ),
+}
+
+# Line-level quantities of a group; a line nothing was received against yet
+# is in transit, a partly received one is short
+IN_TRANSIT_QTY_SQL = "SUM(CASE WHEN tle.receipt_count = 0 THEN tle.qty ELSE 0 END)"
+SHORT_QTY_SQL = "SUM(CASE WHEN tle.receipt_count > 0 THEN tle.remaining_qty ELSE 0 END)"
+OVER_QTY_SQL = "SUM(GREATEST(tle.received_qty - tle.qty, 0))"
+
+# Status from the same sums the report shows, so an over-received line cannot
+# hide a short one; precedence Over, Short, In Transit, Matched
+STATUS_SQL = f"""
+    CASE
+        WHEN {OVER_QTY_SQL} > 0 THEN 'Over'
+        WHEN {SHORT_QTY_SQL} > 0 THEN 'Short'
+        WHEN {IN_TRANSIT_QTY_SQL} > 0 THEN 'In Transit'
+        ELSE 'Matched'
+    END
+"""
+
+
+# ---------------------------------------------------------
+#  EXECUTE
+# ---------------------------------------------------------
+def execute(filters=None):
+    filters = filters or {}
+
+    if not filters.get("from_date") or not filters.get("to_date"):
+        frappe.throw("Please set From Date and To Date")
+
+    group_by = filters.get("group_by") or "Route"
+    if group_by not in GROUPINGS:
+        frappe.throw(f"Invalid Group By: {group_by}")
+
+    columns = get_columns(group_by)
+    data = get_data(filters, group_by)
+    return columns, data
+
+
+# ---------------------------------------------------------
+#  COLUMNS
+# ---------------------------------------------------------
+def get_columns(group_by):
+    columns = []
+
+    if group_by == "Document":
+        columns += [
+            {"label": "Doc No", "fieldname": "outgoing_entry", "fieldtype": "Link", "options": "Stock Entry", "width": 160},
+            {"label": "Date", "fieldname": "posting_date", "fieldtype": "Date", "width": 100},
+        ]
+
+    if group_by in ("Route", "Document"):
+        columns += [
+            {"label": "From Store", "fieldname": "source_warehouse", "fieldtype": "Link", "options": "Warehouse", "width": 180},
+            {"label": "To Store", "fieldname": "receiving_warehouse", "fieldtype": "Link", "options": "Warehouse", "width": 180},
+        ]
+    else:
+        columns += [
+            {"label": "Item No", "fieldname": "item_code", "fieldtype": "Link", "options": "Item", "width": 140},
+            {"label": "Item Name", "fieldname": "item_name", "fieldtype": "Data", "width": 180},
+        ]
+
+    columns += [
+        {"label": "Lines", "fieldname": "lines", "fieldtype": "Int", "width": 70},
+        {"label": "Shipped Qty", "fieldname": "shipped_qty", "fieldtype": "Float", "width": 110},
+        {"label": "Received Qty", "fieldname": "received_qty", "fieldtype": "Float", "width": 110},
+        {"label": "In Transit Qty", "fieldname": "in_transit_qty", "fieldtype": "Float", "width": 110},
+        {"label": "Short Qty", "fieldname": "short_qty", "fieldtype": "Float", "width": 100},
+        {"label": "Over Qty", "fieldname": "over_qty", "fieldtype": "Float", "width": 100},
+        {"label": "Status", "fieldname": "status", "fieldtype": "Data", "width": 100},
+    ]
+
+    return columns
+
+
+# ---------------------------------------------------------
+#  DATA
+# ---------------------------------------------------------
+def get_data(filters, group_by):
+    conditions = [
+        "tle.posting_datetime >= %(from_date)s",
+        "tle.posting_datetime < %(to_date)s",
+    ]
+    values = {
+        "from_date": getdate(filters.get("from_date")),
+        # Whole to date included
+        "to_date": add_days(getdate(filters.get("to_date")), 1),
+    }
+
+    if filters.get("source_warehouse"):
+        conditions.append("tle.source_warehouse = %(source_warehouse)s")
+        values["source_warehouse"] = filters.get("source_warehouse")
+
+    if filters.get("receiving_warehouse"):
+        conditions.append("tle.receiving_warehouse = %(receiving_warehouse)s")
+        values["receiving_warehouse"] = filters.get("receiving_warehouse")
+
+    if filters.get("item_code"):
+        items = filters.get("item_code")
+        if isinstance(items, str):
+            items = [d.strip() for d in items.split(",") if d.strip()]
+        conditions.append("tle.item_code IN %(item_code)s")
+        values["item_code"] = tuple(items)
+
+    having = ""
+    if filters.get("status"):
+        having = "HAVING status = %(status)s"
+        values["status"] = filters.get("status")
+
+    dimensions, group_columns = GROUPINGS[group_by]
+    item_join = "LEFT JOIN `tabItem` it ON it.name = tle.item_code" if group_by == "Item" else ""
+
+    # One pass over the ledger: each outgoing line already carries the qty
+    # received against it, so no Stock Entry history is re-joined here
+    query = f"""
+        SELECT
+            {", ".join(dimensions)},
+            COUNT(*) AS lines,
+            SUM(tle.qty) AS shipped_qty,
+            SUM(tle.received_qty) AS received_qty,
+            {IN_TRANSIT_QTY_SQL} AS in_transit_qty,
+            {SHORT_QTY_SQL} AS short_qty,
+            {OVER_QTY_SQL} AS over_qty,
+            {STATUS_SQL} AS status
+        FROM `tabTransit Ledger Entry` tle
+        {item_join}
+        WHERE {" AND ".join(conditions)}
+        GROUP BY {group_columns}
+        {having}
+        ORDER BY {group_columns}
+    """
+
+    return frappe.db.sql(query, values, as_dict=True)
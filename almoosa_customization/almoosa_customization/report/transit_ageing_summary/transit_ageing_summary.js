@@ -0,0 +1,35 @@
+// Copyright (c) 2026, Printechs and contributors
+// For license information, please see license.txt
+
+frappe.query_reports["Transit Ageing Summary"] = {
+    filters: [
+        {
+            fieldname: "source_warehouse",
+            label: "Source Warehouse",
+            fieldtype: "Link",
+            options: "Warehouse"
+        },
+        {
+            fieldname: "receiving_warehouse",
+            label: "Target Warehouse",
+            fieldtype: "Link",
+            options: "Warehouse"
+        },
+        {
+            fieldname: "sla_days",
+            label: "SLA (Days)",
+            fieldtype: "Int",
+            default: 7
+        }
+    ],
+
+    formatter: function(value, row, column, data, default_formatter) {
+        value = default_formatter(value, row, column, data);
+
+        if (data && data.breach_lines > 0 && ["breach_lines", "breach_qty"].includes(column.fieldname)) {
+            value = `<span style="color: var(--red-600); font-weight: bold;">${value}</span>`;
+        }
+
+        return value;
+    }
+};
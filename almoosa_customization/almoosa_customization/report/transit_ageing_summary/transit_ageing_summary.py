@@ -0,0 +1,53 @@
+# Copyright (c) 2026, Printechs and contributors
+# For license information, please see license.txt
+
+from almoosa_customization.transit import (
+    AGE_BUCKETS,
+    get_age_bucket_fieldname,
+    get_transit_ageing_summary,
+)
+
+
+# ---------------------------------------------------------
+#  EXECUTE
+# ---------------------------------------------------------
+def execute(filters=None):
+    filters = filters or {}
+
+    columns = get_columns()
+    data = get_transit_ageing_summary(
+        source_warehouse=filters.get("source_warehouse"),
+        receiving_warehouse=filters.get("receiving_warehouse"),
+        sla_days=filters.get("sla_days")
+    )
+
+    return columns, data
+
+
+# ---------------------------------------------------------
+#  COLUMNS
+# ---------------------------------------------------------
+def get_columns():
+    columns = [
+        {"label": "From Store", "fieldname": "source_warehouse", "fieldtype": "Link", "options": "Warehouse", "width": 180},
+        {"label": "To Store", "fieldname": "receiving_warehouse", "fieldtype": "Link", "options": "Warehouse", "width": 180},
+        {"label": "Open Docs", "fieldname": "open_entries", "fieldtype": "Int", "width": 90},
+        {"label": "Open Lines", "fieldname": "open_lines", "fieldtype": "Int", "width": 90},
+        {"label": "Open Qty", "fieldname": "open_qty", "fieldtype": "Float", "width": 100},
+        {"label": "Oldest (Days)", "fieldname": "oldest_days", "fieldtype": "Int", "width": 100},
+    ]
+
+    for _upper, label in AGE_BUCKETS:
+        columns.append({
+            "label": f"{label} Days",
+            "fieldname": get_age_bucket_fieldname(label),
+            "fieldtype": "Float",
+            "width": 90
+        })
+
+    columns += [
+        {"label": "SLA Breach Lines", "fieldname": "breach_lines", "fieldtype": "Int", "width": 120},
+        {"label": "SLA Breach Qty", "fieldname": "breach_qty", "fieldtype": "Float", "width": 120},
+    ]
+
+    return columns
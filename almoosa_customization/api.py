@@ -1,56 +1,44 @@
 import frappe
+import base64
 import json
+import zlib
 from frappe import _
-from frappe.utils import flt
-from datetime import datetime, time
-from erpnext.accounts.doctype.pos_closing_entry.pos_closing_entry import get_pos_invoices
-from erpnext.accounts.doctype.pos_invoice_merge_log.pos_invoice_merge_log import consolidate_pos_invoices
+from frappe.utils import flt, get_datetime
+from werkzeug.wrappers import Response
+from almoosa_customization import barcode_index, editable_fields, item_attributes
+from almoosa_customization.utils import get_keyset_condition
+from almoosa_customization.pos_closing import enqueue_pos_closings
+from almoosa_customization.mr_consumption import get_mr_consumption, get_other_consumption, get_stock_entry_mr_errors
 
 @frappe.whitelist(allow_guest=False)
 def update_field(doctype, docname, fieldname, value, update_date: bool = True):
     try:
-        # Validate DocType
-        if not frappe.db.exists("DocType", doctype):
+        # Validate DocType and field from the cached custom field map
+        fields = editable_fields.get_editable_fields(doctype)
+        if fields is None:
             return {
                 "status": "Failed",
                 "message": f"Invalid DocType: {doctype}"
             }
 
-        # Validate document
-        if not frappe.db.exists(doctype, docname):
-            return {
-                "status": "Failed",
-                "message": f"{doctype} '{docname}' not found"
-            }
-
-        # Validate field exists in DocType
-        meta = frappe.get_meta(doctype)
-        field = meta.get_field(fieldname)
-
-        if not field:
+        # Allow only custom fields
+        error = editable_fields.get_field_error(doctype, fields, fieldname)
+        if error:
             return {
                 "status": "Failed",
-                "message": f"Field '{fieldname}' does not exist in {doctype}"
+                "message": error
             }
 
-        # Allow only custom fields
-        # Check if field is custom
-        is_custom = frappe.db.exists(
-            "Custom Field",
-            {"dt": doctype, "fieldname": fieldname}
-        )
-        
-        if not is_custom:
+        # Validate document
+        if not update_date and not frappe.db.exists(doctype, docname):
             return {
                 "status": "Failed",
-                "message": f"Field '{fieldname}' is a standard field and cannot be edited"
+                "message": f"{doctype} '{docname}' not found"
             }
 
-        # Load document
-        doc = frappe.get_doc(doctype, docname)
-
         # Normal update (updates modified timestamp)
         if update_date:
+            doc = frappe.get_doc(doctype, docname)
             doc.set(fieldname, value)
             doc.save(ignore_permissions=True)
             frappe.db.commit()
@@ -70,6 +58,12 @@ def update_field(doctype, docname, fieldname, value, update_date: bool = True):
             "message": f"{doctype} '{docname}' updated successfully"
         }
 
+    except frappe.DoesNotExistError:
+        return {
+            "status": "Failed",
+            "message": f"{doctype} '{docname}' not found"
+        }
+
     except Exception as e:
         frappe.log_error(frappe.get_traceback(), "update_field API Error")
         return {
@@ -80,49 +74,33 @@ def update_field(doctype, docname, fieldname, value, update_date: bool = True):
 @frappe.whitelist(allow_guest=False)
 def update_fields(doctype, docname, fields: dict, update_date: bool = True):
     try:
-        # Validate DocType
-        if not frappe.db.exists("DocType", doctype):
+        # Validate DocType from the cached custom field map
+        editable = editable_fields.get_editable_fields(doctype)
+        if editable is None:
             return {
                 "status": "Failed",
                 "message": f"Invalid DocType: {doctype}"
             }
 
-        # Validate document
-        if not frappe.db.exists(doctype, docname):
-            return {
-                "status": "Failed",
-                "message": f"{doctype} '{docname}' not found"
-            }
-
-        meta = frappe.get_meta(doctype)
-
         # Validate fields and ensure they are custom
         for fieldname in fields.keys():
-            field = meta.get_field(fieldname)
-
-            if not field:
+            error = editable_fields.get_field_error(doctype, editable, fieldname)
+            if error:
                 return {
                     "status": "Failed",
-                    "message": f"Field '{fieldname}' does not exist in {doctype}"
+                    "message": error
                 }
 
-            # Check if field is custom
-            is_custom = frappe.db.exists(
-                "Custom Field",
-                {"dt": doctype, "fieldname": fieldname}
-            )
-            
-            if not is_custom:
-                return {
-                    "status": "Failed",
-                    "message": f"Field '{fieldname}' is a standard field and cannot be edited"
-                }
-
-        # Load document
-        doc = frappe.get_doc(doctype, docname)
+        # Validate document
+        if not update_date and not frappe.db.exists(doctype, docname):
+            return {
+                "status": "Failed",
+                "message": f"{doctype} '{docname}' not found"
+            }
 
         # Normal update (updates modified timestamp)
         if update_date:
+            doc = frappe.get_doc(doctype, docname)
             for fieldname, value in fields.items():
                 doc.set(fieldname, value)
 
@@ -154,6 +132,12 @@ def update_fields(doctype, docname, fields: dict, update_date: bool = True):
             "message": f"{doctype} '{docname}' updated successfully"
         }
 
+    except frappe.DoesNotExistError:
+        return {
+            "status": "Failed",
+            "message": f"{doctype} '{docname}' not found"
+        }
+
     except Exception as e:
         frappe.log_error(frappe.get_traceback(), "update_fields API Error")
         return {
@@ -161,153 +145,374 @@ def update_fields(doctype, docname, fields: dict, update_date: bool = True):
             "message": str(e)
         }
 
-@frappe.whitelist()
-def get_updated_items():
-    frappe.local.response["type"] = "json"
-    frappe.local.response["nocache"] = 1
+# Documents written per transaction by bulk_update_fields
+BULK_UPDATE_CHUNK_SIZE = 500
+BULK_UPDATE_MAX_CHUNK_SIZE = 5000
 
-    args = frappe.request.args
+@frappe.whitelist(allow_guest=False)
+def bulk_update_fields(doctype, updates, update_date: bool = True, chunk_size: int = BULK_UPDATE_CHUNK_SIZE):
+    """update_fields for many documents of one DocType in one call.
+
+    updates is a list of {"name": docname, "fields": {fieldname: value}}.
+    Fields are validated against the cached custom field map. With update_date each document
+    is saved as in update_fields; without it every chunk is written with one
+    UPDATE ... CASE statement. Each chunk is committed on its own, so a failing
+    chunk does not undo the ones before it. A document may appear once; later
+    updates of the same name fail. Returns a result per document, in the order
+    of updates.
+    """
+    editable = editable_fields.get_editable_fields(doctype)
+    if editable is None:
+        return {
+            "status": "Failed",
+            "message": f"Invalid DocType: {doctype}"
+        }
 
-    is_new = int(args.get("is_new", 0))
-    limit  = int(args.get("limit", 50))
-    offset = int(args.get("offset", 0))
+    frappe.has_permission(doctype, "write", throw=True)
 
-    field = "creation" if is_new == 1 else "modified"
+    updates = frappe.parse_json(updates) or []
+    chunk_size = min(max(int(chunk_size or BULK_UPDATE_CHUNK_SIZE), 1), BULK_UPDATE_MAX_CHUNK_SIZE)
+
+    results = [None] * len(updates)
+    valid = []
+    seen = set()
+
+    for i, update in enumerate(updates):
+        docname = update.get("name")
+        fields = update.get("fields") or {}
+        error = None
+
+        if not docname or not fields:
+            error = "Both name and fields are required"
+        elif docname in seen:
+            error = f"Duplicate update for {doctype} '{docname}'"
+        else:
+            seen.add(docname)
+            for fieldname in fields:
+                error = editable_fields.get_field_error(doctype, editable, fieldname)
+                if error:
+                    break
+
+        if error:
+            results[i] = {"name": docname, "status": "Failed", "message": error}
+        else:
+            valid.append((i, docname, fields))
+
+    for start in range(0, len(valid), chunk_size):
+        chunk = valid[start:start + chunk_size]
+
+        # get_list applies user permissions and permission query conditions
+        existing = set(frappe.get_list(
+            doctype, filters={"name": ["in", [docname for _i, docname, _fields in chunk]]}, pluck="name"
+        ))
+        for i, docname, _fields in chunk:
+            if docname not in existing:
+                results[i] = {"name": docname, "status": "Failed", "message": f"{doctype} '{docname}' not found"}
+        chunk = [(i, docname, fields) for i, docname, fields in chunk if docname in existing]
+
+        write = save_documents if update_date else update_documents_by_sql
+        chunk_results = write(doctype, [(docname, fields) for _i, docname, fields in chunk])
+        for (i, _docname, _fields), result in zip(chunk, chunk_results):
+            results[i] = result
+
+        frappe.db.commit()
+
+    updated = sum(1 for r in results if r["status"] == "Success")
+
+    return {
+        "status": "Success" if updated == len(results) else ("Failed" if not updated else "Partial"),
+        "updated": updated,
+        "failed": len(results) - updated,
+        "results": results
+    }
+
+def save_documents(doctype, chunk):
+    """Save each document through the ORM; a failure only rolls back its own changes"""
+    results = []
 
-    # 1️⃣ Total count (WITHOUT limit / offset)
-    total_count = frappe.db.sql(
+    for docname, fields in chunk:
+        frappe.db.savepoint("bulk_update_fields")
+        try:
+            doc = frappe.get_doc(doctype, docname)
+            # Document level: user permissions and permission query conditions
+            frappe.has_permission(doctype, "write", doc=doc, throw=True)
+            for fieldname, value in fields.items():
+                doc.set(fieldname, value)
+            doc.save(ignore_permissions=True)
+            results.append({"name": docname, "status": "Success"})
+        except Exception as e:
+            frappe.db.rollback(save_point="bulk_update_fields")
+            frappe.log_error(frappe.get_traceback(), "bulk_update_fields API Error")
+            results.append({"name": docname, "status": "Failed", "message": str(e)})
+
+    return results
+
+def update_documents_by_sql(doctype, chunk):
+    """One UPDATE for the chunk, preserving modified; fields a document does not set keep their value"""
+    if not chunk:
+        return []
+
+    fieldnames = list(dict.fromkeys(fieldname for _docname, fields in chunk for fieldname in fields))
+    set_clauses = []
+    values = []
+
+    for fieldname in fieldnames:
+        cases = []
+        for docname, fields in chunk:
+            if fieldname in fields:
+                cases.append("WHEN %s THEN %s")
+                values.extend([docname, fields[fieldname]])
+        set_clauses.append(f"`{fieldname}` = CASE name {' '.join(cases)} ELSE `{fieldname}` END")
+
+    names = [docname for docname, _fields in chunk]
+    values.extend(names)
+
+    try:
+        frappe.db.sql(f"""
+            UPDATE `tab{doctype}`
+            SET {", ".join(set_clauses)}
+            WHERE name IN ({", ".join(["%s"] * len(names))})
+        """, values)
+    except Exception as e:
+        frappe.db.rollback()
+        frappe.log_error(frappe.get_traceback(), "bulk_update_fields API Error")
+        return [{"name": docname, "status": "Failed", "message": str(e)} for docname in names]
+
+    return [{"name": docname, "status": "Success"} for docname in names]
+
+# Page size bounds of the item change feed
+UPDATED_ITEMS_PAGE_SIZE = 50
+UPDATED_ITEMS_MAX_PAGE_SIZE = 1000
+
+# The optional total and the default lower bound are cached for this long
+UPDATED_ITEMS_COUNT_TTL = 300
+
+def encode_feed_token(timestamp, name, since):
+    """Opaque cursor of the item change feed: last (timestamp, name) returned and the feed's lower bound"""
+    return base64.urlsafe_b64encode(json.dumps([str(timestamp), name, str(since)]).encode()).decode()
+
+def decode_feed_token(token):
+    try:
+        timestamp, name, since = json.loads(base64.urlsafe_b64decode(token.encode()).decode())
+    except Exception:
+        frappe.throw(_("Invalid page token"), frappe.ValidationError)
+
+    return timestamp, name, since
+
+def get_feed_since(since=None):
+    """Lower bound of the change feed: the caller's since, else the oldest item sync time.
+
+    Items are in the feed when changed since their own custom_last_synced; that
+    per-row comparison cannot use an index, so this one bound narrows the range
+    the ({field}, name) index scans.
+    """
+    if since:
+        try:
+            return str(get_datetime(since))
+        except Exception:
+            frappe.throw(_("Invalid since"), frappe.ValidationError)
+
+    key = "almoosa_updated_items_since"
+    value = frappe.cache().get_value(key)
+
+    if value is None:
+        # Served by the custom_last_synced index
+        value = str(frappe.db.sql("SELECT MIN(custom_last_synced) FROM `tabItem`")[0][0] or "1900-01-01")
+        frappe.cache().set_value(key, value, expires_in_sec=UPDATED_ITEMS_COUNT_TTL)
+
+    return value
+
+def get_updated_items_count(field, since):
+    """Cached count of items changed since the bound, refreshed every few minutes"""
+    key = f"almoosa_updated_items_count:{field}:{since}"
+    count = frappe.cache().get_value(key)
+
+    if count is None:
+        count = frappe.db.sql(f"""
+            SELECT COUNT(*)
+            FROM `tabItem`
+            WHERE {field} >= %(since)s AND {field} >= custom_last_synced AND has_variants=0
+        """, {"since": since})[0][0]
+        frappe.cache().set_value(key, count, expires_in_sec=UPDATED_ITEMS_COUNT_TTL)
+
+    return count
+
+def get_updated_items_page(field, limit, page_token=None, fields=None, since=None):
+    """One page of the item change feed: (rows, has_next_page, next_page_token)"""
+    values = {"limit": limit + 1}
+    cursor_condition = ""
+    if page_token:
+        # Later pages keep the bound of the first, so a moving default cannot skip rows
+        values["after_ts"], values["after_name"], values["since"] = decode_feed_token(page_token)
+        cursor_condition = "AND " + get_keyset_condition([field, "name"], ["after_ts", "after_name"])
+    else:
+        values["since"] = get_feed_since(since)
+
+    extra_fields = "".join(f", `{f}`" for f in fields or [] if f not in ("name", "item_code"))
+
+    # One row beyond the page tells whether another page exists
+    items = frappe.db.sql(
         f"""
-        SELECT COUNT(*)
+        SELECT name, item_code, {field} AS ts{extra_fields}
         FROM `tabItem`
-        WHERE {field} >= custom_last_synced AND has_variants=0
+        WHERE has_variants=0
+        AND {field} >= %(since)s
+        AND {field} >= custom_last_synced
+        {cursor_condition}
+        ORDER BY {field} ASC, name ASC
+        LIMIT %(limit)s
         """,
-        as_list=True
-    )[0][0]
+        values,
+        as_dict=True
+    )
 
-    # 2️⃣ Paged data
-    query = f"""
-        SELECT item_code
-        FROM `tabItem`
-        WHERE {field} >= custom_last_synced AND has_variants=0
-        ORDER BY {field} ASC
-        LIMIT %(limit)s OFFSET %(offset)s
+    has_next_page = len(items) > limit
+    items = items[:limit]
+    next_page_token = encode_feed_token(items[-1].ts, items[-1].name, values["since"]) if has_next_page else None
+
+    return items, has_next_page, next_page_token
+
+def parse_feed_args(args):
+    is_new = int(args.get("is_new", 0))
+    limit = min(max(int(args.get("limit", UPDATED_ITEMS_PAGE_SIZE)), 1), UPDATED_ITEMS_MAX_PAGE_SIZE)
+    field = "creation" if is_new == 1 else "modified"
+    return is_new, limit, field
+
+@frappe.whitelist()
+def get_updated_items():
+    """Keyset paginated feed of items changed since their last sync.
+
+    Pass back next_page_token to get the following page; pages stay stable
+    when items change mid-sync because the cursor is the last
+    (modified / creation, name) returned rather than an offset. since is an
+    extra lower bound of the feed and defaults to the oldest custom_last_synced.
     """
+    frappe.local.response["type"] = "json"
+    frappe.local.response["nocache"] = 1
 
-    items = frappe.db.sql(
-        query,
-        {"limit": limit, "offset": offset},
-        as_dict=True
-    )
+    args = frappe.request.args
+
+    is_new, limit, field = parse_feed_args(args)
+    with_count = int(args.get("with_count", 0))
 
-    # 3️⃣ Pagination logic
-    next_offset = offset + limit
-    has_next_page = next_offset < total_count
+    since = get_feed_since(args.get("since"))
+    items, has_next_page, next_page_token = get_updated_items_page(field, limit, args.get("page_token"), since=since)
 
     return {
-        "total_count": total_count,
+        "total_count": get_updated_items_count(field, since) if with_count else None,
         "count": len(items),
         "items": [d.item_code for d in items],
         "limit": limit,
-        "offset": offset,
-        "next_page_token": next_offset if has_next_page else None,
+        "next_page_token": next_page_token,
         "has_next_page": has_next_page,
         "is_new": is_new
     }
+
+# Item fields sent by get_updated_items_payload when none are requested
+PAYLOAD_DEFAULT_FIELDS = [
+    "item_code", "item_name", "item_group", "brand", "stock_uom", "description",
+    "disabled", "custom_model_no", "custom_product_type", "custom_dcs", "custom_year", "modified",
+]
+
+# key in the payload -> (doctype, link field, fields, extra filters)
+PAYLOAD_CHILD_TABLES = {
+    "barcodes": ("Item Barcode", "parent", ["barcode", "barcode_type", "uom"], {"parenttype": "Item"}),
+    "attributes": ("Item Variant Attribute", "parent", ["attribute", "attribute_value"], {"parenttype": "Item"}),
+    "suppliers": ("Item Supplier", "parent", ["supplier", "supplier_part_no"], {"parenttype": "Item"}),
+    "rsp_prices": (
+        "Item Price", "item_code",
+        ["price_list_rate", "currency", "uom", "valid_from", "valid_upto"],
+        {"price_list": "RSP"}
+    ),
+}
+
+@frappe.whitelist()
+def get_updated_items_payload():
+    """Full records of one page of the item change feed, as gzipped NDJSON.
+
+    Takes the get_updated_items arguments plus an optional comma separated
+    fields list. Each line is one item with its barcodes, attributes,
+    suppliers and RSP prices (one query per child table for the page); the
+    last line carries the paging state under "_meta".
+    """
+    frappe.has_permission("Item", "read", throw=True)
+
+    args = frappe.request.args
+    is_new, limit, field = parse_feed_args(args)
+
+    valid_columns = set(frappe.get_meta("Item").get_valid_columns())
+    fields = [f.strip() for f in (args.get("fields") or "").split(",") if f.strip()] or PAYLOAD_DEFAULT_FIELDS
+    fields = [f for f in fields if f in valid_columns]
+
+    items, has_next_page, next_page_token = get_updated_items_page(
+        field, limit, args.get("page_token"), fields, since=args.get("since")
+    )
+
+    names = [d.name for d in items]
+    children = {key: {} for key in PAYLOAD_CHILD_TABLES}
+
+    if names:
+        for key, (doctype, link_field, child_fields, extra_filters) in PAYLOAD_CHILD_TABLES.items():
+            for row in frappe.get_all(
+                doctype,
+                filters={link_field: ["in", names], **extra_filters},
+                fields=[link_field] + child_fields,
+                order_by=f"{link_field} asc"
+            ):
+                children[key].setdefault(row.pop(link_field), []).append(row)
+
+    lines = []
+    for item in items:
+        record = {f: item.get(f) for f in fields}
+        record["item_code"] = item.item_code
+        for key in PAYLOAD_CHILD_TABLES:
+            record[key] = children[key].get(item.name, [])
+        lines.append(record)
+
+    lines.append({"_meta": {
+        "count": len(items),
+        "limit": limit,
+        "next_page_token": next_page_token,
+        "has_next_page": has_next_page,
+        "is_new": is_new
+    }})
+
+    return ndjson_response(lines)
+
+def ndjson_response(records):
+    """Stream records as NDJSON, gzip compressed when the client accepts it"""
+    gzipped = "gzip" in (frappe.request.headers.get("Accept-Encoding") or "")
+
+    def generate():
+        compressor = zlib.compressobj(wbits=31) if gzipped else None  # 31 = gzip container
+        for record in records:
+            line = (json.dumps(record, default=str, separators=(",", ":")) + "\n").encode()
+            chunk = compressor.compress(line) if compressor else line
+            if chunk:
+                yield chunk
+        if compressor:
+            yield compressor.flush()
+
+    response = Response(generate(), mimetype="application/x-ndjson")
+    if gzipped:
+        response.headers["Content-Encoding"] = "gzip"
+    response.headers["Cache-Control"] = "no-store"
+    return response
     
 def auto_close_pos_opening_entries():
+    """Queue one closing job per ready opening; see pos_closing.close_pos_opening_entry"""
     logger = frappe.logger("pos_auto_closing")
     logger.info("Starting auto POS closing job")
 
     openings = frappe.get_all(
         "POS Opening Entry",
         filters={"status": "Open", "docstatus": 1, "custom_ready_for_closing":1},
-        fields=["name", "period_start_date", "posting_date", "pos_profile", "user", "company"],
+        fields=["name", "pos_profile"],
     )
 
-    for row in openings:
-        try:
-            opening = frappe.get_doc("POS Opening Entry", row.name)
-            start_dt = opening.period_start_date  # date
-            end_dt = datetime.combine(start_dt, time(23, 59, 59))  # datetime
-
-            # 1️⃣ Fetch only same-day invoices
-            invoices = get_pos_invoices(
-                start=start_dt,
-                end=end_dt,
-                pos_profile=opening.pos_profile,
-                user=opening.user,
-            )
-
-            if not invoices:
-                logger.info(f"No invoices for {opening.name}, skipping")
-                continue
-
-            # 2️⃣ Build closing entry manually
-            closing = frappe.new_doc("POS Closing Entry")
-            closing.pos_opening_entry = opening.name
-            closing.pos_profile = opening.pos_profile
-            closing.user = opening.user
-            closing.company = opening.company
-
-            closing.posting_date = opening.posting_date
-            closing.posting_time = "23:59:59"
-            closing.period_start_date = start_dt
-            closing.period_end_date = end_dt
-
-            grand_total = 0
-            net_total = 0
-            total_qty = 0
-            pos_transactions = []
-            taxes = []
-            payments = []
-
-            # 3️⃣ Populate invoices and totals
-            for inv in invoices:
-                pos_transactions.append(
-                    frappe._dict({
-                        "pos_invoice": inv.name,
-                        "posting_date": inv.posting_date,
-                        "grand_total": inv.grand_total,
-                        "customer": inv.customer,
-                    })
-                )
-                grand_total += flt(inv.grand_total)
-                net_total += flt(inv.net_total)
-                total_qty += flt(inv.total_qty)
-
-                # Taxes
-                for t in inv.taxes:
-                    existing_tax = [tx for tx in taxes if tx.account_head == t.account_head and tx.rate == t.rate]
-                    if existing_tax:
-                        existing_tax[0].amount += flt(t.tax_amount)
-                    else:
-                        taxes.append(frappe._dict({"account_head": t.account_head, "rate": t.rate, "amount": t.tax_amount}))
-
-                # Payments
-                for p in inv.payments:
-                    existing_pay = [pay for pay in payments if pay.mode_of_payment == p.mode_of_payment]
-                    if existing_pay:
-                        existing_pay[0].expected_amount += flt(p.amount)
-                    else:
-                        payments.append(frappe._dict({"mode_of_payment": p.mode_of_payment, "opening_amount": 0, "expected_amount": p.amount}))
-
-            closing.set("pos_transactions", pos_transactions)
-            closing.set("taxes", taxes)
-            closing.set("payment_reconciliation", payments)
-            closing.grand_total = grand_total
-            closing.net_total = net_total
-            closing.total_quantity = total_qty
-
-            closing.insert(ignore_permissions=True)
-            closing.submit()
-
-            logger.info(f"POS Closing Entry {closing.name} created for {opening.name}")
-
-        except Exception:
-            frappe.log_error(title=f"POS Auto Closing Failed: {row.name}", message=frappe.get_traceback())
-            print(frappe.get_traceback())
+    queued = enqueue_pos_closings(openings)
 
-    logger.info("Auto POS Closing job completed")
+    logger.info(f"Queued {queued} of {len(openings)} POS openings for closing")
        
 @frappe.whitelist()
 def scan_barcode(search_value, **kwargs):
@@ -315,30 +520,11 @@ def scan_barcode(search_value, **kwargs):
     ERPNext v15 compatible barcode scan:
     1. Try Item Barcode
     2. Fallback to Item Code
-    """
-
-    # 1️⃣ Try standard barcode (Item Barcode table)
-    item_code = frappe.db.get_value(
-        "Item Barcode",
-        {"barcode": search_value},
-        "parent"
-    )
-
-    # 2️⃣ Fallback to Item Code
-    if not item_code and frappe.db.exists("Item", search_value):
-        item_code = search_value
 
-    # ❌ STOP if item not found
-    if not item_code:
-        frappe.throw(
-            _("Item not found for scanned barcode / code: {0}").format(search_value),
-            frappe.DoesNotExistError
-        )
-
-    # ✅ Only return when valid item exists
-    return {
-        "item_code": item_code
-    }
+    Resolved through the cached barcode index (worker LRU -> redis -> DB),
+    so repeated scans do not hit the database.
+    """
+    return barcode_index.scan_barcode(search_value)
 
 @frappe.whitelist()
 def get_item_attributes(item_code):
@@ -346,17 +532,13 @@ def get_item_attributes(item_code):
     if not item_code:
         return {}
 
-    attrs = frappe.get_all(
-        "Item Variant Attribute",
-        filters={"parent": item_code},
-        fields=["attribute", "attribute_value"]
-    )
-
-    result = {}
-    for a in attrs:
-        result[a.attribute.lower()] = a.attribute_value
+    return item_attributes.get_items_attributes([item_code]).get(item_code, {})
 
-    return result
+@frappe.whitelist()
+def get_items_attributes(item_codes):
+    """Batched get_item_attributes: {item_code: {attribute: value}}"""
+    item_codes = frappe.parse_json(item_codes) or []
+    return item_attributes.get_items_attributes(item_codes)
 
 @frappe.whitelist()
 def get_mr_item_for_scan(material_request, item_code, used_items=None, used_qty_map=None):
@@ -380,18 +562,17 @@ def get_mr_item_for_scan(material_request, item_code, used_items=None, used_qty_
     if not mr_items:
         return {"found": False, "error": "Item not in Material Request"}
     
+    # Qty from other stock entries (submitted or draft), from the maintained counters
+    other_used_map = get_other_consumption(
+        [mr_item.name for mr_item in mr_items],
+        frappe.form_dict.get('current_stock_entry')
+    )
+    
     # Find first MR line with remaining qty
     for mr_item in mr_items:
         # Calculate already used qty for this MR line
         used_qty = used_qty_map.get(mr_item.name, 0)
-        
-        # Get qty from other stock entries (submitted or draft)
-        other_used = frappe.db.sql("""
-            SELECT SUM(qty) FROM `tabStock Entry Detail`
-            WHERE material_request_item = %s
-            AND docstatus < 2
-            AND parent != %s
-        """, (mr_item.name, frappe.form_dict.get('current_stock_entry', '')))[0][0] or 0
+        other_used = other_used_map.get(mr_item.name, 0)
         
         total_used = used_qty + other_used
         remaining_qty = mr_item.qty - total_used
@@ -405,69 +586,115 @@ def get_mr_item_for_scan(material_request, item_code, used_items=None, used_qty_
     # All lines used or no remaining qty
     return {"found": False, "error": "All MR lines for this item are fully used"}
 
+@frappe.whitelist()
+def allocate_mr_scans(material_request, scans, current_stock_entry=None, used_items=None, used_qty_map=None):
+    """Allocate a batch of scanned rows to Material Request lines.
+
+    scans is a list of {"key", "item_code" or "barcode", "qty"}, one per
+    Stock Entry row. Barcodes, MR lines and consumption counters are read
+    once for the whole batch; rows are then allocated in
+    scan order, each to the first MR line of its item with remaining qty that
+    no other row uses.
+    """
+    scans = frappe.parse_json(scans) or []
+    used_items = set(frappe.parse_json(used_items) or [])
+    used_qty_map = frappe.parse_json(used_qty_map) or {}
+
+    if not scans:
+        return []
+
+    # Resolve barcodes, falling back to item codes, through the barcode index
+    codes = {scan.get("barcode") or scan.get("item_code") for scan in scans}
+    codes.discard(None)
+    barcode_map = barcode_index.resolve_barcodes(codes)
+
+    item_codes = {barcode_map.get(code, code) for code in codes}
+    mr_lines = frappe.get_all(
+        "Material Request Item",
+        filters={
+            "parent": material_request,
+            "item_code": ["in", list(item_codes)],
+            "docstatus": 1
+        },
+        fields=["name", "item_code", "qty", "description", "stock_uom"],
+        order_by="idx asc"
+    ) if item_codes else []
+
+    # Qty consumed by other stock entries (submitted or draft), per MR line
+    other_used = get_other_consumption([line.name for line in mr_lines], current_stock_entry)
+
+    lines_by_item = {}
+    for line in mr_lines:
+        line.remaining_qty = line.qty - flt(used_qty_map.get(line.name)) - flt(other_used.get(line.name))
+        lines_by_item.setdefault(line.item_code, []).append(line)
+
+    results = []
+    for scan in scans:
+        code = scan.get("barcode") or scan.get("item_code")
+        item_code = barcode_map.get(code, code)
+        result = {"key": scan.get("key"), "item_code": item_code, "found": False}
+
+        if item_code not in lines_by_item:
+            result["error"] = "Item not in Material Request"
+            results.append(result)
+            continue
+
+        line = next(
+            (l for l in lines_by_item[item_code] if l.remaining_qty > 0 and l.name not in used_items),
+            None
+        )
+        if not line:
+            result["error"] = "All MR lines for this item are fully used"
+            results.append(result)
+            continue
+
+        qty = min(flt(scan.get("qty")) or 1, line.remaining_qty)
+        used_items.add(line.name)
+
+        result.update({
+            "found": True,
+            "name": line.name,
+            "description": line.description,
+            "stock_uom": line.stock_uom,
+            "remaining_qty": line.remaining_qty,
+            "total_mr_qty": line.qty,
+            "qty": qty
+        })
+        line.remaining_qty -= qty
+        results.append(result)
+
+    return results
+
 @frappe.whitelist()
 def get_mr_item_remaining_qty(material_request_item, current_row_name=None, current_qty=0):
     """Get remaining qty for a specific MR item line"""
     
-    mr_item = frappe.get_doc("Material Request Item", material_request_item)
+    mr_qty = flt(frappe.db.get_value("Material Request Item", material_request_item, "qty"))
     
-    # Get used qty from other stock entry details
-    used_in_other_rows = frappe.db.sql("""
-        SELECT SUM(qty) FROM `tabStock Entry Detail`
-        WHERE material_request_item = %s
-        AND docstatus < 2
-        AND name != %s
-    """, (material_request_item, current_row_name or ''))[0][0] or 0
+    # Used qty from the maintained counter, less what the current row has saved
+    used_qty = flt(get_mr_consumption([material_request_item]).get(material_request_item))
+    current_row_qty = flt(frappe.db.get_value(
+        "Stock Entry Detail",
+        {"name": current_row_name, "docstatus": ["<", 2]},
+        "qty"
+    )) if current_row_name else 0
     
-    remaining = mr_item.qty - used_in_other_rows
+    used_in_other_rows = used_qty - current_row_qty
+    remaining = mr_qty - used_in_other_rows
     return remaining if remaining > 0 else 0
 
 @frappe.whitelist()
 def validate_stock_entry_items(stock_entry_name):
     """Validate all items in Stock Entry against MR before submit"""
-    stock_entry = frappe.get_doc("Stock Entry", stock_entry_name)
+    frappe.has_permission("Stock Entry", "read", stock_entry_name, throw=True)
     
-    if not stock_entry.custom_material_request:
-        return {"valid": True}
+    material_request = frappe.db.get_value("Stock Entry", stock_entry_name, "custom_material_request")
     
-    errors = []
-    
-    # Build map of MR items
-    mr_items = frappe.get_all(
-        "Material Request Item",
-        filters={"parent": stock_entry.custom_material_request, "docstatus": 1},
-        fields=["name", "item_code", "qty"]
-    )
-    mr_map = {item.name: item for item in mr_items}
+    if not material_request:
+        return {"valid": True}
     
-    # Validate each row
-    for item in stock_entry.items:
-        if not item.material_request_item:
-            errors.append(f"Row {item.idx}: {item.item_code} is not linked to Material Request")
-            continue
-            
-        if item.material_request_item not in mr_map:
-            errors.append(f"Row {item.idx}: Invalid Material Request link")
-            continue
-        
-        mr_line = mr_map[item.material_request_item]
-        
-        # Check total used qty across all entries
-        total_used_elsewhere = frappe.db.sql("""
-            SELECT SUM(qty) FROM `tabStock Entry Detail`
-            WHERE material_request_item = %s
-            AND docstatus < 2
-            AND parent != %s
-        """, (item.material_request_item, stock_entry_name))[0][0] or 0
-        
-        total_with_current = total_used_elsewhere + item.qty
-        
-        if total_with_current > mr_line.qty:
-            available = mr_line.qty - total_used_elsewhere
-            errors.append(
-                f"Row {item.idx}: Qty {item.qty} exceeds available {available} "
-                f"(MR total: {mr_line.qty})"
-            )
+    # All rows are checked in one set-based query (shared with the before_submit hook)
+    errors = get_stock_entry_mr_errors(stock_entry_name, material_request)
     
     return {
         "valid": len(errors) == 0,
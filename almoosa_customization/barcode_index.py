@@ -0,0 +1,248 @@
+import pickle
+import time
+from collections import OrderedDict
+
+import frappe
+from frappe import _
+
+# Redis hash of scanned value (barcode or item code) -> item code. Values are
+# pickled like frappe.cache().hset does, so both access paths agree. Entries
+# are keyed by get_index_key, as the database matches case-insensitively.
+BARCODE_INDEX_KEY = "almoosa_barcode_index"
+
+# Invalidation log: a counter and a capped list of the keys dropped by each
+# invalidation (None for all), pushed together in one transaction. Workers
+# drop only the listed keys from their LRU, or everything when they are more
+# entries behind than the list holds.
+INVALIDATION_SEQ_KEY = "almoosa_barcode_index_invalidation_seq"
+INVALIDATION_LOG_KEY = "almoosa_barcode_index_invalidations"
+INVALIDATION_LOG_SIZE = 1000
+
+LRU_SIZE = 20000
+
+# How long a worker trusts its LRU before re-reading the invalidation counter
+INVALIDATION_CHECK_INTERVAL = 2
+
+WARM_BATCH_SIZE = 5000
+
+# site -> {"seq", "checked_at", "items": OrderedDict}
+barcode_lru = {}
+
+
+def get_index_key(value):
+    """Index key of a scanned value; the database ignores case and trailing spaces"""
+    return value.rstrip(" ").lower()
+
+
+def get_invalidation_seq(cache):
+    return int(cache.get(cache.make_key(INVALIDATION_SEQ_KEY)) or 0)
+
+
+def apply_invalidations(state):
+    """Drop the LRU keys invalidated since the worker last looked"""
+    cache = frappe.cache()
+    if get_invalidation_seq(cache) == state["seq"]:
+        return
+
+    pipe = cache.pipeline()
+    pipe.get(cache.make_key(INVALIDATION_SEQ_KEY))
+    pipe.lrange(cache.make_key(INVALIDATION_LOG_KEY), 0, -1)
+    seq, log = pipe.execute()
+    seq = int(seq or 0)
+
+    # The last entry of the log belongs to invalidation number seq
+    behind = seq - state["seq"]
+    entries = [pickle.loads(raw) for raw in log[len(log) - behind:]] if 0 < behind <= len(log) else [None]
+
+    items = state["items"]
+    for keys in entries:
+        if keys is None:
+            items.clear()
+            break
+        for key in keys:
+            items.pop(key, None)
+
+    state["seq"] = seq
+
+
+def get_lru():
+    """Per-worker LRU of the current site, kept in step with the invalidation log"""
+    now = time.monotonic()
+    state = barcode_lru.get(frappe.local.site)
+
+    if not state:
+        state = {"seq": get_invalidation_seq(frappe.cache()), "items": OrderedDict()}
+        barcode_lru[frappe.local.site] = state
+    elif now - state["checked_at"] >= INVALIDATION_CHECK_INTERVAL:
+        apply_invalidations(state)
+
+    state["checked_at"] = now
+    return state["items"]
+
+
+def lru_put(lru, key, item_code):
+    lru[key] = item_code
+    lru.move_to_end(key)
+    while len(lru) > LRU_SIZE:
+        lru.popitem(last=False)
+
+
+def resolve_from_db(keys):
+    """Item Barcode first, then Item Code, as erpnext's scan_barcode does.
+
+    Returns {index key: item_code}; matches come back as stored, in whatever
+    case, and are mapped to the key they answer.
+    """
+    resolved = {}
+    for barcode, item_code in frappe.db.sql("""
+        SELECT barcode, parent FROM `tabItem Barcode`
+        WHERE barcode IN %(keys)s
+    """, {"keys": tuple(keys)}):
+        resolved[get_index_key(barcode)] = item_code
+
+    missing = tuple(key for key in keys if key not in resolved)
+    if missing:
+        for item_code in frappe.db.sql("""
+            SELECT name FROM `tabItem`
+            WHERE name IN %(keys)s
+        """, {"keys": missing}, pluck=True):
+            resolved.setdefault(get_index_key(item_code), item_code)
+
+    return {key: resolved[key] for key in keys if key in resolved}
+
+
+def resolve_barcodes(values):
+    """Return {value: item_code} for the values that match an item.
+
+    Lookups go per-worker LRU, then the redis hash, then the database; hits
+    from the slower layers are written back to the faster ones.
+    """
+    values = list(dict.fromkeys(v for v in values if v))
+    keys = list(dict.fromkeys(get_index_key(v) for v in values))
+    lru = get_lru()
+    found = {}
+
+    misses = []
+    for key in keys:
+        if key in lru:
+            lru.move_to_end(key)
+            found[key] = lru[key]
+        else:
+            misses.append(key)
+
+    if misses:
+        cache = frappe.cache()
+        index_key = cache.make_key(BARCODE_INDEX_KEY)
+
+        pipe = cache.pipeline()
+        for key in misses:
+            pipe.hget(index_key, key)
+
+        db_misses = []
+        for key, raw in zip(misses, pipe.execute()):
+            if raw is None:
+                db_misses.append(key)
+                continue
+            found[key] = pickle.loads(raw)
+            lru_put(lru, key, found[key])
+
+        if db_misses:
+            from_db = resolve_from_db(db_misses)
+            if from_db:
+                pipe = cache.pipeline()
+                for key, item_code in from_db.items():
+                    pipe.hset(index_key, key, pickle.dumps(item_code))
+                    found[key] = item_code
+                    lru_put(lru, key, item_code)
+                pipe.execute()
+
+    return {value: found[get_index_key(value)] for value in values if get_index_key(value) in found}
+
+
+def scan_barcode(search_value):
+    """Resolve one scanned barcode / item code, raising when nothing matches"""
+    item_code = resolve_barcodes([search_value]).get(search_value)
+
+    if not item_code:
+        frappe.throw(
+            _("Item not found for scanned barcode / code: {0}").format(search_value),
+            frappe.DoesNotExistError
+        )
+
+    return {"item_code": item_code}
+
+
+@frappe.whitelist()
+def scan_barcodes(values):
+    """Bulk variant of scan_barcode: {value: item_code or None} for each value"""
+    values = frappe.parse_json(values) or []
+    resolved = resolve_barcodes(values)
+    return {value: resolved.get(value) for value in values}
+
+
+def warm_barcode_index():
+    """Load every barcode and item code into the redis hash (after_migrate)"""
+    cache = frappe.cache()
+    key = cache.make_key(BARCODE_INDEX_KEY)
+    cache.delete(key)
+
+    # Item codes first so barcodes win on collisions, as in resolve_from_db
+    queries = [
+        "SELECT name, name FROM `tabItem` WHERE name > %(after)s ORDER BY name LIMIT %(limit)s",
+        "SELECT barcode, parent FROM `tabItem Barcode` WHERE barcode > %(after)s ORDER BY barcode LIMIT %(limit)s",
+    ]
+
+    for query in queries:
+        after = ""
+        while True:
+            rows = frappe.db.sql(query, {"after": after, "limit": WARM_BATCH_SIZE})
+            if not rows:
+                break
+
+            pipe = cache.pipeline()
+            for value, item_code in rows:
+                pipe.hset(key, get_index_key(value), pickle.dumps(item_code))
+            pipe.execute()
+
+            after = rows[-1][0]
+
+    log_invalidation(None)
+
+
+def clear_item_barcodes(doc, method=None, *args, **kwargs):
+    """doc_events hook on Item: drop the item's barcodes and code from every layer.
+
+    Item Barcode is a child table, so changes arrive through the Item save.
+    Dropped entries are re-read from the database on their next scan.
+    """
+    values = {doc.name}
+    values.update(row.barcode for row in doc.get("barcodes") or [] if row.barcode)
+
+    before_save = doc.get_doc_before_save() if method == "on_update" else None
+    if before_save:
+        values.update(row.barcode for row in before_save.get("barcodes") or [] if row.barcode)
+
+    # after_rename passes (old, new, merge)
+    if method == "after_rename" and args:
+        values.add(args[0])
+
+    # After commit, so a concurrent scan cannot re-cache the old mapping
+    frappe.db.after_commit.add(lambda: invalidate_barcodes(values))
+
+
+def log_invalidation(keys):
+    """Record an invalidation for the workers' LRUs; None drops everything"""
+    cache = frappe.cache()
+    log_key = cache.make_key(INVALIDATION_LOG_KEY)
+
+    pipe = cache.pipeline(transaction=True)
+    pipe.incr(cache.make_key(INVALIDATION_SEQ_KEY))
+    pipe.rpush(log_key, pickle.dumps(keys))
+    pipe.ltrim(log_key, -INVALIDATION_LOG_SIZE, -1)
+    pipe.execute()
+
+
+def invalidate_barcodes(values):
+    keys = list({get_index_key(value) for value in values})
+    frappe.cache().hdel(BARCODE_INDEX_KEY, keys)
+    log_invalidation(keys)
@@ -0,0 +1,48 @@
+import frappe
+
+# Redis hash of DocType -> {fieldname: is_custom_field} used to validate the
+# update_field APIs. Only custom fields may be written through them, and that
+# set only changes with Custom Field / DocType edits, i.e. fixture migrations.
+EDITABLE_FIELDS_KEY = "almoosa_editable_custom_fields"
+
+
+def build_editable_fields(doctype):
+    try:
+        meta = frappe.get_meta(doctype)
+    except frappe.DoesNotExistError:
+        return None
+
+    return {df.fieldname: bool(df.get("is_custom_field")) for df in meta.fields}
+
+
+def get_editable_fields(doctype):
+    """Return {fieldname: True if custom} of the DocType, None if it does not exist"""
+    return frappe.cache().hget(
+        EDITABLE_FIELDS_KEY, doctype, generator=lambda: build_editable_fields(doctype)
+    )
+
+
+def get_field_error(doctype, fields, fieldname):
+    """Validation message for writing fieldname through the update_field APIs, None if allowed"""
+    is_custom = fields.get(fieldname)
+
+    if is_custom is None:
+        return f"Field '{fieldname}' does not exist in {doctype}"
+    if not is_custom:
+        return f"Field '{fieldname}' is a standard field and cannot be edited"
+
+
+def clear_editable_fields(doc, method=None, *args, **kwargs):
+    """doc_events hook on Custom Field and DocType"""
+    doctypes = [doc.dt if doc.doctype == "Custom Field" else doc.name]
+
+    # after_rename passes (old, new, merge)
+    if method == "after_rename" and args and doc.doctype == "DocType":
+        doctypes.append(args[0])
+
+    frappe.db.after_commit.add(lambda: frappe.cache().hdel(EDITABLE_FIELDS_KEY, doctypes))
+
+
+def clear_all_editable_fields():
+    """after_migrate: fixtures may have added or removed custom fields"""
+    frappe.cache().delete_value(EDITABLE_FIELDS_KEY)
@@ -85,6 +85,12 @@ app_license = "mit"
 # before_install = "almoosa_customization.install.before_install"
 # after_install = "almoosa_customization.install.after_install"
 
+# Warm the barcode index on every deploy
+after_migrate = [
+    "almoosa_customization.barcode_index.warm_barcode_index",
+    "almoosa_customization.editable_fields.clear_all_editable_fields"
+]
+
 # Uninstallation
 # ------------
 
@@ -144,6 +150,111 @@ app_license = "mit"
 # 		"on_trash": "method"
 # 	}
 # }
+doc_events = {
+    "User Permission": {
+        "on_update": "almoosa_customization.warehouse_permissions.clear_user_warehouse_permissions",
+        "on_trash": "almoosa_customization.warehouse_permissions.clear_user_warehouse_permissions"
+    },
+    "User": {
+        "on_update": "almoosa_customization.warehouse_permissions.clear_user_warehouse_permissions",
+        "on_trash": "almoosa_customization.warehouse_permissions.clear_user_warehouse_permissions"
+    },
+    "Custom DocPerm": {
+        "on_update": "almoosa_customization.warehouse_permissions.clear_all_warehouse_permissions",
+        "on_trash": "almoosa_customization.warehouse_permissions.clear_all_warehouse_permissions"
+    },
+    "Role": {
+        "on_update": "almoosa_customization.warehouse_permissions.clear_all_warehouse_permissions"
+    },
+    "Warehouse": {
+        "on_update": "almoosa_customization.warehouse_permissions.clear_warehouse_index",
+        "on_trash": "almoosa_customization.warehouse_permissions.clear_warehouse_index",
+        "after_rename": "almoosa_customization.warehouse_permissions.clear_warehouse_index"
+    },
+    "Item Group": {
+        "on_update": "almoosa_customization.item_group_tree.clear_item_group_tree",
+        "on_trash": "almoosa_customization.item_group_tree.clear_item_group_tree",
+        "after_rename": "almoosa_customization.item_group_tree.clear_item_group_tree"
+    },
+    "Stock Ledger Entry": {
+        "after_insert": [
+            "almoosa_customization.stock_delta.update_item_stock_delta",
+            "almoosa_customization.item_metrics.mark_item_metrics_dirty"
+        ]
+    },
+    "Bin": {
+        "after_insert": "almoosa_customization.item_metrics.mark_item_metrics_dirty",
+        "on_update": "almoosa_customization.item_metrics.mark_item_metrics_dirty"
+    },
+    "Item Price": {
+        "after_insert": "almoosa_customization.item_metrics.mark_item_metrics_dirty",
+        "on_update": [
+            "almoosa_customization.item_metrics.mark_item_metrics_dirty",
+            "almoosa_customization.sync_outbox.add_to_outbox"
+        ],
+        "on_trash": [
+            "almoosa_customization.item_metrics.mark_item_metrics_dirty",
+            "almoosa_customization.sync_outbox.add_to_outbox"
+        ]
+    },
+    "Stock Entry": {
+        "validate": "almoosa_customization.mr_consumption.validate_mr_consumption",
+        "on_update": "almoosa_customization.mr_consumption.update_mr_consumption",
+        "before_submit": "almoosa_customization.mr_consumption.validate_stock_entry_against_mr",
+        "on_submit": [
+            "almoosa_customization.transit.update_transit_ledger",
+            "almoosa_customization.mr_consumption.update_mr_consumption",
+            "almoosa_customization.sync_outbox.add_to_outbox"
+        ],
+        "on_cancel": [
+            "almoosa_customization.transit.update_transit_ledger",
+            "almoosa_customization.mr_consumption.update_mr_consumption",
+            "almoosa_customization.sync_outbox.add_to_outbox"
+        ],
+        "on_trash": "almoosa_customization.mr_consumption.update_mr_consumption"
+    },
+    "Item": {
+        "on_update": [
+            "almoosa_customization.barcode_index.clear_item_barcodes",
+            "almoosa_customization.item_attributes.clear_item_attributes",
+            "almoosa_customization.sync_outbox.add_to_outbox"
+        ],
+        "on_trash": [
+            "almoosa_customization.item_metrics.delete_item_current_metrics",
+            "almoosa_customization.barcode_index.clear_item_barcodes",
+            "almoosa_customization.item_attributes.clear_item_attributes",
+            "almoosa_customization.sync_outbox.add_to_outbox"
+        ],
+        "after_rename": [
+            "almoosa_customization.item_metrics.rename_item_current_metrics",
+            "almoosa_customization.barcode_index.clear_item_barcodes",
+            "almoosa_customization.item_attributes.clear_item_attributes",
+            "almoosa_customization.sync_outbox.add_to_outbox"
+        ]
+    },
+    "POS Invoice": {
+        "on_submit": [
+            "almoosa_customization.sync_outbox.add_to_outbox",
+            "almoosa_customization.shift_summary.update_shift_summary"
+        ],
+        "on_cancel": [
+            "almoosa_customization.sync_outbox.add_to_outbox",
+            "almoosa_customization.shift_summary.update_shift_summary"
+        ]
+    },
+    "Custom Field": {
+        "on_update": "almoosa_customization.editable_fields.clear_editable_fields",
+        "on_trash": "almoosa_customization.editable_fields.clear_editable_fields"
+    },
+    "DocType": {
+        "on_update": "almoosa_customization.editable_fields.clear_editable_fields",
+        "on_trash": "almoosa_customization.editable_fields.clear_editable_fields",
+        "after_rename": "almoosa_customization.editable_fields.clear_editable_fields"
+    },
+    "Material Request": {
+        "before_save": "almoosa_customization.item_attributes.fill_material_request_attributes"
+    }
+}
 
 # Scheduled Tasks
 # ---------------
@@ -165,6 +276,29 @@ app_license = "mit"
 # 		"almoosa_customization.tasks.monthly"
 # 	],
 # }
+scheduler_events = {
+    "cron": {
+        # Off-peak, every 15 minutes until the backlog is consolidated
+        "*/15 1-5 * * *": [
+            "almoosa_customization.pos_consolidation.enqueue_pos_consolidation"
+        ]
+    },
+    "all": [
+        "almoosa_customization.item_metrics.refresh_dirty_item_metrics",
+        "almoosa_customization.pos_closing.retry_pos_closings",
+        "almoosa_customization.pos_consolidation.retry_pos_consolidation_batches"
+    ],
+    "hourly": [
+        "almoosa_customization.transit.sync_transit_ledger"
+    ],
+    "daily": [
+        "almoosa_customization.stock_delta.repair_item_stock_deltas",
+        "almoosa_customization.item_metrics.rebuild_item_current_metrics",
+        "almoosa_customization.transit.update_transit_ageing",
+        "almoosa_customization.sync_outbox.purge_sync_outbox",
+        "almoosa_customization.shift_summary.repair_shift_summaries"
+    ]
+}
 
 # Testing
 # -------
@@ -198,6 +332,12 @@ override_whitelisted_methods = {
 # -----------------------------------------------------------
 
 # ignore_links_on_delete = ["Communication", "ToDo"]
+ignore_links_on_delete = [
+    "Item Current Metrics",
+    "Material Request Item Consumption",
+    "POS Auto Closing Log",
+    "POS Shift Summary",
+]
 
 # Request Events
 # ----------------
@@ -0,0 +1,73 @@
+import pickle
+
+import frappe
+
+# Redis hash of item code -> {attribute name (lowercased): value}. Values are
+# pickled like frappe.cache().hset does, so both access paths agree.
+ITEM_ATTRIBUTES_KEY = "almoosa_item_attributes"
+
+
+def get_items_attributes(item_codes):
+    """Return {item_code: {attribute: value}} for the given items.
+
+    Cached items come from one redis round trip; the rest are read with one
+    query and written back, items without attributes included.
+    """
+    item_codes = list(dict.fromkeys(code for code in item_codes if code))
+    if not item_codes:
+        return {}
+
+    cache = frappe.cache()
+    key = cache.make_key(ITEM_ATTRIBUTES_KEY)
+
+    pipe = cache.pipeline()
+    for item_code in item_codes:
+        pipe.hget(key, item_code)
+
+    result = {}
+    misses = []
+    for item_code, raw in zip(item_codes, pipe.execute()):
+        if raw is None:
+            misses.append(item_code)
+        else:
+            result[item_code] = pickle.loads(raw)
+
+    if misses:
+        loaded = {item_code: {} for item_code in misses}
+        for attr in frappe.get_all(
+            "Item Variant Attribute",
+            filters={"parent": ["in", misses], "parenttype": "Item"},
+            fields=["parent", "attribute", "attribute_value"]
+        ):
+            loaded[attr.parent][attr.attribute.lower()] = attr.attribute_value
+
+        pipe = cache.pipeline()
+        for item_code, attrs in loaded.items():
+            pipe.hset(key, item_code, pickle.dumps(attrs))
+        pipe.execute()
+
+        result.update(loaded)
+
+    return result
+
+
+def fill_material_request_attributes(doc, method=None):
+    """doc_events hook on Material Request before_save: color and size for all rows"""
+    attributes = get_items_attributes([row.item_code for row in doc.get("items")])
+
+    for row in doc.get("items"):
+        attrs = attributes.get(row.item_code)
+        if attrs:
+            row.custom_color = attrs.get("color")
+            row.custom_size = attrs.get("size")
+
+
+def clear_item_attributes(doc, method=None, *args, **kwargs):
+    """doc_events hook on Item: attributes are a child table of Item"""
+    item_codes = [doc.name]
+
+    # after_rename passes (old, new, merge)
+    if method == "after_rename" and args:
+        item_codes.append(args[0])
+
+    frappe.db.after_commit.add(lambda: frappe.cache().hdel(ITEM_ATTRIBUTES_KEY, item_codes))
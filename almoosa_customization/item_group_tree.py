@@ -0,0 +1,103 @@
+import frappe
+from frappe.utils import cint
+
+# Version tag of the Item Group tree. Each worker keeps the built tree in
+# process memory and rebuilds it when the tag changes.
+ITEM_GROUP_TREE_VERSION_KEY = "almoosa_item_group_tree_version"
+
+# site -> (version, tree)
+item_group_tree_cache = {}
+
+MAX_RESULTS = 200
+
+
+def get_item_group_tree():
+    """Return [(name, name_lower, segments_lower, path, level)] ordered by tree position"""
+    version = frappe.cache().get_value(
+        ITEM_GROUP_TREE_VERSION_KEY, generator=lambda: frappe.generate_hash(length=10)
+    )
+
+    cached = item_group_tree_cache.get(frappe.local.site)
+    if cached and cached[0] == version:
+        return cached[1]
+
+    tree = build_item_group_tree()
+    item_group_tree_cache[frappe.local.site] = (version, tree)
+    return tree
+
+
+def build_item_group_tree():
+    """Precompute dotted path and level of every Item Group from the parent links"""
+    groups = frappe.get_all(
+        "Item Group",
+        fields=["name", "parent_item_group"],
+        order_by="lft asc"
+    )
+
+    # Ordered by lft, so a parent is always seen before its children
+    paths = {}
+    levels = {}
+    tree = []
+
+    for group in groups:
+        parent = group.parent_item_group
+        # Group names here are usually dotted already (MAIN.GENDER.CATEGORY),
+        # so only the last segment is appended to the parent's path
+        segment = group.name.rsplit(".", 1)[-1]
+
+        if parent in paths:
+            path = f"{paths[parent]}.{segment}" if paths[parent] else segment
+            level = levels[parent] + 1
+        else:
+            # Root ("All Item Groups") is not part of the path
+            path = "" if not parent else group.name
+            level = 0 if not parent else 1
+
+        paths[group.name] = path
+        levels[group.name] = level
+
+        name_lower = group.name.lower()
+        tree.append((group.name, name_lower, name_lower.split("."), path or group.name, level))
+
+    return tree
+
+
+@frappe.whitelist()
+def search_item_groups(txt="", limit=20):
+    """Ranked Item Group search for report filters.
+
+    Exact matches come first, then name prefix, then prefix of any dotted
+    segment, then substring matches; ties go to the shallower group.
+    """
+    frappe.has_permission("Item Group", "read", throw=True)
+
+    txt = (txt or "").strip().lower()
+    limit = min(cint(limit) or 20, MAX_RESULTS)
+
+    matches = []
+    for name, name_lower, segments, path, level in get_item_group_tree():
+        if name_lower == txt:
+            rank = 0
+        elif name_lower.startswith(txt):
+            rank = 1
+        elif any(segment.startswith(txt) for segment in segments):
+            rank = 2
+        elif txt in name_lower:
+            rank = 3
+        else:
+            continue
+
+        matches.append((rank, level, name_lower, name, path))
+
+    matches.sort()
+
+    return [
+        {"value": name, "label": name, "description": path}
+        for _rank, _level, _name_lower, name, path in matches[:limit]
+    ]
+
+
+def clear_item_group_tree(doc=None, method=None, *args, **kwargs):
+    """doc_events hook on Item Group: make every worker rebuild its tree"""
+    # Only after commit, or a worker could rebuild from the old rows under a new tag
+    frappe.db.after_commit.add(lambda: frappe.cache().delete_value(ITEM_GROUP_TREE_VERSION_KEY))
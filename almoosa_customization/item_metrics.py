@@ -0,0 +1,116 @@
+import frappe
+
+# Redis set of item codes whose Item Current Metrics row is stale. Stock
+# movements only mark items here; the scheduler refreshes them in batches.
+DIRTY_ITEMS_KEY = "almoosa_item_metrics_dirty"
+
+# Items refreshed per query by the scheduler job
+REFRESH_BATCH_SIZE = 500
+
+RSP_PRICE_LIST = "RSP"
+
+
+def mark_item_metrics_dirty(doc, method=None):
+    """doc_events hook on Stock Ledger Entry, Bin and Item Price.
+
+    The item is queued only once the transaction commits, so the refresh
+    never reads Bin rows that are not visible yet.
+    """
+    item_code = doc.item_code
+    frappe.db.after_commit.add(lambda: frappe.cache().sadd(DIRTY_ITEMS_KEY, item_code))
+
+
+def refresh_dirty_item_metrics():
+    """Scheduler job: refresh queued items"""
+    cache = frappe.cache()
+    key = cache.make_key(DIRTY_ITEMS_KEY)
+
+    while True:
+        # SPOP is atomic, so an item queued again meanwhile stays queued
+        item_codes = [
+            d.decode() if isinstance(d, bytes) else d
+            for d in cache.spop(key, REFRESH_BATCH_SIZE) or []
+        ]
+        if not item_codes:
+            break
+
+        refresh_item_current_metrics(item_codes)
+        frappe.db.commit()
+
+
+def refresh_item_current_metrics(item_codes=None):
+    """Recompute Item Current Metrics from Bin and Item Price.
+
+    Without item_codes every item is refreshed.
+    """
+    values = {"price_list": RSP_PRICE_LIST}
+    item_condition = bin_condition = price_condition = ""
+
+    if item_codes is not None:
+        if not item_codes:
+            return
+        values["item_codes"] = tuple(item_codes)
+        item_condition = "AND it.name IN %(item_codes)s"
+        bin_condition = "WHERE bn.item_code IN %(item_codes)s"
+        price_condition = "AND ip.item_code IN %(item_codes)s"
+
+    frappe.db.sql(f"""
+        INSERT INTO `tabItem Current Metrics`
+            (name, creation, modified, modified_by, owner, docstatus, idx,
+             item_code, avg_valuation_rate, total_actual_qty, rsp_price)
+        SELECT
+            it.name, NOW(), NOW(), 'Administrator', 'Administrator', 0, 0,
+            it.name,
+            COALESCE(bn.avg_rate, 0),
+            COALESCE(bn.actual_qty, 0),
+            COALESCE(rsp.price_list_rate, 0)
+        FROM `tabItem` it
+        LEFT JOIN (
+            SELECT bn.item_code,
+                   AVG(bn.valuation_rate) as avg_rate,
+                   SUM(bn.actual_qty) as actual_qty
+            FROM `tabBin` bn
+            {bin_condition}
+            GROUP BY bn.item_code
+        ) bn ON bn.item_code = it.name
+        LEFT JOIN (
+            -- Latest RSP price valid today
+            SELECT item_code, price_list_rate
+            FROM (
+                SELECT ip.item_code, ip.price_list_rate,
+                       ROW_NUMBER() OVER (
+                           PARTITION BY ip.item_code
+                           ORDER BY ip.valid_from DESC, ip.modified DESC
+                       ) as rn
+                FROM `tabItem Price` ip
+                WHERE ip.price_list = %(price_list)s
+                AND (ip.valid_from IS NULL OR ip.valid_from <= CURDATE())
+                AND (ip.valid_upto IS NULL OR ip.valid_upto >= CURDATE())
+                {price_condition}
+            ) ranked
+            WHERE rn = 1
+        ) rsp ON rsp.item_code = it.name
+        WHERE 1=1 {item_condition}
+        ON DUPLICATE KEY UPDATE
+            avg_valuation_rate = VALUES(avg_valuation_rate),
+            total_actual_qty = VALUES(total_actual_qty),
+            rsp_price = VALUES(rsp_price),
+            modified = NOW()
+    """, values)
+
+
+def rebuild_item_current_metrics():
+    """Daily job and patch: refresh every item (prices change validity by date)"""
+    refresh_item_current_metrics()
+    frappe.db.commit()
+
+
+def delete_item_current_metrics(doc, method=None):
+    """doc_events hook on Item on_trash"""
+    frappe.db.delete("Item Current Metrics", {"name": doc.name})
+
+
+def rename_item_current_metrics(doc, method=None, old=None, new=None, merge=False):
+    """doc_events hook on Item after_rename: the row is named by item code"""
+    frappe.db.delete("Item Current Metrics", {"name": old})
+    refresh_item_current_metrics([new])
@@ -0,0 +1,261 @@
+import frappe
+from frappe import _
+from frappe.utils import flt
+
+# Material Request Item Consumption keeps, per MR line, the qty on draft and on
+# submitted Stock Entries. Counters are recomputed for the touched lines on
+# every Stock Entry save, submit, cancel and delete; validate locks the rows
+# first, so concurrent entries against the same lines are serialised.
+
+BACKFILL_BATCH_SIZE = 1000
+
+
+def get_entry_mr_items(doc):
+    """MR lines referenced by the entry now or before this save"""
+    mr_items = {row.material_request_item for row in doc.get("items") if row.material_request_item}
+
+    before_save = doc.get_doc_before_save()
+    if before_save:
+        mr_items.update(
+            row.material_request_item for row in before_save.get("items") if row.material_request_item
+        )
+
+    return mr_items
+
+
+def refresh_mr_consumption(mr_items, exclude_stock_entry=None):
+    """Recompute draft / submitted qty of the given MR lines from Stock Entry Detail"""
+    if not mr_items:
+        return
+
+    values = {"mr_items": tuple(mr_items)}
+    exclude = ""
+    if exclude_stock_entry:
+        # on_trash runs before the rows are deleted
+        exclude = "AND sed.parent != %(exclude)s"
+        values["exclude"] = exclude_stock_entry
+
+    frappe.db.sql(f"""
+        INSERT INTO `tabMaterial Request Item Consumption`
+            (name, creation, modified, modified_by, owner, docstatus, idx,
+             material_request_item, material_request, item_code, draft_qty, submitted_qty)
+        SELECT
+            mri.name, NOW(), NOW(), 'Administrator', 'Administrator', 0, 0,
+            mri.name, mri.parent, mri.item_code,
+            COALESCE(SUM(CASE WHEN sed.docstatus = 0 THEN sed.qty END), 0),
+            COALESCE(SUM(CASE WHEN sed.docstatus = 1 THEN sed.qty END), 0)
+        FROM `tabMaterial Request Item` mri
+        LEFT JOIN `tabStock Entry Detail` sed
+            ON sed.material_request_item = mri.name
+           AND sed.docstatus < 2
+           {exclude}
+        WHERE mri.name IN %(mr_items)s
+        GROUP BY mri.name, mri.parent, mri.item_code
+        ON DUPLICATE KEY UPDATE
+            draft_qty = VALUES(draft_qty),
+            submitted_qty = VALUES(submitted_qty),
+            modified = NOW()
+    """, values)
+
+
+def update_mr_consumption(doc, method=None):
+    """doc_events hook on Stock Entry on_update / on_submit / on_cancel / on_trash"""
+    mr_items = get_entry_mr_items(doc)
+    if not mr_items:
+        return
+
+    refresh_mr_consumption(mr_items, exclude_stock_entry=doc.name if method == "on_trash" else None)
+
+
+def lock_mr_consumption(mr_items):
+    """Lock the counter rows of the given MR lines for this transaction.
+
+    Returns {mr_item: row with mr_qty, draft_qty, submitted_qty}; missing
+    counters are created first.
+    """
+    if not mr_items:
+        return {}
+
+    values = {"mr_items": tuple(mr_items)}
+    query = """
+        SELECT c.name, mri.qty AS mr_qty, c.draft_qty, c.submitted_qty
+        FROM `tabMaterial Request Item Consumption` c
+        JOIN `tabMaterial Request Item` mri ON mri.name = c.name
+        WHERE c.name IN %(mr_items)s
+        FOR UPDATE
+    """
+
+    counters = {row.name: row for row in frappe.db.sql(query, values, as_dict=True)}
+
+    missing = set(mr_items) - set(counters)
+    if missing:
+        refresh_mr_consumption(missing)
+        counters = {row.name: row for row in frappe.db.sql(query, values, as_dict=True)}
+
+    return counters
+
+
+def get_mr_consumption(mr_items):
+    """Return {mr_item: draft + submitted qty} from the counters"""
+    if not mr_items:
+        return {}
+
+    return dict(frappe.db.sql("""
+        SELECT name, draft_qty + submitted_qty
+        FROM `tabMaterial Request Item Consumption`
+        WHERE name IN %(mr_items)s
+    """, {"mr_items": tuple(mr_items)}))
+
+
+def get_entry_consumption(stock_entry, mr_items):
+    """Return {mr_item: qty} saved on one Stock Entry for the given MR lines"""
+    if not stock_entry or not mr_items:
+        return {}
+
+    return dict(frappe.db.sql("""
+        SELECT material_request_item, SUM(qty)
+        FROM `tabStock Entry Detail`
+        WHERE parent = %(stock_entry)s
+        AND parenttype = 'Stock Entry'
+        AND material_request_item IN %(mr_items)s
+        AND docstatus < 2
+        GROUP BY material_request_item
+    """, {"stock_entry": stock_entry, "mr_items": tuple(mr_items)}))
+
+
+def get_other_consumption(mr_items, stock_entry=None):
+    """Return {mr_item: qty used by Stock Entries other than stock_entry}"""
+    used = get_mr_consumption(mr_items)
+    own = get_entry_consumption(stock_entry, mr_items)
+
+    return {mr_item: flt(used.get(mr_item)) - flt(own.get(mr_item)) for mr_item in mr_items}
+
+
+def validate_mr_consumption(doc, method=None):
+    """doc_events hook on Stock Entry validate: reject over-allocation of MR lines.
+
+    Counter rows stay locked until the transaction ends, so another entry
+    validating against the same lines waits for this one to commit.
+    """
+    if not doc.get("custom_material_request"):
+        return
+
+    qty_by_line = {}
+    for row in doc.get("items"):
+        if row.material_request_item:
+            qty_by_line[row.material_request_item] = qty_by_line.get(row.material_request_item, 0) + flt(row.qty)
+
+    if not qty_by_line:
+        return
+
+    counters = lock_mr_consumption(qty_by_line)
+    own = get_entry_consumption(None if doc.is_new() else doc.name, qty_by_line)
+
+    errors = []
+    for mr_item, qty in qty_by_line.items():
+        counter = counters.get(mr_item)
+        if not counter:
+            continue
+
+        used_elsewhere = flt(counter.draft_qty) + flt(counter.submitted_qty) - flt(own.get(mr_item))
+        if used_elsewhere + qty > flt(counter.mr_qty):
+            rows = ", ".join(str(row.idx) for row in doc.items if row.material_request_item == mr_item)
+            errors.append(
+                _("Row {0}: Qty {1} exceeds available {2} (MR total: {3})").format(
+                    rows, qty, flt(counter.mr_qty) - used_elsewhere, counter.mr_qty
+                )
+            )
+
+    if errors:
+        frappe.throw("<br>".join(errors), title=_("Material Request Qty Exceeded"))
+
+
+def backfill_mr_consumption():
+    """Build counters for every MR line referenced by a Stock Entry"""
+    mr_items = frappe.db.sql("""
+        SELECT DISTINCT material_request_item
+        FROM `tabStock Entry Detail`
+        WHERE material_request_item IS NOT NULL
+        AND material_request_item != ''
+    """, pluck=True)
+
+    for start in range(0, len(mr_items), BACKFILL_BATCH_SIZE):
+        refresh_mr_consumption(mr_items[start:start + BACKFILL_BATCH_SIZE])
+        frappe.db.commit()
+
+
+def get_mr_row_errors(rows, stock_entry, material_request):
+    """Validate Stock Entry rows against their Material Request.
+
+    rows carry idx, item_code, qty and material_request_item; they are the
+    in-memory rows on submit and the saved ones for the API check. MR lines and
+    counters are fetched in one query, rows sharing an MR line are checked on
+    their combined qty. Returns the list of row errors.
+    """
+    qty_by_line = {}
+    for row in rows:
+        if row.material_request_item:
+            qty_by_line[row.material_request_item] = qty_by_line.get(row.material_request_item, 0) + flt(row.qty)
+
+    mr_lines = {}
+    if qty_by_line:
+        mr_lines = {
+            d.name: d
+            for d in frappe.db.sql("""
+                SELECT mri.name, mri.qty AS mr_qty, COALESCE(c.draft_qty + c.submitted_qty, 0) AS used_qty
+                FROM `tabMaterial Request Item` mri
+                LEFT JOIN `tabMaterial Request Item Consumption` c ON c.name = mri.name
+                WHERE mri.name IN %(mr_items)s
+                AND mri.parent = %(material_request)s
+                AND mri.docstatus = 1
+            """, {"mr_items": tuple(qty_by_line), "material_request": material_request}, as_dict=True)
+        }
+
+    # The counters already hold what this entry had saved
+    own = get_entry_consumption(stock_entry, qty_by_line)
+
+    errors = []
+    for row in rows:
+        mr_line = mr_lines.get(row.material_request_item)
+
+        if not row.material_request_item:
+            errors.append(f"Row {row.idx}: {row.item_code} is not linked to Material Request")
+        elif not mr_line:
+            errors.append(f"Row {row.idx}: Invalid Material Request link")
+        else:
+            used_elsewhere = flt(mr_line.used_qty) - flt(own.get(row.material_request_item))
+            if used_elsewhere + qty_by_line[row.material_request_item] > flt(mr_line.mr_qty):
+                available = flt(mr_line.mr_qty) - used_elsewhere
+                errors.append(
+                    f"Row {row.idx}: Qty {row.qty} exceeds available {available} "
+                    f"(MR total: {mr_line.mr_qty})"
+                )
+
+    return errors
+
+
+def get_stock_entry_mr_errors(stock_entry, material_request):
+    """Validate every saved row of a Stock Entry against its Material Request"""
+    rows = frappe.db.sql("""
+        SELECT idx, item_code, qty, material_request_item
+        FROM `tabStock Entry Detail`
+        WHERE parent = %(stock_entry)s
+        AND parenttype = 'Stock Entry'
+        ORDER BY idx
+    """, {"stock_entry": stock_entry}, as_dict=True)
+
+    return get_mr_row_errors(rows, stock_entry, material_request)
+
+
+def validate_stock_entry_against_mr(doc, method=None):
+    """doc_events hook on Stock Entry before_submit.
+
+    Checks the rows being submitted, which may not be saved yet (inserted with
+    docstatus 1, or changed in the same call).
+    """
+    if not doc.get("custom_material_request"):
+        return
+
+    errors = get_mr_row_errors(doc.get("items"), None if doc.is_new() else doc.name, doc.custom_material_request)
+    if errors:
+        frappe.throw("<br>".join(errors), title=_("Material Request Validation Failed"))
@@ -0,0 +1,9 @@
+import frappe
+
+
+def execute():
+    # Keyset pagination of api.get_updated_items orders by (modified|creation, name)
+    frappe.db.add_index("Item", ["modified", "name"])
+    frappe.db.add_index("Item", ["creation", "name"])
+    # Default lower bound of the feed is MIN(custom_last_synced)
+    frappe.db.add_index("Item", ["custom_last_synced"])
@@ -0,0 +1,6 @@
+import frappe
+
+
+def execute():
+    # pos_consolidation reads unconsolidated invoices per (pos_profile, posting_date)
+    frappe.db.add_index("POS Invoice", ["pos_profile", "posting_date"])
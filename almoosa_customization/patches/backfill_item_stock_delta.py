@@ -0,0 +1,5 @@
+from almoosa_customization.stock_delta import rebuild_all_item_stock_deltas
+
+
+def execute():
+    rebuild_all_item_stock_deltas()
@@ -0,0 +1,9 @@
+import frappe
+
+from almoosa_customization.mr_consumption import backfill_mr_consumption
+
+
+def execute():
+    # Counters are recomputed per MR line
+    frappe.db.add_index("Stock Entry Detail", ["material_request_item"])
+    backfill_mr_consumption()
@@ -0,0 +1,11 @@
+import frappe
+
+from almoosa_customization.transit import backfill_transit_ledger
+
+
+def execute():
+    # Receipts are looked up by the outgoing entry they reference
+    frappe.db.add_index("Stock Entry", ["outgoing_stock_entry"])
+    # The hourly sync picks up entries by modified
+    frappe.db.add_index("Stock Entry", ["modified"])
+    backfill_transit_ledger()
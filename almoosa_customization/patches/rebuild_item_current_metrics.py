@@ -0,0 +1,5 @@
+from almoosa_customization.item_metrics import rebuild_item_current_metrics
+
+
+def execute():
+    rebuild_item_current_metrics()
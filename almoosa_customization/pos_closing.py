@@ -0,0 +1,330 @@
+from datetime import datetime, time
+
+import frappe
+from frappe.utils import add_to_date, flt, now_datetime
+
+# Openings are closed by one background job each. A job holds a MariaDB
+# advisory lock on its POS Profile while closing, so two jobs never close the
+# same store at once, and records its outcome in POS Auto Closing Log.
+
+# Custom queue for closing jobs; "long" is used unless a worker is configured
+# for it in common_site_config "workers"
+CLOSING_QUEUE = "pos_closing"
+CLOSING_JOB_TIMEOUT = 1500
+
+# Seconds a job waits for another job closing the same profile
+LOCK_WAIT_SECONDS = 30
+
+# Minutes before retry n; no more retries after the last one
+RETRY_BACKOFF_MINUTES = [2, 10, 30]
+
+# Queued / Running logs older than this belong to a lost job and may be requeued
+STALE_JOB_MINUTES = 60
+
+# Same invoices as erpnext's get_pos_invoices: submitted, not yet consolidated
+# POS Invoices of the cashier and profile, posted inside the closing window
+INVOICE_CONDITIONS = """
+    pi.owner = %(user)s
+    AND pi.pos_profile = %(pos_profile)s
+    AND pi.docstatus = 1
+    AND IFNULL(pi.consolidated_invoice, '') = ''
+    AND TIMESTAMP(pi.posting_date, pi.posting_time) BETWEEN %(start)s AND %(end)s
+"""
+
+# Totals compared with the shift summary: (invoice / summary field, closing entry field)
+SUMMARY_TOTALS = [
+    ("grand_total", "grand_total"),
+    ("net_total", "net_total"),
+    ("total_qty", "total_quantity"),
+]
+
+
+def get_closing_window(opening):
+    """Closing covers the opening's start day up to 23:59:59"""
+    start_dt = opening.period_start_date
+    end_dt = datetime.combine(start_dt, time(23, 59, 59))
+    return start_dt, end_dt
+
+
+def get_invoice_values(opening):
+    start_dt, end_dt = get_closing_window(opening)
+    return {
+        "user": opening.user,
+        "pos_profile": opening.pos_profile,
+        "start": start_dt,
+        "end": end_dt,
+    }
+
+
+def get_closing_transactions(values):
+    return frappe.db.sql(f"""
+        SELECT pi.name AS pos_invoice, pi.posting_date, pi.grand_total, pi.customer,
+            pi.net_total, pi.total_qty
+        FROM `tabPOS Invoice` pi
+        WHERE {INVOICE_CONDITIONS}
+        ORDER BY pi.posting_date, pi.posting_time, pi.name
+    """, values, as_dict=True)
+
+
+def get_closing_taxes(values):
+    return frappe.db.sql(f"""
+        SELECT t.account_head, t.rate, SUM(t.tax_amount) AS amount
+        FROM `tabSales Taxes and Charges` t
+        JOIN `tabPOS Invoice` pi ON pi.name = t.parent
+        WHERE t.parenttype = 'POS Invoice'
+        AND {INVOICE_CONDITIONS}
+        GROUP BY t.account_head, t.rate
+        ORDER BY t.account_head, t.rate
+    """, values, as_dict=True)
+
+
+def get_closing_payments(values):
+    return frappe.db.sql(f"""
+        SELECT p.mode_of_payment, 0 AS opening_amount, SUM(p.amount) AS expected_amount
+        FROM `tabSales Invoice Payment` p
+        JOIN `tabPOS Invoice` pi ON pi.name = p.parent
+        WHERE p.parenttype = 'POS Invoice'
+        AND {INVOICE_CONDITIONS}
+        GROUP BY p.mode_of_payment
+        ORDER BY p.mode_of_payment
+    """, values, as_dict=True)
+
+
+def summary_matches(summary, transactions):
+    """The shift summary adds up the same invoices: equal count and totals"""
+    if not summary or summary.invoice_count != len(transactions):
+        return False
+
+    return all(
+        flt(summary[field], 2) == flt(sum(flt(inv[field]) for inv in transactions), 2)
+        for field, _closing_field in SUMMARY_TOTALS
+    )
+
+
+def make_pos_closing_entry(opening):
+    """Unsaved POS Closing Entry for the opening, None when it has no invoices.
+
+    Totals, tax summary and payment reconciliation come from the POS Shift
+    Summary when its count and totals match the invoices being closed, else
+    they are aggregated in SQL; only the invoice list is fetched row by row
+    for pos_transactions.
+    """
+    # shift_summary imports this module
+    from almoosa_customization.shift_summary import get_shift_summary_data
+
+    values = get_invoice_values(opening)
+
+    transactions = get_closing_transactions(values)
+    if not transactions:
+        return None
+
+    start_dt, end_dt = values["start"], values["end"]
+
+    closing = frappe.new_doc("POS Closing Entry")
+    closing.pos_opening_entry = opening.name
+    closing.pos_profile = opening.pos_profile
+    closing.user = opening.user
+    closing.company = opening.company
+
+    closing.posting_date = opening.posting_date
+    closing.posting_time = "23:59:59"
+    closing.period_start_date = start_dt
+    closing.period_end_date = end_dt
+
+    closing.set("pos_transactions", [
+        {
+            "pos_invoice": inv.pos_invoice,
+            "posting_date": inv.posting_date,
+            "grand_total": inv.grand_total,
+            "customer": inv.customer,
+        }
+        for inv in transactions
+    ])
+
+    summary = get_shift_summary_data(opening.name)
+    if summary_matches(summary, transactions):
+        closing.set("taxes", [
+            {"account_head": tax.account_head, "rate": tax.rate, "amount": tax.amount}
+            for tax in summary.taxes
+        ])
+        closing.set("payment_reconciliation", [
+            {"mode_of_payment": pay.mode_of_payment, "opening_amount": 0, "expected_amount": pay.amount}
+            for pay in summary.payments
+        ])
+    else:
+        closing.set("taxes", get_closing_taxes(values))
+        closing.set("payment_reconciliation", get_closing_payments(values))
+
+    # The invoice list is fetched anyway, and matches the summary when it was used
+    for field, closing_field in SUMMARY_TOTALS:
+        closing.set(closing_field, sum(flt(inv[field]) for inv in transactions))
+
+    return closing
+
+
+def get_closing_queue():
+    return CLOSING_QUEUE if CLOSING_QUEUE in (frappe.conf.get("workers") or {}) else "long"
+
+
+def set_closing_log(pos_opening_entry, **fields):
+    """Create or update the opening's POS Auto Closing Log row"""
+    fields["pos_opening_entry"] = pos_opening_entry
+    columns = list(fields)
+
+    frappe.db.sql(f"""
+        INSERT INTO `tabPOS Auto Closing Log`
+            (name, creation, modified, modified_by, owner, docstatus, idx,
+             {", ".join(f"`{column}`" for column in columns)})
+        VALUES
+            (%(pos_opening_entry)s, NOW(), NOW(), 'Administrator', 'Administrator', 0, 0,
+             {", ".join(f"%({column})s" for column in columns)})
+        ON DUPLICATE KEY UPDATE
+            modified = NOW(),
+            {", ".join(f"`{column}` = VALUES(`{column}`)" for column in columns)}
+    """, fields)
+
+
+def enqueue_pos_closing(pos_opening_entry, pos_profile, attempts=0):
+    """Queue the closing job of one opening, at most one per opening at a time"""
+    set_closing_log(
+        pos_opening_entry,
+        pos_profile=pos_profile,
+        status="Queued",
+        attempts=attempts,
+        next_retry_at=None,
+    )
+
+    frappe.enqueue(
+        "almoosa_customization.pos_closing.close_pos_opening_entry",
+        queue=get_closing_queue(),
+        timeout=CLOSING_JOB_TIMEOUT,
+        job_id=f"pos_auto_closing::{pos_opening_entry}",
+        deduplicate=True,
+        enqueue_after_commit=True,
+        pos_opening_entry=pos_opening_entry,
+    )
+
+
+def enqueue_pos_closings(openings):
+    """Queue every opening not already queued or running; returns the number queued"""
+    if not openings:
+        return 0
+
+    busy = set(frappe.db.sql("""
+        SELECT name FROM `tabPOS Auto Closing Log`
+        WHERE name IN %(openings)s
+        AND status IN ('Queued', 'Running')
+        AND modified > %(stale_before)s
+    """, {
+        "openings": tuple(row.name for row in openings),
+        "stale_before": add_to_date(now_datetime(), minutes=-STALE_JOB_MINUTES),
+    }, pluck=True))
+
+    queued = 0
+    for row in openings:
+        if row.name not in busy:
+            enqueue_pos_closing(row.name, row.pos_profile)
+            queued += 1
+
+    frappe.db.commit()
+    return queued
+
+
+def close_pos_opening_entry(pos_opening_entry):
+    """Background job: close one POS Opening Entry, retrying later on failure"""
+    logger = frappe.logger("pos_auto_closing")
+
+    attempts = frappe.db.get_value("POS Auto Closing Log", pos_opening_entry, "attempts") or 0
+    set_closing_log(pos_opening_entry, status="Running", started_at=now_datetime(), finished_at=None, error=None)
+    frappe.db.commit()
+
+    locked = False
+    try:
+        # Inside the try, so an opening deleted since it was queued fails the log
+        opening = frappe.get_doc("POS Opening Entry", pos_opening_entry)
+        lock_name = f"almoosa_pos_closing:{opening.pos_profile}"
+
+        locked = frappe.db.sql("SELECT GET_LOCK(%s, %s)", (lock_name, LOCK_WAIT_SECONDS))[0][0] == 1
+        if not locked:
+            raise frappe.ValidationError(f"POS Profile {opening.pos_profile} is being closed by another job")
+
+        status, closing_entry, message = close_opening(opening)
+
+        set_closing_log(
+            pos_opening_entry,
+            status=status,
+            pos_closing_entry=closing_entry,
+            attempts=0,
+            finished_at=now_datetime(),
+            error=message,
+        )
+        frappe.db.commit()
+        logger.info(f"{pos_opening_entry}: {status} {closing_entry or message or ''}")
+
+    except Exception as e:
+        frappe.db.rollback()
+        attempts += 1
+        # A deleted opening will not come back
+        retry = attempts <= len(RETRY_BACKOFF_MINUTES) and not isinstance(e, frappe.DoesNotExistError)
+
+        set_closing_log(
+            pos_opening_entry,
+            status="Failed",
+            attempts=attempts,
+            finished_at=now_datetime(),
+            next_retry_at=add_to_date(now_datetime(), minutes=RETRY_BACKOFF_MINUTES[attempts - 1]) if retry else None,
+            error=frappe.get_traceback(),
+        )
+        frappe.log_error(title=f"POS Auto Closing Failed: {pos_opening_entry}", message=frappe.get_traceback())
+        frappe.db.commit()
+
+    finally:
+        if locked:
+            frappe.db.sql("SELECT RELEASE_LOCK(%s)", (lock_name,))
+
+
+def close_opening(opening):
+    """Close the opening unless that already happened; returns (status, closing entry, message)"""
+    opening.reload()
+    if opening.docstatus != 1 or opening.status != "Open":
+        return "Skipped", opening.get("pos_closing_entry"), f"Opening is {opening.status}"
+
+    # A previous attempt may have inserted the closing entry before failing
+    existing = frappe.db.get_value(
+        "POS Closing Entry",
+        {"pos_opening_entry": opening.name, "docstatus": ["<", 2]},
+        ["name", "docstatus"],
+        as_dict=True,
+    )
+    if existing and existing.docstatus == 1:
+        return "Skipped", existing.name, "Already closed"
+
+    if existing:
+        closing = frappe.get_doc("POS Closing Entry", existing.name)
+    else:
+        closing = make_pos_closing_entry(opening)
+        if not closing:
+            return "Skipped", None, "No invoices"
+        closing.insert(ignore_permissions=True)
+
+    closing.submit()
+    return "Closed", closing.name, None
+
+
+def retry_pos_closings():
+    """Scheduler: requeue failed closings whose backoff has passed"""
+    due = frappe.db.sql("""
+        SELECT cl.name, cl.pos_profile, cl.attempts
+        FROM `tabPOS Auto Closing Log` cl
+        JOIN `tabPOS Opening Entry` poe ON poe.name = cl.name
+        WHERE cl.status = 'Failed'
+        AND cl.next_retry_at <= %(now)s
+        AND poe.status = 'Open'
+        AND poe.docstatus = 1
+    """, {"now": now_datetime()}, as_dict=True)
+
+    for row in due:
+        enqueue_pos_closing(row.name, row.pos_profile, attempts=row.attempts)
+
+    if due:
+        frappe.db.commit()
@@ -0,0 +1,238 @@
+import time
+
+import frappe
+from erpnext.accounts.doctype.pos_invoice_merge_log.pos_invoice_merge_log import (
+    get_invoice_customer_map,
+    split_invoices,
+)
+from frappe.utils import add_to_date, now_datetime, today
+
+from almoosa_customization.pos_closing import RETRY_BACKOFF_MINUTES
+
+# Submitted POS Invoices left unconsolidated (failed or skipped closings) are
+# merged into Sales Invoices off-peak, one POS Consolidation Batch per profile
+# and posting date. A batch works through its invoices in chunks ordered by
+# name and stores the last one processed, so a run that stops early resumes
+# where it left off and a failing chunk is skipped instead of blocking the
+# rest. Days with a shift still open are left to that shift's closing. A
+# batch that ends with failed chunks is retried on the POS closing backoff.
+
+CHUNK_SIZE = 100
+
+# Pause between chunks, to keep the database responsive for other jobs
+THROTTLE_SECONDS = 2
+
+# A run stops picking up chunks after this long; the next run continues
+MAX_RUN_SECONDS = 1500
+JOB_TIMEOUT = 1800
+
+# Batch row name is derived from the key so upserts hit the primary key
+BATCH_NAME = "MD5(CONCAT_WS('::', {pos_profile}, {posting_date}))"
+
+LOCK_NAME = "almoosa_pos_consolidation"
+
+# Merged Sales Invoices are posted at the end of the batch's day, as closings are
+MERGE_POSTING_TIME = "23:59:59"
+
+
+def enqueue_pos_consolidation():
+    """Scheduler (off-peak cron): run the consolidation as one long job"""
+    frappe.enqueue(
+        "almoosa_customization.pos_consolidation.run_pos_consolidation",
+        queue="long",
+        timeout=JOB_TIMEOUT,
+        job_id="almoosa_pos_consolidation",
+        deduplicate=True,
+    )
+
+
+def queue_pos_consolidation_batches():
+    """Create or reopen a batch for every past day with unconsolidated invoices and no open shift"""
+    # Updates apply left to right, so the resets see the new status: completed
+    # and never started batches begin afresh, a running batch keeps its place
+    frappe.db.sql(f"""
+        INSERT INTO `tabPOS Consolidation Batch`
+            (name, creation, modified, modified_by, owner, docstatus, idx,
+             pos_profile, posting_date, status, total_invoices,
+             consolidated_invoices, failed_chunks, last_invoice)
+        SELECT
+            {BATCH_NAME.format(pos_profile="pi.pos_profile", posting_date="pi.posting_date")},
+            NOW(), NOW(), 'Administrator', 'Administrator', 0, 0,
+            pi.pos_profile, pi.posting_date, 'Pending', COUNT(*), 0, 0, ''
+        FROM `tabPOS Invoice` pi
+        WHERE pi.docstatus = 1
+        AND IFNULL(pi.consolidated_invoice, '') = ''
+        AND pi.posting_date < %(today)s
+        AND NOT EXISTS (
+            SELECT 1 FROM `tabPOS Opening Entry` poe
+            WHERE poe.pos_profile = pi.pos_profile
+            AND poe.docstatus = 1
+            AND poe.status = 'Open'
+            AND DATE(poe.period_start_date) <= pi.posting_date
+        )
+        GROUP BY pi.pos_profile, pi.posting_date
+        ON DUPLICATE KEY UPDATE
+            total_invoices = VALUES(total_invoices),
+            status = IF(status = 'Completed', 'Pending', status),
+            consolidated_invoices = IF(status = 'Pending', 0, consolidated_invoices),
+            last_invoice = IF(status = 'Pending', '', last_invoice),
+            modified = NOW()
+    """, {"today": today()})
+
+
+def get_chunk(batch):
+    return frappe.db.sql("""
+        SELECT name AS pos_invoice, customer, posting_date, grand_total, is_return, return_against
+        FROM `tabPOS Invoice`
+        WHERE pos_profile = %(pos_profile)s
+        AND posting_date = %(posting_date)s
+        AND docstatus = 1
+        AND IFNULL(consolidated_invoice, '') = ''
+        AND name > %(after)s
+        ORDER BY name
+        LIMIT %(limit)s
+    """, {
+        "pos_profile": batch.pos_profile,
+        "posting_date": batch.posting_date,
+        "after": batch.last_invoice or "",
+        "limit": CHUNK_SIZE,
+    }, as_dict=True)
+
+
+def consolidate_chunk(batch, chunk):
+    """Merge a chunk per customer, dated on the batch's posting date.
+
+    erpnext's create_merge_logs dates merge logs without a closing entry on
+    today, and commits; this mirrors it with the batch's date and leaves the
+    transaction to the caller, so a failing chunk is rolled back whole.
+    """
+    for customer, invoices in get_invoice_customer_map(chunk).items():
+        for split in split_invoices(invoices):
+            merge_log = frappe.new_doc("POS Invoice Merge Log")
+            merge_log.posting_date = batch.posting_date
+            merge_log.posting_time = MERGE_POSTING_TIME
+            merge_log.customer = customer
+            merge_log.set("pos_invoices", split)
+            merge_log.save(ignore_permissions=True)
+            merge_log.submit()
+
+
+def update_batch(batch, **fields):
+    batch.update(fields)
+    frappe.db.set_value("POS Consolidation Batch", batch.name, fields, update_modified=True)
+    frappe.db.commit()
+
+
+def process_batch(batch, deadline):
+    """Consolidate a batch chunk by chunk; returns False when the run is out of time"""
+    if batch.status != "Running":
+        update_batch(batch, status="Running", started_at=now_datetime(), finished_at=None)
+
+    while True:
+        if now_datetime() >= deadline:
+            return False
+
+        chunk = get_chunk(batch)
+        if not chunk:
+            finish_batch(batch)
+            return True
+
+        try:
+            consolidate_chunk(batch, chunk)
+            fields = {"consolidated_invoices": (batch.consolidated_invoices or 0) + len(chunk)}
+        except Exception:
+            frappe.db.rollback()
+            frappe.log_error(
+                title=f"POS Consolidation Failed: {batch.pos_profile} {batch.posting_date}",
+                message=frappe.get_traceback(),
+            )
+            fields = {"failed_chunks": (batch.failed_chunks or 0) + 1, "error": frappe.get_traceback()}
+
+        # Past the chunk either way; failed invoices wait for a retry of the batch
+        update_batch(batch, last_invoice=chunk[-1].pos_invoice, **fields)
+        time.sleep(THROTTLE_SECONDS)
+
+
+def finish_batch(batch):
+    """Complete the batch, or fail it with the next retry per RETRY_BACKOFF_MINUTES"""
+    if not batch.failed_chunks:
+        update_batch(batch, status="Completed", attempts=0, next_retry_at=None, finished_at=now_datetime())
+        return
+
+    attempts = (batch.attempts or 0) + 1
+    retry = attempts <= len(RETRY_BACKOFF_MINUTES)
+    update_batch(
+        batch,
+        status="Failed",
+        attempts=attempts,
+        next_retry_at=add_to_date(now_datetime(), minutes=RETRY_BACKOFF_MINUTES[attempts - 1]) if retry else None,
+        finished_at=now_datetime(),
+    )
+
+
+def run_pos_consolidation():
+    """Background job: work through pending batches until done or out of time"""
+    if frappe.db.sql("SELECT GET_LOCK(%s, 0)", (LOCK_NAME,))[0][0] != 1:
+        return
+
+    try:
+        queue_pos_consolidation_batches()
+        frappe.db.commit()
+
+        deadline = add_to_date(now_datetime(), seconds=MAX_RUN_SECONDS)
+        batches = frappe.get_all(
+            "POS Consolidation Batch",
+            filters={"status": ["in", ["Pending", "Running"]]},
+            fields=["name", "pos_profile", "posting_date", "status", "attempts",
+                    "consolidated_invoices", "failed_chunks", "last_invoice"],
+            order_by="posting_date asc, pos_profile asc",
+        )
+
+        for batch in batches:
+            if not process_batch(batch, deadline):
+                break
+
+    finally:
+        frappe.db.sql("SELECT RELEASE_LOCK(%s)", (LOCK_NAME,))
+
+
+def reopen_batches(names, **fields):
+    """Set batches back to Pending, to start again from their first remaining invoice"""
+    for name in names:
+        frappe.db.set_value("POS Consolidation Batch", name, {
+            "status": "Pending",
+            "last_invoice": "",
+            # The next run recounts total_invoices from what is left
+            "consolidated_invoices": 0,
+            "failed_chunks": 0,
+            "next_retry_at": None,
+            "error": None,
+            **fields,
+        })
+
+
+def retry_pos_consolidation_batches():
+    """Scheduler: reopen failed batches whose backoff has passed.
+
+    The off-peak cron runs them; nothing is enqueued here, so retries stay
+    inside its window.
+    """
+    due = frappe.db.sql("""
+        SELECT name FROM `tabPOS Consolidation Batch`
+        WHERE status = 'Failed'
+        AND next_retry_at <= %(now)s
+    """, {"now": now_datetime()}, pluck=True)
+
+    if not due:
+        return
+
+    reopen_batches(due)
+    frappe.db.commit()
+
+
+@frappe.whitelist(methods=["POST"])
+def retry_pos_consolidation_batch(name):
+    """Reopen a failed batch from its first remaining invoice, with a fresh retry budget"""
+    frappe.only_for(["System Manager", "Accounts Manager"])
+
+    reopen_batches([name], attempts=0)
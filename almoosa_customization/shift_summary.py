@@ -0,0 +1,249 @@
+import frappe
+from frappe import _
+from frappe.utils import flt, get_datetime
+
+from almoosa_customization import pos_closing
+
+# POS Shift Summary keeps the running totals of a POS Opening Entry: the same
+# figures the closing entry needs, updated on every POS Invoice submit and
+# cancel. Updates lock the summary row first, so concurrent invoices of one
+# shift are applied one after the other.
+
+# Child row names are derived from their key so upserts hit the primary key
+TAX_ROW_NAME = "MD5(CONCAT_WS('::', {parent}, {account_head}, CAST({rate} AS DECIMAL(21, 9))))"
+PAYMENT_ROW_NAME = "MD5(CONCAT_WS('::', {parent}, {mode_of_payment}))"
+
+
+def get_invoice_opening(doc):
+    """Open POS Opening Entry whose closing window holds the invoice, as in the closing predicate"""
+    openings = frappe.db.sql("""
+        SELECT name FROM `tabPOS Opening Entry`
+        WHERE pos_profile = %(pos_profile)s
+        AND user = %(user)s
+        AND docstatus = 1
+        AND status = 'Open'
+        AND period_start_date <= %(timestamp)s
+        AND DATE(period_start_date) = DATE(%(timestamp)s)
+        ORDER BY period_start_date DESC
+        LIMIT 1
+    """, {
+        "pos_profile": doc.pos_profile,
+        "user": doc.owner,
+        "timestamp": get_datetime(f"{doc.posting_date} {doc.posting_time}"),
+    }, pluck=True)
+
+    return openings[0] if openings else None
+
+
+def lock_shift_summary(pos_opening_entry):
+    """Create the summary row if needed and hold its lock until the transaction ends"""
+    # On an existing row the update takes the exclusive lock straight away
+    frappe.db.sql("""
+        INSERT INTO `tabPOS Shift Summary`
+            (name, creation, modified, modified_by, owner, docstatus, idx,
+             pos_opening_entry, invoice_count, grand_total, net_total, total_qty)
+        VALUES
+            (%(name)s, NOW(), NOW(), 'Administrator', 'Administrator', 0, 0,
+             %(name)s, 0, 0, 0, 0)
+        ON DUPLICATE KEY UPDATE modified = NOW()
+    """, {"name": pos_opening_entry})
+
+    frappe.db.sql(
+        "SELECT name FROM `tabPOS Shift Summary` WHERE name = %s FOR UPDATE", (pos_opening_entry,)
+    )
+
+
+def add_tax_amount(parent, account_head, rate, amount):
+    frappe.db.sql(f"""
+        INSERT INTO `tabPOS Shift Summary Tax`
+            (name, creation, modified, modified_by, owner, docstatus, idx,
+             parent, parentfield, parenttype, account_head, rate, amount)
+        VALUES (
+            {TAX_ROW_NAME.format(parent="%(parent)s", account_head="%(account_head)s", rate="%(rate)s")},
+            NOW(), NOW(), 'Administrator', 'Administrator', 0, 0,
+            %(parent)s, 'taxes', 'POS Shift Summary', %(account_head)s, %(rate)s, %(amount)s
+        )
+        ON DUPLICATE KEY UPDATE
+            amount = amount + VALUES(amount),
+            modified = NOW()
+    """, {"parent": parent, "account_head": account_head, "rate": flt(rate), "amount": flt(amount)})
+
+
+def add_payment_amount(parent, mode_of_payment, amount):
+    frappe.db.sql(f"""
+        INSERT INTO `tabPOS Shift Summary Payment`
+            (name, creation, modified, modified_by, owner, docstatus, idx,
+             parent, parentfield, parenttype, mode_of_payment, amount)
+        VALUES (
+            {PAYMENT_ROW_NAME.format(parent="%(parent)s", mode_of_payment="%(mode_of_payment)s")},
+            NOW(), NOW(), 'Administrator', 'Administrator', 0, 0,
+            %(parent)s, 'payments', 'POS Shift Summary', %(mode_of_payment)s, %(amount)s
+        )
+        ON DUPLICATE KEY UPDATE
+            amount = amount + VALUES(amount),
+            modified = NOW()
+    """, {"parent": parent, "mode_of_payment": mode_of_payment, "amount": flt(amount)})
+
+
+def update_shift_summary(doc, method=None):
+    """doc_events hook on POS Invoice on_submit / on_cancel"""
+    pos_opening_entry = get_invoice_opening(doc)
+    if not pos_opening_entry:
+        return
+
+    sign = -1 if method == "on_cancel" else 1
+
+    lock_shift_summary(pos_opening_entry)
+
+    frappe.db.sql("""
+        UPDATE `tabPOS Shift Summary`
+        SET pos_profile = %(pos_profile)s,
+            user = %(user)s,
+            invoice_count = invoice_count + %(sign)s,
+            grand_total = grand_total + %(grand_total)s,
+            net_total = net_total + %(net_total)s,
+            total_qty = total_qty + %(total_qty)s
+        WHERE name = %(name)s
+    """, {
+        "name": pos_opening_entry,
+        "pos_profile": doc.pos_profile,
+        "user": doc.owner,
+        "sign": sign,
+        "grand_total": sign * flt(doc.grand_total),
+        "net_total": sign * flt(doc.net_total),
+        "total_qty": sign * flt(doc.total_qty),
+    })
+
+    taxes = {}
+    for row in doc.get("taxes") or []:
+        key = (row.account_head, flt(row.rate))
+        taxes[key] = taxes.get(key, 0) + flt(row.tax_amount)
+    for (account_head, rate), amount in taxes.items():
+        add_tax_amount(pos_opening_entry, account_head, rate, sign * amount)
+
+    payments = {}
+    for row in doc.get("payments") or []:
+        payments[row.mode_of_payment] = payments.get(row.mode_of_payment, 0) + flt(row.amount)
+    for mode_of_payment, amount in payments.items():
+        add_payment_amount(pos_opening_entry, mode_of_payment, sign * amount)
+
+
+def rebuild_shift_summary(pos_opening_entry):
+    """Recompute the summary of one opening from its invoices"""
+    # Lock before reading, so no invoice of the shift commits in between
+    lock_shift_summary(pos_opening_entry)
+
+    opening = frappe.db.get_value(
+        "POS Opening Entry",
+        pos_opening_entry,
+        ["name", "pos_profile", "user", "period_start_date"],
+        as_dict=True,
+    )
+    values = pos_closing.get_invoice_values(opening)
+    transactions = pos_closing.get_closing_transactions(values)
+
+    frappe.db.sql("""
+        UPDATE `tabPOS Shift Summary`
+        SET pos_profile = %(pos_profile)s,
+            user = %(user)s,
+            invoice_count = %(invoice_count)s,
+            grand_total = %(grand_total)s,
+            net_total = %(net_total)s,
+            total_qty = %(total_qty)s
+        WHERE name = %(name)s
+    """, {
+        "name": pos_opening_entry,
+        "pos_profile": opening.pos_profile,
+        "user": opening.user,
+        "invoice_count": len(transactions),
+        "grand_total": sum(flt(inv.grand_total) for inv in transactions),
+        "net_total": sum(flt(inv.net_total) for inv in transactions),
+        "total_qty": sum(flt(inv.total_qty) for inv in transactions),
+    })
+
+    frappe.db.delete("POS Shift Summary Tax", {"parent": pos_opening_entry})
+    frappe.db.delete("POS Shift Summary Payment", {"parent": pos_opening_entry})
+
+    for tax in pos_closing.get_closing_taxes(values):
+        add_tax_amount(pos_opening_entry, tax.account_head, tax.rate, tax.amount)
+    for payment in pos_closing.get_closing_payments(values):
+        add_payment_amount(pos_opening_entry, payment.mode_of_payment, payment.expected_amount)
+
+
+def repair_shift_summaries():
+    """Daily: rebuild the summaries of open shifts, for drift from invoices written without hooks"""
+    for pos_opening_entry in frappe.get_all(
+        "POS Opening Entry", filters={"status": "Open", "docstatus": 1}, pluck="name"
+    ):
+        # Each rebuild in a fresh transaction, so its reads start after the lock
+        frappe.db.commit()
+        rebuild_shift_summary(pos_opening_entry)
+
+    frappe.db.commit()
+
+
+def get_shift_summary_data(pos_opening_entry):
+    """Summary totals with taxes and payments, None when the shift has no summary yet"""
+    summary = frappe.db.get_value(
+        "POS Shift Summary",
+        pos_opening_entry,
+        ["name", "pos_profile", "user", "invoice_count", "grand_total", "net_total", "total_qty"],
+        as_dict=True,
+    )
+    if not summary:
+        return None
+
+    summary.taxes = frappe.get_all(
+        "POS Shift Summary Tax",
+        filters={"parent": pos_opening_entry, "parenttype": "POS Shift Summary"},
+        fields=["account_head", "rate", "amount"],
+        order_by="account_head asc, rate asc",
+    )
+    summary.payments = frappe.get_all(
+        "POS Shift Summary Payment",
+        filters={"parent": pos_opening_entry, "parenttype": "POS Shift Summary"},
+        fields=["mode_of_payment", "amount"],
+        order_by="mode_of_payment asc",
+    )
+    return summary
+
+
+def get_open_opening(pos_profile, user):
+    return frappe.db.get_value(
+        "POS Opening Entry",
+        {"pos_profile": pos_profile, "user": user, "status": "Open", "docstatus": 1},
+        "name",
+        order_by="period_start_date desc",
+    )
+
+
+@frappe.whitelist()
+def get_shift_summary(pos_opening_entry=None, pos_profile=None):
+    """Live totals of a shift; defaults to the session user's open shift on pos_profile"""
+    if not pos_opening_entry:
+        if not pos_profile:
+            frappe.throw(_("POS Opening Entry or POS Profile is required"))
+        pos_opening_entry = get_open_opening(pos_profile, frappe.session.user)
+        if not pos_opening_entry:
+            return None
+
+    frappe.has_permission("POS Opening Entry", "read", doc=pos_opening_entry, throw=True)
+
+    return get_shift_summary_data(pos_opening_entry) or {
+        "name": pos_opening_entry,
+        "invoice_count": 0,
+        "grand_total": 0,
+        "net_total": 0,
+        "total_qty": 0,
+        "taxes": [],
+        "payments": [],
+    }
+
+
+@frappe.whitelist(methods=["POST"])
+def repair_shift_summary(pos_opening_entry):
+    """Recompute one shift summary from its invoices"""
+    frappe.only_for(["System Manager", "Accounts Manager"])
+
+    rebuild_shift_summary(pos_opening_entry)
+    return get_shift_summary_data(pos_opening_entry)
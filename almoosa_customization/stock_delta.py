@@ -0,0 +1,145 @@
+import frappe
+from frappe.utils import add_days, add_months, get_first_day, getdate, now_datetime, today
+
+# Daily (item, warehouse) deltas of Stock Ledger Entry actual_qty and
+# stock_value_difference. Balances "before date D" become a sum over day rows
+# plus the intra-day remainder read from SLE, instead of a scan of the whole
+# ledger. Like the reports, rows are not filtered on is_cancelled: a
+# cancellation inserts reversing SLEs, so cancelled vouchers net to zero.
+
+# Row name is derived from the key so upserts hit the primary key
+DELTA_NAME = "MD5(CONCAT_WS('::', {item_code}, {warehouse}, {posting_date}))"
+
+# Days always recomputed by the daily repair, for valuation reposts and any
+# SLE written without hooks (data import, direct SQL)
+REPAIR_WINDOW_DAYS = 7
+
+REPAIRED_UPTO_KEY = "almoosa_item_stock_delta_repaired_upto"
+
+
+# SLEs are added to the table in batches of this many names
+FLUSH_CHUNK_SIZE = 1000
+
+
+def update_item_stock_delta(doc, method=None):
+    """doc_events hook on Stock Ledger Entry after_insert.
+
+    The stock controller sets stock_value_difference only after inserting
+    the SLE, so the entry is noted here and added up just before commit.
+    """
+    pending = frappe.flags.item_stock_delta_pending
+    if pending is None:
+        pending = frappe.flags.item_stock_delta_pending = []
+        frappe.db.before_commit.add(flush_item_stock_deltas)
+        frappe.db.after_rollback.add(clear_pending_item_stock_deltas)
+
+    pending.append(doc.name)
+
+
+def clear_pending_item_stock_deltas():
+    frappe.flags.item_stock_delta_pending = None
+
+
+def flush_item_stock_deltas():
+    """before_commit: add the qty and value of the SLEs inserted in this transaction"""
+    pending = frappe.flags.item_stock_delta_pending or []
+    clear_pending_item_stock_deltas()
+
+    # Read back from the ledger: names rolled back to a savepoint are simply absent
+    for start in range(0, len(pending), FLUSH_CHUNK_SIZE):
+        frappe.db.sql(f"""
+            INSERT INTO `tabItem Stock Delta`
+                (name, creation, modified, modified_by, owner, docstatus, idx,
+                 item_code, warehouse, posting_date, qty_change, value_change)
+            SELECT
+                {DELTA_NAME.format(item_code="item_code", warehouse="warehouse", posting_date="posting_date")},
+                NOW(), NOW(), 'Administrator', 'Administrator', 0, 0,
+                item_code, warehouse, posting_date,
+                COALESCE(SUM(actual_qty), 0),
+                COALESCE(SUM(stock_value_difference), 0)
+            FROM `tabStock Ledger Entry`
+            WHERE name IN %(names)s
+            GROUP BY item_code, warehouse, posting_date
+            ON DUPLICATE KEY UPDATE
+                qty_change = qty_change + VALUES(qty_change),
+                value_change = value_change + VALUES(value_change),
+                modified = NOW()
+        """, {"names": tuple(pending[start:start + FLUSH_CHUNK_SIZE])})
+
+
+def rebuild_item_stock_deltas(from_date=None, to_date=None):
+    """Recompute delta rows from the ledger for posting dates in [from_date, to_date]"""
+    conditions = []
+    values = {}
+
+    if from_date:
+        conditions.append("posting_date >= %(from_date)s")
+        values["from_date"] = getdate(from_date)
+    if to_date:
+        conditions.append("posting_date <= %(to_date)s")
+        values["to_date"] = getdate(to_date)
+
+    where_clause = " AND ".join(conditions) if conditions else "1=1"
+
+    frappe.db.sql(f"DELETE FROM `tabItem Stock Delta` WHERE {where_clause}", values)
+
+    frappe.db.sql(f"""
+        INSERT INTO `tabItem Stock Delta`
+            (name, creation, modified, modified_by, owner, docstatus, idx,
+             item_code, warehouse, posting_date, qty_change, value_change)
+        SELECT
+            {DELTA_NAME.format(item_code="item_code", warehouse="warehouse", posting_date="posting_date")},
+            NOW(), NOW(), 'Administrator', 'Administrator', 0, 0,
+            item_code, warehouse, posting_date,
+            COALESCE(SUM(actual_qty), 0),
+            COALESCE(SUM(stock_value_difference), 0)
+        FROM `tabStock Ledger Entry`
+        WHERE {where_clause}
+        GROUP BY item_code, warehouse, posting_date
+    """, values)
+
+
+def rebuild_all_item_stock_deltas():
+    """Full rebuild one month at a time, committing after each month"""
+    bounds = frappe.db.sql("""
+        SELECT MIN(posting_date), MAX(posting_date)
+        FROM `tabStock Ledger Entry`
+    """)
+    if not bounds or not bounds[0][0]:
+        frappe.db.sql("DELETE FROM `tabItem Stock Delta`")
+        return
+
+    start, end = get_first_day(bounds[0][0]), getdate(bounds[0][1])
+    frappe.db.sql("DELETE FROM `tabItem Stock Delta` WHERE posting_date < %s", start)
+
+    while start <= end:
+        month_end = add_days(add_months(start, 1), -1)
+        # The last chunk is open ended so rows dated after the scan are not left behind
+        rebuild_item_stock_deltas(start, month_end if month_end < end else None)
+        frappe.db.commit()
+        start = add_months(start, 1)
+
+
+def repair_item_stock_deltas():
+    """Daily job: recompute recent days and days touched by valuation reposts.
+
+    Back-dated entries only add rows, which the hook already counts, but a
+    repost rewrites stock_value_difference of later SLEs without firing hooks.
+    """
+    started_at = now_datetime()
+    from_date = add_days(today(), -REPAIR_WINDOW_DAYS)
+
+    last_run = frappe.db.get_default(REPAIRED_UPTO_KEY)
+    if last_run:
+        repost_from = frappe.db.sql("""
+            SELECT MIN(posting_date)
+            FROM `tabRepost Item Valuation`
+            WHERE docstatus = 1 AND status = 'Completed'
+            AND modified >= %s
+        """, last_run)
+        if repost_from and repost_from[0][0]:
+            from_date = min(getdate(from_date), getdate(repost_from[0][0]))
+
+    rebuild_item_stock_deltas(from_date)
+    frappe.db.set_default(REPAIRED_UPTO_KEY, str(started_at))
+    frappe.db.commit()
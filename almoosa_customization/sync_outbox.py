@@ -0,0 +1,219 @@
+import json
+
+import frappe
+from frappe import _
+from frappe.utils import add_days, cint, now, now_datetime
+
+# Sync Outbox is an append-only change log: doc_events hooks add one row per
+# change in the transaction that makes the change, and each consumer pulls the
+# rows after the last sequence number it acknowledged.
+#
+# Sequence numbers are assigned just before commit from a counter row that
+# stays locked until the commit, so they become visible in order: a consumer
+# never sees seq n + 1 while n is still to come. Autoincrement names are
+# taken at insert and may commit out of order, so they are only row ids.
+
+# Per-doctype fields copied into the entry so consumers can route it without
+# reading the document
+DATA_FIELDS = {
+    "Item": [],
+    "Item Price": ["item_code", "price_list"],
+    "Stock Entry": ["stock_entry_type", "purpose"],
+    "POS Invoice": ["pos_profile"],
+}
+
+EVENTS = {
+    "on_update": "Update",
+    "on_trash": "Delete",
+    "after_rename": "Rename",
+    "on_submit": "Submit",
+    "on_cancel": "Cancel",
+}
+
+# Defaults key holding the last sequence number acknowledged by a consumer
+ACK_KEY_PREFIX = "almoosa_sync_outbox_ack:"
+
+PULL_LIMIT = 500
+MAX_PULL_LIMIT = 5000
+
+# DefaultValue row holding the last sequence number assigned
+SEQ_COUNTER_NAME = "almoosa_sync_outbox_seq"
+
+# Acknowledged entries are kept this long before they are purged
+RETENTION_DAYS = 7
+
+
+def add_to_outbox(doc, method=None, *args, **kwargs):
+    """doc_events hook on Item, Item Price, Stock Entry and POS Invoice"""
+    data = {field: doc.get(field) for field in DATA_FIELDS.get(doc.doctype, [])}
+
+    # after_rename passes (old, new, merge)
+    if method == "after_rename" and args:
+        data["old_name"] = args[0]
+
+    timestamp = now()
+    frappe.db.sql("""
+        INSERT INTO `tabSync Outbox`
+            (creation, modified, modified_by, owner, docstatus, idx,
+             reference_doctype, reference_name, event, data)
+        VALUES
+            (%(now)s, %(now)s, %(user)s, %(user)s, 0, 0,
+             %(reference_doctype)s, %(reference_name)s, %(event)s, %(data)s)
+    """, {
+        "now": timestamp,
+        "user": frappe.session.user,
+        "reference_doctype": doc.doctype,
+        "reference_name": doc.name,
+        "event": EVENTS.get(method, "Update"),
+        "data": json.dumps(data) if data else None,
+    })
+
+    pending = frappe.flags.sync_outbox_pending
+    if pending is None:
+        pending = frappe.flags.sync_outbox_pending = []
+        frappe.db.before_commit.add(sequence_outbox_entries)
+        frappe.db.after_rollback.add(clear_pending_outbox_entries)
+
+    pending.append(frappe.db.sql("SELECT LAST_INSERT_ID()")[0][0])
+
+
+def clear_pending_outbox_entries():
+    frappe.flags.sync_outbox_pending = None
+
+
+def get_seq_counter():
+    """Last assigned sequence number, with the counter row locked until commit"""
+    counter = frappe.db.sql("""
+        SELECT defvalue FROM `tabDefaultValue`
+        WHERE name = %(name)s
+        FOR UPDATE
+    """, {"name": SEQ_COUNTER_NAME})
+
+    return cint(counter[0][0]) if counter else None
+
+
+def allocate_seq(count):
+    """Reserve count sequence numbers and return the first"""
+    last = get_seq_counter()
+
+    if last is None:
+        frappe.db.sql("""
+            INSERT IGNORE INTO `tabDefaultValue`
+                (name, creation, modified, modified_by, owner, docstatus, idx,
+                 parent, parenttype, parentfield, defkey, defvalue)
+            VALUES
+                (%(name)s, NOW(), NOW(), 'Administrator', 'Administrator', 0, 0,
+                 '__default', '__default', 'system_defaults', %(name)s, '0')
+        """, {"name": SEQ_COUNTER_NAME})
+        last = get_seq_counter()
+
+    frappe.db.sql("""
+        UPDATE `tabDefaultValue` SET defvalue = %(value)s WHERE name = %(name)s
+    """, {"name": SEQ_COUNTER_NAME, "value": str(last + count)})
+
+    return last + 1
+
+
+def sequence_outbox_entries():
+    """before_commit: number the entries of this transaction"""
+    pending = frappe.flags.sync_outbox_pending or []
+    clear_pending_outbox_entries()
+
+    # Entries rolled back to a savepoint are gone
+    names = frappe.db.sql("""
+        SELECT name FROM `tabSync Outbox`
+        WHERE name IN %(names)s AND seq = 0
+        ORDER BY name
+    """, {"names": tuple(pending)}, pluck=True) if pending else []
+
+    if not names:
+        return
+
+    first = allocate_seq(len(names))
+    cases = " ".join(f"WHEN {cint(name)} THEN {first + i}" for i, name in enumerate(names))
+    frappe.db.sql(f"""
+        UPDATE `tabSync Outbox`
+        SET seq = CASE name {cases} END
+        WHERE name IN %(names)s
+    """, {"names": tuple(names)})
+
+
+def get_ack_key(consumer):
+    if not consumer:
+        frappe.throw(_("Consumer is required"))
+    return ACK_KEY_PREFIX + consumer
+
+
+@frappe.whitelist()
+def pull_outbox(consumer, limit=None, doctypes=None):
+    """Entries after the consumer's last acknowledged sequence number.
+
+    Pass the returned last_seq to ack_outbox once the batch is applied; until
+    then the same entries are returned again. doctypes (list) only filters
+    what is returned, last_seq still covers the skipped entries.
+    """
+    frappe.has_permission("Sync Outbox", "read", throw=True)
+
+    after = cint(frappe.db.get_default(get_ack_key(consumer)))
+    limit = min(max(cint(limit) or PULL_LIMIT, 1), MAX_PULL_LIMIT)
+    doctypes = frappe.parse_json(doctypes) if doctypes else None
+
+    rows = frappe.db.sql("""
+        SELECT seq, creation, reference_doctype, reference_name, event, data
+        FROM `tabSync Outbox`
+        WHERE seq > %(after)s
+        ORDER BY seq
+        LIMIT %(limit)s
+    """, {"after": after, "limit": limit + 1}, as_dict=True)
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    entries = []
+    last_seq = after
+    for row in rows:
+        last_seq = row.seq
+        if doctypes and row.reference_doctype not in doctypes:
+            continue
+
+        row.data = json.loads(row.data) if row.data else {}
+        entries.append(row)
+
+    return {
+        "entries": entries,
+        "last_seq": last_seq,
+        "has_more": has_more,
+    }
+
+
+@frappe.whitelist(methods=["POST"])
+def ack_outbox(consumer, seq):
+    """Record that the consumer applied every entry up to seq"""
+    frappe.has_permission("Sync Outbox", "read", throw=True)
+
+    key = get_ack_key(consumer)
+    seq = cint(seq)
+
+    # Never move backwards, e.g. on a retried request
+    if seq > cint(frappe.db.get_default(key)):
+        frappe.db.set_default(key, str(seq))
+
+    return seq
+
+
+def purge_sync_outbox():
+    """Daily: delete entries every consumer has acknowledged and that are past retention"""
+    acks = frappe.db.sql("""
+        SELECT defvalue FROM `tabDefaultValue`
+        WHERE parent = '__default'
+        AND defkey LIKE %(prefix)s
+    """, {"prefix": ACK_KEY_PREFIX + "%"}, pluck=True)
+
+    if not acks:
+        return
+
+    frappe.db.sql("""
+        DELETE FROM `tabSync Outbox`
+        WHERE seq <= %(acked)s
+        AND creation < %(before)s
+    """, {"acked": min(cint(seq) for seq in acks), "before": add_days(now_datetime(), -RETENTION_DAYS)})
@@ -0,0 +1,71 @@
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from erpnext.stock.doctype.item.test_item import make_item
+
+from almoosa_customization.api import decode_feed_token, get_updated_items_page
+
+# Far enough ahead that no other item of the test site is in the feed
+FEED_TIMESTAMP = "2099-01-01 00:00:00"
+LAST_SYNCED = "2098-12-31 00:00:00"
+
+
+class TestUpdatedItemsFeed(FrappeTestCase):
+	def setUp(self):
+		self.items = []
+		for i in range(5):
+			item = make_item(f"_Test Feed Item {i}", properties={"is_stock_item": 1}).name
+			self.items.append(item)
+
+		# All on one timestamp, so pages are split by the name tie-breaker
+		for item in self.items[:4]:
+			frappe.db.set_value("Item", item, "modified", FEED_TIMESTAMP, update_modified=False)
+		frappe.db.set_value("Item", self.items[4], "modified", "2099-01-02 00:00:00", update_modified=False)
+
+		# Synced before the change, so every test item is due
+		for item in self.items:
+			frappe.db.set_value("Item", item, "custom_last_synced", LAST_SYNCED, update_modified=False)
+
+	def tearDown(self):
+		frappe.db.rollback()
+
+	def get_all_pages(self, limit):
+		names = []
+		page_token = None
+
+		while True:
+			items, has_next_page, page_token = get_updated_items_page(
+				"modified", limit, page_token, since=FEED_TIMESTAMP
+			)
+			self.assertLessEqual(len(items), limit)
+			names.extend(d.name for d in items)
+
+			if not has_next_page:
+				self.assertIsNone(page_token)
+				return names
+
+	def test_pages_cover_every_item_once_in_order(self):
+		expected = sorted(self.items[:4]) + [self.items[4]]
+
+		for limit in (1, 2, 3, 5, 10):
+			self.assertEqual(self.get_all_pages(limit), expected, msg=f"{limit=}")
+
+	def test_since_excludes_older_items(self):
+		items, has_next_page, _token = get_updated_items_page("modified", 10, since="2099-01-02 00:00:00")
+		self.assertEqual([d.name for d in items], [self.items[4]])
+		self.assertFalse(has_next_page)
+
+	def test_synced_items_excluded(self):
+		# Synced after its change, and never synced
+		frappe.db.set_value("Item", self.items[0], "custom_last_synced", "2099-01-03 00:00:00", update_modified=False)
+		frappe.db.set_value("Item", self.items[1], "custom_last_synced", None, update_modified=False)
+
+		expected = sorted(self.items[2:4]) + [self.items[4]]
+		self.assertEqual(self.get_all_pages(10), expected)
+
+	def test_token_keeps_the_first_page_bound(self):
+		_items, _has_next_page, page_token = get_updated_items_page("modified", 1, since=FEED_TIMESTAMP)
+		self.assertEqual(decode_feed_token(page_token)[2], FEED_TIMESTAMP)
+
+	def test_invalid_token_rejected(self):
+		self.assertRaises(frappe.ValidationError, get_updated_items_page, "modified", 10, "not a token")
@@ -0,0 +1,286 @@
+import frappe
+from frappe import _
+from frappe.utils import cint, date_diff, flt, getdate, now, now_datetime, today
+
+# Transit Ledger Entry keeps one row per outgoing transit line (Material
+# Transfer with add_to_transit) with the qty received against it so far.
+# Receiving entries reference the outgoing entry through outgoing_stock_entry
+# and each of their lines the outgoing line through ste_detail, as set by
+# erpnext's make_stock_in_entry; received qty is allocated by that reference.
+# Receiving lines without ste_detail (made by hand) are allocated to the
+# outgoing lines of the same item in idx order, any over-receipt landing on
+# the last line.
+
+LEDGER_FIELDS = [
+    "name", "creation", "modified", "modified_by", "owner", "docstatus", "idx",
+    "outgoing_entry", "outgoing_detail", "item_code",
+    "source_warehouse", "transit_warehouse", "receiving_warehouse",
+    "posting_date", "posting_time", "posting_datetime",
+    "qty", "received_qty", "remaining_qty", "receipt_count", "last_received_on", "is_open",
+    "age_days", "age_bucket",
+]
+
+# (upper bound in days, bucket label); the last bucket is open ended
+AGE_BUCKETS = [
+    (3, "0-3"),
+    (7, "4-7"),
+    (14, "8-14"),
+    (30, "15-30"),
+    (None, "30+"),
+]
+
+DEFAULT_SLA_DAYS = 7
+
+BACKFILL_BATCH_SIZE = 500
+
+# Stock Entries modified after this timestamp are re-synced by the hourly job
+SYNCED_UPTO_KEY = "almoosa_transit_ledger_synced_upto"
+
+
+def update_transit_ledger(doc, method=None):
+    """doc_events hook on Stock Entry on_submit / on_cancel"""
+    if doc.stock_entry_type != "Material Transfer":
+        return
+
+    if doc.add_to_transit:
+        rebuild_transit_ledger([doc.name])
+    elif doc.outgoing_stock_entry:
+        rebuild_transit_ledger([doc.outgoing_stock_entry])
+
+
+def rebuild_transit_ledger(outgoing_entries):
+    """Recompute the ledger rows of the given outgoing Stock Entries"""
+    if not outgoing_entries:
+        return
+
+    values = {"entries": tuple(outgoing_entries)}
+
+    # Serialise concurrent receipts against the same outgoing entries
+    frappe.db.sql("""
+        SELECT name FROM `tabStock Entry`
+        WHERE name IN %(entries)s
+        FOR UPDATE
+    """, values)
+
+    lines = frappe.db.sql("""
+        SELECT
+            sed.name AS outgoing_detail,
+            se.name AS outgoing_entry,
+            sed.item_code,
+            sed.qty,
+            se.from_warehouse AS source_warehouse,
+            sed.t_warehouse AS transit_warehouse,
+            se.custom_receiving_warehouse AS receiving_warehouse,
+            se.posting_date,
+            se.posting_time,
+            TIMESTAMP(se.posting_date, se.posting_time) AS posting_datetime
+        FROM `tabStock Entry` se
+        JOIN `tabStock Entry Detail` sed ON sed.parent = se.name
+        WHERE se.name IN %(entries)s
+          AND se.docstatus = 1
+          AND se.stock_entry_type = 'Material Transfer'
+          AND se.add_to_transit = 1
+        ORDER BY se.name, sed.idx
+    """, values, as_dict=True)
+
+    received = frappe.db.sql("""
+        SELECT
+            se.outgoing_stock_entry AS outgoing_entry,
+            sed.item_code,
+            IFNULL(sed.ste_detail, '') AS outgoing_detail,
+            SUM(sed.qty) AS qty,
+            COUNT(DISTINCT se.name) AS receipt_count,
+            MAX(TIMESTAMP(se.posting_date, se.posting_time)) AS last_received_on
+        FROM `tabStock Entry` se
+        JOIN `tabStock Entry Detail` sed ON sed.parent = se.name
+        WHERE se.outgoing_stock_entry IN %(entries)s
+          AND se.docstatus = 1
+          AND se.stock_entry_type = 'Material Transfer'
+        GROUP BY se.outgoing_stock_entry, sed.item_code, IFNULL(sed.ste_detail, '')
+    """, values, as_dict=True)
+
+    linked_map = {r.outgoing_detail: r for r in received if r.outgoing_detail}
+    unlinked_map = {(r.outgoing_entry, r.item_code): r for r in received if not r.outgoing_detail}
+
+    # Last line of each (entry, item) takes any unlinked over-receipt
+    last_line = {}
+    for line in lines:
+        last_line[(line.outgoing_entry, line.item_code)] = line.outgoing_detail
+
+    unallocated = {key: flt(r.qty) for key, r in unlinked_map.items()}
+    timestamp = now()
+    rows = []
+
+    for line in lines:
+        key = (line.outgoing_entry, line.item_code)
+        receipts = []
+        received_qty = 0
+
+        if line.outgoing_detail in linked_map:
+            receipts.append(linked_map[line.outgoing_detail])
+            received_qty = flt(linked_map[line.outgoing_detail].qty)
+
+        if unallocated.get(key):
+            if last_line[key] == line.outgoing_detail:
+                allocated_qty = unallocated[key]
+            else:
+                allocated_qty = min(max(flt(line.qty) - received_qty, 0), unallocated[key])
+
+            if allocated_qty:
+                unallocated[key] -= allocated_qty
+                received_qty += allocated_qty
+                receipts.append(unlinked_map[key])
+
+        receipt_count = sum(r.receipt_count for r in receipts)
+        last_received_on = max((r.last_received_on for r in receipts), default=None)
+
+        remaining_qty = max(flt(line.qty) - received_qty, 0)
+        is_open = 1 if remaining_qty > 0 else 0
+
+        # Open lines age until today, closed lines until their last receipt
+        aged_until = today() if is_open or not receipts else getdate(last_received_on)
+        age_days = max(date_diff(aged_until, line.posting_date), 0)
+
+        rows.append((
+            line.outgoing_detail, timestamp, timestamp, "Administrator", "Administrator", 0, 0,
+            line.outgoing_entry, line.outgoing_detail, line.item_code,
+            line.source_warehouse, line.transit_warehouse, line.receiving_warehouse,
+            line.posting_date, line.posting_time, line.posting_datetime,
+            line.qty, received_qty, remaining_qty,
+            receipt_count,
+            last_received_on,
+            is_open,
+            age_days,
+            get_age_bucket(age_days),
+        ))
+
+    frappe.db.delete("Transit Ledger Entry", {"outgoing_entry": ("in", outgoing_entries)})
+    if rows:
+        frappe.db.bulk_insert("Transit Ledger Entry", LEDGER_FIELDS, rows)
+
+
+def backfill_transit_ledger():
+    """Rebuild the ledger for every submitted outgoing transit entry, in batches"""
+    entries = frappe.get_all(
+        "Stock Entry",
+        filters={
+            "docstatus": 1,
+            "stock_entry_type": "Material Transfer",
+            "add_to_transit": 1
+        },
+        pluck="name",
+        order_by="posting_date asc"
+    )
+
+    for start in range(0, len(entries), BACKFILL_BATCH_SIZE):
+        rebuild_transit_ledger(entries[start:start + BACKFILL_BATCH_SIZE])
+        frappe.db.commit()
+
+
+def sync_transit_ledger():
+    """Hourly job: rebuild ledger rows of outgoing entries touched since the watermark.
+
+    Catches Stock Entries changed without hooks (data import, direct SQL
+    fixes); the first run only sets the watermark, the backfill patch having
+    built the ledger.
+    """
+    started_at = now_datetime()
+    synced_upto = frappe.db.get_default(SYNCED_UPTO_KEY)
+
+    if synced_upto:
+        entries = frappe.db.sql("""
+            SELECT name
+            FROM `tabStock Entry`
+            WHERE modified >= %(since)s
+              AND stock_entry_type = 'Material Transfer'
+              AND add_to_transit = 1
+            UNION
+            SELECT outgoing_stock_entry
+            FROM `tabStock Entry`
+            WHERE modified >= %(since)s
+              AND stock_entry_type = 'Material Transfer'
+              AND outgoing_stock_entry IS NOT NULL
+              AND outgoing_stock_entry != ''
+        """, {"since": synced_upto}, pluck=True)
+
+        for start in range(0, len(entries), BACKFILL_BATCH_SIZE):
+            rebuild_transit_ledger(entries[start:start + BACKFILL_BATCH_SIZE])
+            frappe.db.commit()
+
+    frappe.db.set_default(SYNCED_UPTO_KEY, str(started_at))
+    frappe.db.commit()
+
+
+def get_age_bucket(age_days):
+    for upper, label in AGE_BUCKETS:
+        if upper is None or age_days <= upper:
+            return label
+
+
+def get_age_bucket_fieldname(label):
+    """Column name of a bucket in the ageing summary, e.g. 30+ -> age_30_plus"""
+    return "age_" + label.replace("-", "_").replace("+", "_plus")
+
+
+def get_age_bucket_sql(age_expression):
+    """SQL CASE expression mapping age_expression to its AGE_BUCKETS label"""
+    whens = " ".join(
+        f"WHEN {age_expression} <= {upper} THEN '{label}'"
+        for upper, label in AGE_BUCKETS if upper is not None
+    )
+    return f"CASE {whens} ELSE '{AGE_BUCKETS[-1][1]}' END"
+
+
+def update_transit_ageing():
+    """Daily job: advance age and bucket of the open ledger lines"""
+    frappe.db.sql(f"""
+        UPDATE `tabTransit Ledger Entry`
+        SET age_days = GREATEST(DATEDIFF(CURDATE(), posting_date), 0),
+            age_bucket = {get_age_bucket_sql("GREATEST(DATEDIFF(CURDATE(), posting_date), 0)")}
+        WHERE is_open = 1
+    """)
+    frappe.db.commit()
+
+
+@frappe.whitelist()
+def get_transit_ageing_summary(source_warehouse=None, receiving_warehouse=None, sla_days=None):
+    """Open transit qty per route (source -> receiving warehouse) by age bucket.
+
+    Lines older than sla_days are counted as SLA breaches.
+    """
+    if not frappe.has_permission("Transit Ledger Entry", "read"):
+        frappe.throw(_("Not permitted"), frappe.PermissionError)
+
+    conditions = ["tle.is_open = 1"]
+    values = {"sla_days": cint(sla_days) if sla_days not in (None, "") else DEFAULT_SLA_DAYS}
+
+    if source_warehouse:
+        conditions.append("tle.source_warehouse = %(source_warehouse)s")
+        values["source_warehouse"] = source_warehouse
+    if receiving_warehouse:
+        conditions.append("tle.receiving_warehouse = %(receiving_warehouse)s")
+        values["receiving_warehouse"] = receiving_warehouse
+
+    bucket_columns = ",\n".join(
+        f"SUM(CASE WHEN tle.age_bucket = '{label}' THEN tle.remaining_qty ELSE 0 END) AS {get_age_bucket_fieldname(label)}"
+        for _upper, label in AGE_BUCKETS
+    )
+
+    rows = frappe.db.sql(f"""
+        SELECT
+            tle.source_warehouse,
+            tle.receiving_warehouse,
+            COUNT(DISTINCT tle.outgoing_entry) AS open_entries,
+            COUNT(*) AS open_lines,
+            SUM(tle.remaining_qty) AS open_qty,
+            MAX(tle.age_days) AS oldest_days,
+            SUM(CASE WHEN tle.age_days > %(sla_days)s THEN 1 ELSE 0 END) AS breach_lines,
+            SUM(CASE WHEN tle.age_days > %(sla_days)s THEN tle.remaining_qty ELSE 0 END) AS breach_qty,
+            {bucket_columns}
+        FROM `tabTransit Ledger Entry` tle
+        WHERE {" AND ".join(conditions)}
+        GROUP BY tle.source_warehouse, tle.receiving_warehouse
+        ORDER BY breach_qty DESC, oldest_days DESC
+    """, values, as_dict=True)
+
+    return rows
@@ -0,0 +1,43 @@
+import frappe
+from frappe.utils import flt
+
+# Fallback when no default sales tax template carries a rate
+DEFAULT_VAT_RATE = 15.0
+
+
+def get_vat_rate(company=None):
+    """Return the VAT percentage of the default Sales Taxes and Charges Template"""
+    conditions = ""
+    values = {}
+
+    if company:
+        conditions = "AND stt.company = %(company)s"
+        values["company"] = company
+
+    rate = frappe.db.sql(f"""
+        SELECT stc.rate
+        FROM `tabSales Taxes and Charges Template` stt
+        JOIN `tabSales Taxes and Charges` stc
+            ON stc.parent = stt.name
+           AND stc.parenttype = 'Sales Taxes and Charges Template'
+        WHERE stt.is_default = 1 AND stt.disabled = 0 {conditions}
+        ORDER BY stc.idx
+        LIMIT 1
+    """, values)
+
+    return flt(rate[0][0]) if rate and rate[0][0] else DEFAULT_VAT_RATE
+
+
+def get_keyset_condition(columns, params):
+    """SQL for (columns) > (params) as an OR of equal prefixes.
+
+    MariaDB does not reliably turn the row constructor comparison into an
+    index range; this spelled out form is. params are the names of the query
+    values holding the cursor, in column order.
+    """
+    parts = []
+    for i, column in enumerate(columns):
+        equal = [f"{c} = %({p})s" for c, p in zip(columns[:i], params[:i])]
+        parts.append("(" + " AND ".join(equal + [f"{column} > %({params[i]})s"]) + ")")
+
+    return "(" + " OR ".join(parts) + ")"
@@ -0,0 +1,159 @@
+import frappe
+
+# Redis hash of user -> resolved warehouse permissions. frappe.cache().hget
+# keeps a request local copy in front of redis, so repeated lookups within
+# one request are plain dictionary hits.
+ALLOWED_WAREHOUSES_KEY = "almoosa_allowed_warehouses"
+
+# Version tag of the warehouse search index. Each worker keeps the built
+# index in process memory and rebuilds it when the tag changes.
+WAREHOUSE_INDEX_VERSION_KEY = "almoosa_warehouse_index_version"
+
+# site -> (version, index)
+warehouse_index_cache = {}
+
+
+def get_user_allowed_warehouses(user=None):
+    """Return the warehouses a user may see in store scoped reports.
+
+    None means no restriction (Administrator, or general POS Invoice access
+    without warehouse User Permissions); an empty list means no access.
+    """
+    user = user or frappe.session.user
+
+    if user == "Administrator":
+        return None
+
+    perms = frappe.cache().hget(
+        ALLOWED_WAREHOUSES_KEY, user, generator=lambda: build_user_allowed_warehouses(user)
+    )
+
+    return None if perms["unrestricted"] else perms["warehouses"]
+
+
+def build_user_allowed_warehouses(user):
+    """Resolve warehouse permissions of a user from User Permission records"""
+    perms = frappe.get_all(
+        "User Permission",
+        filters={
+            "user": user,
+            "allow": "Warehouse"
+        },
+        fields=["for_value", "applicable_for"]
+    )
+
+    # Include if applicable_for is POS Invoice or not set (applies to all)
+    warehouses = [
+        perm.for_value for perm in perms
+        if not perm.applicable_for or perm.applicable_for == "POS Invoice"
+    ]
+
+    # Without warehouse-specific permissions, general POS Invoice access sees all
+    unrestricted = not warehouses and bool(frappe.has_permission("POS Invoice", "read", user=user))
+
+    return {"unrestricted": unrestricted, "warehouses": warehouses}
+
+
+def filter_permitted_warehouses(warehouse_list, user=None):
+    """Filter warehouse list to only include warehouses permitted for the user"""
+    if not warehouse_list:
+        return []
+
+    allowed = get_user_allowed_warehouses(user)
+    if allowed is None:
+        return warehouse_list
+
+    allowed = set(allowed)
+    return [w for w in warehouse_list if w in allowed]
+
+
+def clear_user_warehouse_permissions(doc, method=None):
+    """doc_events hook on User Permission and User (role changes)"""
+    user = doc.user if doc.doctype == "User Permission" else doc.name
+    frappe.cache().hdel(ALLOWED_WAREHOUSES_KEY, user)
+
+
+def clear_all_warehouse_permissions(doc=None, method=None):
+    """doc_events hook on role permission changes, which affect every user"""
+    frappe.cache().delete_key(ALLOWED_WAREHOUSES_KEY)
+
+
+def get_warehouse_index():
+    """Return {company: [(name, warehouse_name, name_lower, warehouse_name_lower)]}"""
+    version = frappe.cache().get_value(
+        WAREHOUSE_INDEX_VERSION_KEY, generator=lambda: frappe.generate_hash(length=10)
+    )
+
+    cached = warehouse_index_cache.get(frappe.local.site)
+    if cached and cached[0] == version:
+        return cached[1]
+
+    index = build_warehouse_index()
+    warehouse_index_cache[frappe.local.site] = (version, index)
+    return index
+
+
+def build_warehouse_index():
+    """Index leaf, enabled warehouses by company with lowercased search keys"""
+    warehouses = frappe.get_all(
+        "Warehouse",
+        filters={"is_group": 0, "disabled": 0},
+        fields=["name", "warehouse_name", "company"],
+        order_by="name asc"
+    )
+
+    index = {}
+    for wh in warehouses:
+        warehouse_name = wh.warehouse_name or wh.name
+        index.setdefault(wh.company, []).append(
+            (wh.name, warehouse_name, wh.name.lower(), warehouse_name.lower())
+        )
+
+    return index
+
+
+def search_warehouses(txt="", company=None, limit=50, user=None):
+    """Search permitted warehouses by name or code for link filters.
+
+    Prefix matches rank ahead of substring matches; results are restricted to
+    the user's cached warehouse permissions.
+    """
+    allowed = get_user_allowed_warehouses(user)
+    if allowed == []:
+        return []
+
+    allowed = set(allowed) if allowed is not None else None
+    txt = (txt or "").strip().lower()
+    index = get_warehouse_index()
+
+    if company:
+        entries = index.get(company, [])
+    else:
+        entries = [entry for company_entries in index.values() for entry in company_entries]
+
+    matches = []
+    for name, warehouse_name, name_lower, warehouse_name_lower in entries:
+        if allowed is not None and name not in allowed:
+            continue
+
+        if name_lower.startswith(txt) or warehouse_name_lower.startswith(txt):
+            rank = 0
+        elif txt in name_lower or txt in warehouse_name_lower:
+            rank = 1
+        else:
+            continue
+
+        matches.append((rank, name, warehouse_name))
+
+    matches.sort()
+
+    return [
+        {"value": name, "description": warehouse_name}
+        for _rank, name, warehouse_name in matches[:limit]
+    ]
+
+
+def clear_warehouse_index(doc=None, method=None, *args, **kwargs):
+    """doc_events hook on Warehouse: make every worker rebuild its index"""
+    # Only after commit, or a worker could rebuild from the old rows under a new tag
+    frappe.db.after_commit.add(lambda: frappe.cache().delete_value(WAREHOUSE_INDEX_VERSION_KEY))